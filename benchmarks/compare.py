@@ -0,0 +1,70 @@
+import json
+import argparse
+from typing import Any, Dict, Iterator, Tuple
+
+
+# Метрики, для которых рост — это ухудшение
+LOWER_IS_BETTER = (
+    'import_seconds', 'startup_seconds', 'startup_seconds_max', 'api_calls', 'api_calls_per_sec', 'telegram_429',
+    'latency_p50', 'latency_p90', 'latency_p99', 'latency_max', 'cpu_seconds', 'cpu_percent', 'rss_mb_peak',
+    'rss_mb_end', 'threads',
+)
+
+
+def flatten(metrics: Dict[str, Any], prefix: str = '') -> Iterator[Tuple[str, Any]]:
+    for key, value in metrics.items():
+        if isinstance(value, dict):
+            yield from flatten(value, f'{prefix}{key}.')
+        else:
+            yield f'{prefix}{key}', value
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def describe(result: Dict[str, Any]) -> str:
+    version = result.get('version', {})
+    commit = version.get('commit') or '?'
+    return f"{result.get('label') or commit}{'+' if version.get('dirty') else ''} ({result.get('started_at')})"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Сравнение двух результатов benchmarks/run.py')
+    parser.add_argument('baseline', help='файл результатов базовой версии')
+    parser.add_argument('candidate', help='файл результатов новой версии')
+    parser.add_argument('--threshold', type=float, default=10.0, help='порог заметного изменения, %%')
+    args = parser.parse_args()
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    print(f'База:  {describe(baseline)}')
+    print(f'Новая: {describe(candidate)}')
+    if baseline.get('params') != candidate.get('params'):
+        changed = sorted(key for key in set(baseline['params']) | set(candidate['params'])
+                         if baseline['params'].get(key) != candidate['params'].get(key))
+        print(f"Внимание: параметры прогонов различаются ({', '.join(changed)})")
+
+    old, new = dict(flatten(baseline['metrics'])), dict(flatten(candidate['metrics']))
+    print(f"{'метрика':>24} {'база':>12} {'новая':>12} {'изменение':>10}")
+    for key in sorted(set(old) | set(new), key=lambda k: (k not in old, k)):
+        before, after = old.get(key), new.get(key)
+        change, mark = '', ''
+        if isinstance(before, (int, float)) and isinstance(after, (int, float)) and before:
+            percent = (after - before) / abs(before) * 100
+            change = f'{percent:+.1f}%'
+            if abs(percent) >= args.threshold and key.split('.')[0] in LOWER_IS_BETTER:
+                mark = ' хуже' if percent > 0 else ' лучше'
+        print(f'{key:>24} {_format(before):>12} {_format(after):>12} {change:>10}{mark}')
+
+
+def _format(value: Any) -> str:
+    if value is None:
+        return '—'
+    if isinstance(value, float):
+        return f'{value:.3f}'
+    return str(value)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+import json
+import time
+import random
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Benchmark', 'username': 'benchmark_bot'}
+
+
+class FakeTelegram:
+    """
+    Заглушка Telegram Bot API для нагрузочного стенда.
+
+    Принимает sendMessage и запоминает время получения и текст каждого
+    сообщения, на getUpdates отвечает пустым списком. Задержка ответа и доля
+    ответов 429 (retry_after) настраиваются.
+    """
+
+    def __init__(self, latency: float = 0.0, rate_429: float = 0.0, retry_after: int = 1, seed: Optional[int] = None):
+        """
+        :param latency: Средняя задержка ответа в секундах (±50%).
+        :param rate_429: Доля ответов 429 на sendMessage.
+        :param retry_after: Значение retry_after в ответах 429, секунд.
+        """
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self._lock = Lock()
+        self.methods: Dict[str, int] = {}
+        self.first_calls: Dict[str, float] = {}  # метод -> время первого вызова (time.time)
+        self.messages: List[List[Any]] = []  # [время получения, chat_id, текст]
+        self.rejected = 0
+
+    def call(self, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            self.methods[method] = self.methods.get(method, 0) + 1
+            self.first_calls.setdefault(method, time.time())
+
+        if method == 'getUpdates':
+            time.sleep(min(float(params.get('timeout') or 0), 1.0))
+            return {'ok': True, 'result': []}
+        if method == 'getMe':
+            return {'ok': True, 'result': BOT_USER}
+        if method != 'sendMessage':
+            return {'ok': True, 'result': True}
+
+        if self.latency:
+            time.sleep(self.random.uniform(self.latency * 0.5, self.latency * 1.5))
+        if self.random.random() < self.rate_429:
+            with self._lock:
+                self.rejected += 1
+            return {
+                'ok': False, 'error_code': 429,
+                'description': f'Too Many Requests: retry after {self.retry_after}',
+                'parameters': {'retry_after': self.retry_after},
+            }
+
+        chat_id = params.get('chat_id')
+        text = params.get('text', '')
+        with self._lock:
+            self.messages.append([time.time(), chat_id, text])
+            message_id = len(self.messages)
+        chat_type = 'channel' if str(chat_id).startswith('-') else 'private'
+        return {'ok': True, 'result': {
+            'message_id': message_id, 'date': int(time.time()), 'text': text,
+            'chat': {'id': int(chat_id) if str(chat_id).lstrip('-').isdigit() else 0, 'type': chat_type},
+        }}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'methods': dict(self.methods), 'first_calls': dict(self.first_calls), 'rejected': self.rejected, 'messages': list(self.messages)}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        if url.path == '/_bench/stats':
+            return self._reply(200, self.server.telegram.stats())
+        self._handle({key: values[0] for key, values in parse_qs(url.query).items()})
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if self.headers.get('Content-Type', '').startswith('application/json'):
+            params = json.loads(body or b'{}')
+        else:
+            params = {key: values[0] for key, values in parse_qs(body.decode('utf-8')).items()}
+        self._handle(params)
+
+    def _handle(self, params: Dict[str, Any]) -> None:
+        # Адрес вида /bot<токен>/<метод>
+        method = urlparse(self.path).path.rsplit('/', 1)[-1]
+        result = self.server.telegram.call(method, params)
+        self._reply(200 if result['ok'] else result['error_code'], result)
+
+    def _reply(self, status: int, payload: Any) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def serve(telegram: FakeTelegram, port: int = 0) -> ThreadingHTTPServer:
+    """Запускает заглушку в фоновом потоке; адрес для Bot API — http://127.0.0.1:<порт>/bot."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    server.telegram = telegram
+    Thread(target=server.serve_forever, name='fake-telegram', daemon=True).start()
+    return server
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--tg-latency', type=float, default=0.05, help='средняя задержка ответа Bot API, секунд')
+    parser.add_argument('--tg-rate-429', type=float, default=0.0, help='доля ответов 429 на sendMessage')
+    parser.add_argument('--tg-retry-after', type=int, default=1, help='retry_after в ответах 429, секунд')
+
+
+def from_arguments(args: argparse.Namespace) -> FakeTelegram:
+    return FakeTelegram(latency=args.tg_latency, rate_429=args.tg_rate_429, retry_after=args.tg_retry_after,
+                        seed=getattr(args, 'seed', None))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Заглушка Telegram Bot API')
+    parser.add_argument('--port', type=int, default=0, help='порт (0 — любой свободный)')
+    parser.add_argument('--seed', type=int, help='зерно генератора случайных чисел')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = serve(from_arguments(args), args.port)
+    print(server.server_port, flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
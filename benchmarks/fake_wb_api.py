@@ -0,0 +1,210 @@
+import json
+import time
+import random
+import argparse
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+BOX_TYPES = ('Короба', 'Монопаллеты', 'Суперсейф', 'QR-поставка с коробами')
+FIRST_WAREHOUSE_ID = 100000
+
+
+class FakeSuppliesAPI:
+    """
+    Локальный стенд API поставок WB (/api/v1/warehouses и /api/v1/acceptance/coefficients).
+
+    Коэффициенты случайных слотов меняются каждые tick секунд; время каждого
+    изменения запоминается, чтобы по нему считать задержку уведомлений.
+    Задержка ответа, доля ошибок 500 и ответов 429 настраиваются.
+    """
+
+    def __init__(self, warehouses: int = 50, days: int = 14, box_types: int = len(BOX_TYPES),
+                 latency: float = 0.0, error_rate: float = 0.0, rate_429: float = 0.0, retry_after: int = 1,
+                 tick: float = 1.0, changes_per_tick: int = 10, seed: Optional[int] = None):
+        """
+        :param warehouses: Число складов в каталоге.
+        :param days: Сколько дней вперёд отдаются слоты (вместе с box_types задаёт размер ответа).
+        :param box_types: Сколько типов поставки у каждого склада.
+        :param latency: Средняя задержка ответа в секундах (±50%).
+        :param error_rate: Доля ответов 500.
+        :param rate_429: Доля ответов 429 с заголовком Retry-After.
+        :param retry_after: Значение Retry-After в секундах.
+        :param tick: Период изменения коэффициентов в секундах.
+        :param changes_per_tick: Сколько слотов меняется за один период.
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.tick = tick
+        self.changes_per_tick = changes_per_tick
+        self.random = random.Random(seed)
+
+        self.names = {FIRST_WAREHOUSE_ID + i: f'Склад {i + 1}' for i in range(warehouses)}
+        today = date.today()
+        self.dates = [(today + timedelta(days=d)).isoformat() for d in range(days)]
+        self.box_types = BOX_TYPES[:box_types]
+
+        self._lock = Lock()
+        self._slots: Dict[Tuple[int, str, str], int] = {
+            (warehouse_id, box_type, day): self._random_coefficient()
+            for warehouse_id in self.names for box_type in self.box_types for day in self.dates
+        }
+        self._keys = list(self._slots)
+        self.events: Dict[str, List[float]] = {}  # «название|дата» -> моменты изменений
+        self.requests: Dict[str, int] = {}
+        self.statuses: Dict[int, int] = {}
+        self._running = False
+
+    def _random_coefficient(self) -> int:
+        # Приёмка чаще закрыта или платная, бесплатные слоты редки
+        return self.random.choices((-1, 0, 1, 2, 5, 10, 20), weights=(30, 5, 5, 10, 20, 15, 15))[0]
+
+    def start(self) -> None:
+        self._running = True
+        Thread(target=self._mutate, name='fake-wb-mutator', daemon=True).start()
+
+    def stop(self) -> None:
+        self._running = False
+
+    def _mutate(self) -> None:
+        while self._running:
+            time.sleep(self.tick)
+            now = time.time()
+            with self._lock:
+                for key in self.random.sample(self._keys, min(self.changes_per_tick, len(self._keys))):
+                    coefficient = self._random_coefficient()
+                    if coefficient == self._slots[key]:
+                        continue
+                    self._slots[key] = coefficient
+                    warehouse_id, _, day = key
+                    self.events.setdefault(f'{self.names[warehouse_id]}|{day}', []).append(now)
+
+    def warehouses(self) -> List[Dict[str, Any]]:
+        return [
+            {'ID': warehouse_id, 'name': name, 'address': f'{name}, ул. Складская, 1', 'workTime': '24/7', 'acceptsQR': True}
+            for warehouse_id, name in self.names.items()
+        ]
+
+    def coefficients(self, warehouse_ids: Optional[List[int]]) -> List[Dict[str, Any]]:
+        wanted = set(warehouse_ids) if warehouse_ids else None
+        with self._lock:
+            return [
+                {
+                    'date': f'{day}T00:00:00Z',
+                    'coefficient': coefficient,
+                    'warehouseID': warehouse_id,
+                    'warehouseName': self.names[warehouse_id],
+                    'boxTypeName': box_type,
+                    'boxTypeID': self.box_types.index(box_type) + 1,
+                }
+                for (warehouse_id, box_type, day), coefficient in self._slots.items()
+                if wanted is None or warehouse_id in wanted
+            ]
+
+    def count(self, endpoint: str, status: int) -> None:
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'requests': dict(self.requests), 'statuses': dict(self.statuses), 'events': dict(self.events)}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, как у настоящего API
+
+    def do_GET(self) -> None:
+        api = self.server.api
+        url = urlparse(self.path)
+        if url.path == '/_bench/stats':
+            return self._reply(200, api.stats())
+
+        endpoint = {'/api/v1/warehouses': 'warehouses', '/api/v1/acceptance/coefficients': 'coefficients'}.get(url.path)
+        if endpoint is None:
+            return self._reply(404, {'title': 'not found'})
+        if api.latency:
+            time.sleep(api.random.uniform(api.latency * 0.5, api.latency * 1.5))
+
+        roll = api.random.random()
+        if roll < api.rate_429:
+            api.count(endpoint, 429)
+            return self._reply(429, {'title': 'too many requests'}, {'Retry-After': str(api.retry_after)})
+        if roll < api.rate_429 + api.error_rate:
+            api.count(endpoint, 500)
+            return self._reply(500, {'title': 'internal server error'})
+
+        api.count(endpoint, 200)
+        if endpoint == 'warehouses':
+            return self._reply(200, api.warehouses())
+        ids = parse_qs(url.query).get('warehouseIDs')
+        warehouse_ids = [int(i) for i in ids[0].split(',') if i] if ids else None
+        return self._reply(200, api.coefficients(warehouse_ids))
+
+    def _reply(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def serve(api: FakeSuppliesAPI, port: int = 0) -> ThreadingHTTPServer:
+    """Запускает стенд в фоновом потоке; фактический порт — server.server_port."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    server.api = api
+    api.start()
+    Thread(target=server.serve_forever, name='fake-wb-api', daemon=True).start()
+    return server
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--warehouses', type=int, default=50, help='складов в каталоге')
+    parser.add_argument('--days', type=int, default=14, help='дней слотов в ответе')
+    parser.add_argument('--box-types', type=int, default=len(BOX_TYPES), help='типов поставки у склада')
+    parser.add_argument('--wb-latency', type=float, default=0.1, help='средняя задержка ответа API, секунд')
+    parser.add_argument('--wb-error-rate', type=float, default=0.0, help='доля ответов 500')
+    parser.add_argument('--wb-rate-429', type=float, default=0.0, help='доля ответов 429')
+    parser.add_argument('--wb-retry-after', type=int, default=1, help='Retry-After в ответах 429, секунд')
+    parser.add_argument('--tick', type=float, default=1.0, help='период изменения коэффициентов, секунд')
+    parser.add_argument('--changes-per-tick', type=int, default=10, help='слотов меняется за период')
+    parser.add_argument('--seed', type=int, help='зерно генератора случайных чисел')
+
+
+def from_arguments(args: argparse.Namespace) -> FakeSuppliesAPI:
+    return FakeSuppliesAPI(
+        warehouses=args.warehouses, days=args.days, box_types=args.box_types,
+        latency=args.wb_latency, error_rate=args.wb_error_rate, rate_429=args.wb_rate_429,
+        retry_after=args.wb_retry_after, tick=args.tick, changes_per_tick=args.changes_per_tick, seed=args.seed,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Локальный стенд API поставок WB')
+    parser.add_argument('--port', type=int, default=0, help='порт (0 — любой свободный)')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = serve(from_arguments(args), args.port)
+    print(server.server_port, flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
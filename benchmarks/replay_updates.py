@@ -0,0 +1,152 @@
+import json
+import time
+import argparse
+from collections import Counter
+from threading import Lock, Thread
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from benchmarks.run import percentile
+
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+FIRST_CHAT_ID = 20_000_000
+# Диалог подписки для синтетических чатов (как в bot.Bot.register_handlers)
+DIALOG = ('/start', 'Ввести название склада', 'Коледино', '3', 'Короба')
+
+
+def load_updates(path: str) -> List[Dict[str, Any]]:
+    """
+    Записанные обновления Telegram: JSON Lines (по обновлению на строку),
+    ответ getUpdates ({"ok": true, "result": [...]}) или JSON-массив.
+    """
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(data, list):
+        return data
+    return data['result'] if 'result' in data else [data]
+
+
+def synthetic_updates(chats: int, dialog=DIALOG) -> List[Dict[str, Any]]:
+    """Каждый из chats чатов проходит диалог подписки; сообщения чатов перемешаны по шагам диалога."""
+    updates = []
+    now = int(time.time())
+    for step, text in enumerate(dialog):
+        for i in range(chats):
+            chat_id = FIRST_CHAT_ID + i
+            user = {'id': chat_id, 'is_bot': False, 'first_name': f'User {i}'}
+            message = {'message_id': step + 1, 'date': now, 'chat': {'id': chat_id, 'type': 'private'}, 'from': user, 'text': text}
+            if text.startswith('/'):
+                message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]
+            updates.append({'update_id': len(updates) + 1, 'message': message})
+    return updates
+
+
+def chat_id(update: Dict[str, Any]) -> Optional[int]:
+    for key in ('message', 'edited_message', 'channel_post', 'callback_query'):
+        payload = update.get(key)
+        if payload:
+            chat = payload.get('chat') or (payload.get('message') or {}).get('chat') or {}
+            return chat.get('id')
+    return None
+
+
+def repeated(updates: List[Dict[str, Any]], times: int) -> Iterator[Dict[str, Any]]:
+    """Повторяет запись times раз с новыми update_id."""
+    update_id = 0
+    for _ in range(times):
+        for update in updates:
+            update_id += 1
+            yield dict(update, update_id=update_id)
+
+
+class Replay:
+    """Отправка обновлений на вебхук: обновления одного чата идут по порядку из одного потока."""
+
+    def __init__(self, url: str, secret: Optional[str], concurrency: int, rate: float, timeout: float = 10):
+        self.url = url
+        self.secret = secret
+        self.concurrency = max(1, concurrency)
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self.timeout = timeout
+        self._lock = Lock()
+        self._next_slot = 0.0
+        self.statuses: Counter = Counter()
+        self.latencies: List[float] = []
+
+    def _pace(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        time.sleep(max(0.0, slot - now))
+
+    def post(self, update: Dict[str, Any]) -> None:
+        headers = {'Content-Type': 'application/json'}
+        if self.secret:
+            headers[SECRET_HEADER] = self.secret
+        request = Request(self.url, data=json.dumps(update).encode('utf-8'), headers=headers, method='POST')
+        self._pace()
+        started = time.perf_counter()
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                status = str(response.status)
+        except HTTPError as e:
+            status = str(e.code)
+        except (URLError, OSError) as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.statuses[status] += 1
+            self.latencies.append(elapsed)
+
+    def run(self, updates: Iterator[Dict[str, Any]]) -> float:
+        """Отправляет все обновления и возвращает длительность прогона в секундах."""
+        lanes: List[List[Dict[str, Any]]] = [[] for _ in range(self.concurrency)]
+        for update in updates:
+            key = chat_id(update)
+            lanes[hash(key if key is not None else update.get('update_id')) % self.concurrency].append(update)
+
+        started = time.perf_counter()
+        threads = [Thread(target=lambda lane=lane: [self.post(update) for update in lane]) for lane in lanes if lane]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Проигрывание записанных обновлений Telegram на вебхук бота')
+    parser.add_argument('--url', default='http://127.0.0.1:8443/telegram', help='адрес вебхука')
+    parser.add_argument('--secret', help='секрет X-Telegram-Bot-Api-Secret-Token (WEBHOOK_SECRET бота)')
+    parser.add_argument('--file', help='записанные обновления: JSON Lines, ответ getUpdates или массив')
+    parser.add_argument('--chats', type=int, default=100, help='без --file: число синтетических чатов, проходящих диалог подписки')
+    parser.add_argument('--repeat', type=int, default=1, help='сколько раз повторить запись')
+    parser.add_argument('--concurrency', type=int, default=8, help='одновременных отправителей')
+    parser.add_argument('--rate', type=float, default=0, help='обновлений в секунду (0 — без ограничения)')
+    args = parser.parse_args()
+
+    updates = load_updates(args.file) if args.file else synthetic_updates(args.chats)
+    replay = Replay(args.url, args.secret, args.concurrency, args.rate)
+    duration = replay.run(repeated(updates, args.repeat))
+
+    latencies = sorted(replay.latencies)
+    total = len(latencies)
+    print(f'Отправлено: {total} за {duration:.2f} с ({total / duration if duration else 0:.0f} в секунду)')
+    print('Ответы: ' + ', '.join(f'{status}: {count}' for status, count in sorted(replay.statuses.items())))
+    if latencies:
+        print('Задержка ответа, мс: ' + ', '.join(
+            f'p{p}={percentile(latencies, p) * 1000:.1f}' for p in (50, 90, 99)) + f', max={latencies[-1] * 1000:.1f}')
+
+
+if __name__ == '__main__':
+    main()
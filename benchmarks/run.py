@@ -0,0 +1,312 @@
+import os
+import re
+import sys
+import json
+import math
+import time
+import random
+import logging
+import argparse
+import importlib
+import subprocess
+import multiprocessing
+from bisect import bisect_right
+from datetime import datetime
+from threading import active_count
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.request import urlopen
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+from benchmarks import fake_telegram, fake_wb_api
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+TARGETS = ('bot', 'bot_redis')
+TELEGRAM_TOKEN = '123456:benchmark'
+WB_TOKEN = 'benchmark-wb-token'
+ADMIN_CHANNEL_ID = '-1000000000001'
+FIRST_USER_ID = 10_000_000
+
+# Строка уведомления: «Склад: X\nДата: 18.10.2026» (bot) или «Склад: X, Дата: 2026-10-18» (bot_redis)
+NOTIFICATION = re.compile(r'Склад: (?P<warehouse>[^,\n]+)[,\n]\s*Дата: (?P<date>[\d.-]+)')
+
+# (ID пользователя, ID склада, название склада, максимальный коэффициент, тип поставки)
+User = Tuple[int, int, str, int, str]
+
+
+def _serve_stand(module_name: str, args: argparse.Namespace, conn) -> None:
+    """Тело процесса стенда: запускает сервер, сообщает порт и ждёт команды остановки."""
+    module = importlib.import_module(module_name)
+    server = module.serve(module.from_arguments(args))
+    conn.send(server.server_port)
+    conn.recv()
+    server.shutdown()
+
+
+class Stand:
+    """Стенд (заглушка API) в отдельном процессе, чтобы его CPU не попадал в замеры бота."""
+
+    def __init__(self, module_name: str, args: argparse.Namespace):
+        context = multiprocessing.get_context('spawn')
+        self._conn, child = context.Pipe()
+        self.process = context.Process(target=_serve_stand, args=(module_name, args, child), daemon=True)
+        self.process.start()
+        if not self._conn.poll(30):
+            self.process.terminate()
+            raise RuntimeError(f'Стенд {module_name} не запустился')
+        self.url = f'http://127.0.0.1:{self._conn.recv()}'
+
+    def stats(self) -> Dict[str, Any]:
+        with urlopen(f'{self.url}/_bench/stats', timeout=30) as response:
+            return json.load(response)
+
+    def stop(self) -> None:
+        self._conn.send(None)
+        self.process.join(5)
+
+
+class BotDriver:
+    """Прогон wb_zero_supply.bot.Bot: подписки добавляются напрямую, минуя диалог."""
+
+    def __init__(self, args: argparse.Namespace, telegram_url: str):
+        from wb_zero_supply.bot import Bot
+        self.bot = Bot(TELEGRAM_TOKEN, WB_TOKEN, ADMIN_CHANNEL_ID, mode=args.mode,
+                       telegram_base_url=telegram_url, poll_interval=args.interval, persist=False)
+
+    def start(self, users: List[User]) -> None:
+        for user_id, warehouse_id, warehouse_name, max_coefficient, box_type_name in users:
+            self.bot.add_subscription(user_id, warehouse_id, warehouse_name, max_coefficient, box_type_name)
+        self.bot.launch()
+
+    def stop(self) -> None:
+        self.bot.stop()
+
+
+class BotRedisDriver:
+    """Прогон wb_zero_supply.bot_redis: по задаче JobQueue на пользователя, данные пользователей в Redis."""
+
+    def __init__(self, args: argparse.Namespace, telegram_url: str):
+        from telegram.ext import Updater
+        from wb_zero_supply import bot_redis
+        if not bot_redis.redis_manager_user.check_connection():
+            raise SystemExit('Redis недоступен: для прогона bot_redis задайте REDIS_URL (лучше отдельную базу).')
+
+        self.bot_redis = bot_redis
+        self.interval = args.interval
+        self.random = random.Random(args.seed)
+        self.updater = Updater(TELEGRAM_TOKEN, use_context=True, base_url=telegram_url)
+        self.updater.dispatcher.bot_data['token_api_wb'] = WB_TOKEN
+        self.user_ids: List[int] = []
+
+    def start(self, users: List[User]) -> None:
+        for user_id, warehouse_id, warehouse_name, max_coefficient, _ in users:
+            self.bot_redis.redis_manager_user.set_user_data(str(user_id), {
+                'warehouse_wb': {warehouse_name: warehouse_id},
+                'max_degree': max_coefficient,
+            })
+            # Пользователи подписываются в разное время, поэтому первый запуск задач разнесён
+            self.updater.job_queue.run_repeating(
+                self.bot_redis.send_data, interval=self.interval, first=self.random.uniform(0, self.interval),
+                context=user_id, name=f'data_fetcher_{user_id}',
+            )
+            self.user_ids.append(user_id)
+        self.updater.job_queue.start()
+
+    def stop(self) -> None:
+        self.updater.job_queue.stop()
+        for user_id in self.user_ids:
+            self.bot_redis.redis_manager_user.delete_user_data(str(user_id))
+
+
+DRIVERS = {'bot': BotDriver, 'bot_redis': BotRedisDriver}
+
+
+def synthetic_users(args: argparse.Namespace) -> List[User]:
+    """
+    Подписки пользователей с неравномерным спросом: популярные склады выбирают чаще (распределение Ципфа).
+
+    У каждого пользователя --subscriptions подписок на разные пары (склад, тип поставки).
+    """
+    rng = random.Random(args.seed)
+    warehouses = [(fake_wb_api.FIRST_WAREHOUSE_ID + i, f'Склад {i + 1}') for i in range(args.warehouses)]
+    weights = [1 / (rank + 1) for rank in range(len(warehouses))]
+    box_types = fake_wb_api.BOX_TYPES[:args.box_types]
+    box_weights = (6, 3, 1, 1)[:len(box_types)]
+    per_user = min(args.subscriptions, len(warehouses) * len(box_types))
+    users = []
+    for i in range(args.users):
+        chosen = set()
+        while len(chosen) < per_user:
+            warehouse_id, warehouse_name = rng.choices(warehouses, weights)[0]
+            box_type_name = rng.choices(box_types, box_weights)[0]
+            if (warehouse_id, box_type_name) not in chosen:
+                chosen.add((warehouse_id, box_type_name))
+                users.append((FIRST_USER_ID + i, warehouse_id, warehouse_name, rng.choice((0, 1, 2, 5)), box_type_name))
+    return users
+
+
+def rss_bytes() -> Optional[int]:
+    """Текущий RSS процесса (Linux), иначе None."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Перцентиль по ближайшему рангу для отсортированного списка."""
+    if not values:
+        return None
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def notification_latencies(messages: List[List[Any]], events: Dict[str, List[float]], since: float) -> List[float]:
+    """
+    Задержки уведомлений: от изменения слота на стенде WB до получения сообщения заглушкой Telegram.
+
+    Сообщению сопоставляется последнее изменение его слота (склад и дата) до момента получения.
+    """
+    latencies = []
+    for received, _, text in messages:
+        for match in NOTIFICATION.finditer(text):
+            day = match['date']
+            if '.' in day:
+                d, m, y = day.split('.')
+                day = f'{y}-{m}-{d}'
+            times = events.get(f"{match['warehouse']}|{day}")
+            if not times:
+                continue
+            i = bisect_right(times, received)
+            if i and times[i - 1] >= since:
+                latencies.append(received - times[i - 1])
+    return sorted(latencies)
+
+
+def version_info() -> Dict[str, Any]:
+    """Версия пакета и коммит, на котором сделан замер."""
+    info: Dict[str, Any] = {'python': sys.version.split()[0]}
+    if tomllib is not None:
+        with open(os.path.join(ROOT, 'pyproject.toml'), 'rb') as f:
+            info['package'] = tomllib.load(f)['tool']['poetry']['version']
+    try:
+        info['commit'] = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                        text=True, check=True).stdout.strip()
+        info['dirty'] = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                                            capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        info['commit'] = None
+    return info
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    wb = Stand('benchmarks.fake_wb_api', args)
+    telegram = Stand('benchmarks.fake_telegram', args)
+    try:
+        # Адрес API читается при импорте модулей бота, поэтому окружение задаётся до импорта
+        os.environ['WB_SUPPLIES_API_URL'] = wb.url
+        os.environ['WB_CATALOG_SNAPSHOT'] = ''
+        os.environ['WB_HISTORY_DIR'] = ''
+        if args.rate_limits:
+            os.environ['WB_RATE_LIMITS'] = args.rate_limits
+
+        users = synthetic_users(args)
+        started = time.monotonic()
+        driver = DRIVERS[args.target](args, f'{telegram.url}/bot')
+        startup = time.monotonic() - started
+
+        since = time.time()
+        cpu_started = time.process_time()
+        started = time.monotonic()
+        driver.start(users)
+        rss_peak = rss_bytes() or 0
+        while time.monotonic() - started < args.duration:
+            time.sleep(1)
+            rss_peak = max(rss_peak, rss_bytes() or 0)
+        elapsed = time.monotonic() - started
+        cpu = time.process_time() - cpu_started
+        threads = active_count()
+        rss_end = rss_bytes()
+        driver.stop()
+
+        wb_stats = wb.stats()
+        telegram_stats = telegram.stats()
+    finally:
+        wb.stop()
+        telegram.stop()
+
+    latencies = notification_latencies(telegram_stats['messages'], wb_stats['events'], since)
+    api_calls = sum(wb_stats['requests'].values())
+    params = {key: value for key, value in vars(args).items() if key not in ('output', 'label')}
+    return {
+        'label': args.label,
+        'started_at': datetime.fromtimestamp(since).isoformat(timespec='seconds'),
+        'version': version_info(),
+        'params': params,
+        'metrics': {
+            'startup_seconds': round(startup, 3),
+            'duration_seconds': round(elapsed, 3),
+            'api_calls': api_calls,
+            'api_calls_per_sec': round(api_calls / elapsed, 3),
+            'api_statuses': wb_stats['statuses'],
+            'messages_sent': len(telegram_stats['messages']),
+            'telegram_429': telegram_stats['rejected'],
+            'notifications': len(latencies),
+            'latency_p50': percentile(latencies, 50),
+            'latency_p90': percentile(latencies, 90),
+            'latency_p99': percentile(latencies, 99),
+            'latency_max': latencies[-1] if latencies else None,
+            'cpu_seconds': round(cpu, 3),
+            'cpu_percent': round(100 * cpu / elapsed, 1),
+            'rss_mb_peak': round(rss_peak / 2 ** 20, 1) if rss_peak else None,
+            'rss_mb_end': round(rss_end / 2 ** 20, 1) if rss_end else None,
+            'threads': threads,
+        },
+    }
+
+
+def save(result: Dict[str, Any], directory: str) -> str:
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    commit = result['version'].get('commit') or 'nogit'
+    name = result['label'] or f"{result['params']['target']}-{result['params']['users']}u"
+    path = os.path.join(directory, f'{stamp}-{name}-{commit}.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Нагрузочный прогон бота на локальных заглушках WB и Telegram')
+    parser.add_argument('--target', choices=TARGETS, default='bot', help='что нагружать')
+    parser.add_argument('--mode', choices=('scheduler', 'asyncio'), default='scheduler', help='движок мониторинга Bot')
+    parser.add_argument('--users', type=int, default=1000, help='синтетических пользователей')
+    parser.add_argument('--subscriptions', type=int, default=1, help='подписок у пользователя (bot_redis поддерживает одну)')
+    parser.add_argument('--duration', type=float, default=60, help='длительность замера, секунд')
+    parser.add_argument('--interval', type=float, default=11, help='период опроса API, секунд')
+    parser.add_argument('--rate-limits', help='WB_RATE_LIMITS на время прогона, например "coefficients=60/60"')
+    parser.add_argument('--label', help='имя прогона в файле результатов')
+    parser.add_argument('--output', default=RESULTS_DIR, help='каталог результатов')
+    parser.add_argument('--verbose', action='store_true', help='показывать журнал бота')
+    fake_wb_api.add_arguments(parser)
+    fake_telegram.add_arguments(parser)
+    args = parser.parse_args()
+    if args.target == 'bot_redis' and args.subscriptions != 1:
+        parser.error('bot_redis поддерживает одну подписку на пользователя')
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                        level=logging.INFO if args.verbose else logging.ERROR)
+    result = run(args)
+    path = save(result, args.output)
+    for key, value in result['metrics'].items():
+        print(f'{key:>20}: {value}')
+    print(f'Результаты сохранены в {path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+import signal
+import argparse
+import statistics
+import subprocess
+from datetime import datetime
+from typing import Any, Dict, List
+
+from benchmarks import fake_telegram, fake_wb_api
+from benchmarks.run import ADMIN_CHANNEL_ID, RESULTS_DIR, ROOT, TELEGRAM_TOKEN, WB_TOKEN, Stand, save, version_info
+
+
+STARTUP_BUDGET = 3.0  # секунд от запуска процесса до первого getUpdates
+UNREACHABLE_REDIS_URL = 'redis://127.0.0.1:1'  # порт, на котором Redis заведомо нет
+IMPORT_CODE = 'import time; started = time.perf_counter(); import wb_zero_supply.bot; print(time.perf_counter() - started)'
+
+
+def bot_environment(args: argparse.Namespace, wb_url: str, telegram_url: str) -> Dict[str, str]:
+    """Окружение процесса бота: адреса заглушек, без снимка каталога и истории."""
+    env = dict(os.environ)
+    env.update({
+        'TELEGRAM_TOKEN': TELEGRAM_TOKEN,
+        'WB_API_SUPPLY': WB_TOKEN,
+        'ADMIN_CHANNEL_ID': ADMIN_CHANNEL_ID,
+        'TELEGRAM_API_URL': f'{telegram_url}/bot',
+        'WB_SUPPLIES_API_URL': wb_url,
+        'WB_CATALOG_SNAPSHOT': args.snapshot or '',
+        'WB_HISTORY_DIR': '',
+        'REDIS_URL': args.redis_url,
+        'BOT_MODE': args.mode,
+        'PYTHONPATH': os.pathsep.join(filter(None, (ROOT, env.get('PYTHONPATH')))),
+    })
+    if not args.verbose:
+        env['LOG_LEVEL'] = 'ERROR'
+    return env
+
+
+def measure_import(env: Dict[str, str]) -> float:
+    """Время импорта wb_zero_supply.bot в чистом интерпретаторе."""
+    output = subprocess.run([sys.executable, '-c', IMPORT_CODE], env=env, cwd=ROOT, capture_output=True,
+                            text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_startup(env: Dict[str, str], telegram: Stand, timeout: float) -> float:
+    """Секунды от запуска процесса бота до его первого getUpdates."""
+    started = time.time()
+    process = subprocess.Popen([sys.executable, '-m', 'wb_zero_supply.bot'], env=env, cwd=ROOT)
+    try:
+        while time.time() - started < timeout:
+            first_call = telegram.stats()['first_calls'].get('getUpdates')
+            if first_call is not None and first_call >= started:
+                return first_call - started
+            if process.poll() is not None:
+                raise RuntimeError(f'Бот завершился с кодом {process.returncode} до первого getUpdates')
+            time.sleep(0.02)
+        raise RuntimeError(f'Бот не начал принимать обновления за {timeout:.0f} с')
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    since = time.time()
+    wb = Stand('benchmarks.fake_wb_api', args)
+    startups: List[float] = []
+    try:
+        env = bot_environment(args, wb.url, '')
+        import_seconds = measure_import(env)
+        for _ in range(args.runs):
+            # Новая заглушка Telegram на каждый прогон: первый getUpdates считается заново
+            telegram = Stand('benchmarks.fake_telegram', args)
+            try:
+                env = bot_environment(args, wb.url, telegram.url)
+                startups.append(measure_startup(env, telegram, args.timeout))
+            finally:
+                telegram.stop()
+    finally:
+        wb.stop()
+
+    params = {key: value for key, value in vars(args).items() if key not in ('output', 'label', 'verbose')}
+    params['target'] = 'startup'
+    return {
+        'label': args.label or f'startup-{args.mode}',
+        'started_at': datetime.fromtimestamp(since).isoformat(timespec='seconds'),
+        'version': version_info(),
+        'params': params,
+        'metrics': {
+            'import_seconds': round(import_seconds, 3),
+            'startup_seconds': round(statistics.median(startups), 3),
+            'startup_seconds_max': round(max(startups), 3),
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Замер времени запуска бота: от старта процесса до первого getUpdates')
+    parser.add_argument('--budget', type=float, default=STARTUP_BUDGET,
+                        help='допустимое время запуска (медиана), секунд; при превышении код выхода 1')
+    parser.add_argument('--runs', type=int, default=5, help='число запусков бота')
+    parser.add_argument('--mode', choices=('scheduler', 'asyncio'), default='scheduler', help='движок мониторинга')
+    parser.add_argument('--snapshot', help='файл снимка каталога складов (по умолчанию снимка нет, каталог грузится из API)')
+    parser.add_argument('--redis-url', default=os.getenv('REDIS_URL', UNREACHABLE_REDIS_URL),
+                        help='Redis бота (по умолчанию недоступный адрес: запуск не должен ждать Redis)')
+    parser.add_argument('--timeout', type=float, default=60, help='сколько ждать первого getUpdates, секунд')
+    parser.add_argument('--label', help='имя прогона в файле результатов')
+    parser.add_argument('--output', default=RESULTS_DIR, help='каталог результатов')
+    parser.add_argument('--verbose', action='store_true', help='показывать журнал бота')
+    fake_wb_api.add_arguments(parser)
+    fake_telegram.add_arguments(parser)
+    # Медленный API WB: запуск не должен от него зависеть
+    parser.set_defaults(wb_latency=10.0)
+    args = parser.parse_args()
+
+    result = run(args)
+    path = save(result, args.output)
+    for key, value in result['metrics'].items():
+        print(f'{key:>20}: {value}')
+    print(f'Результаты сохранены в {path}')
+    if result['metrics']['startup_seconds'] > args.budget:
+        print(f"Время запуска {result['metrics']['startup_seconds']} с превышает бюджет {args.budget} с")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
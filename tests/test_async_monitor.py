@@ -0,0 +1,96 @@
+import asyncio
+import unittest
+from unittest import mock
+import requests
+from wb_zero_supply import AsyncMonitor as async_monitor
+from wb_zero_supply import CircuitBreaker as circuit_breaker
+
+
+class FakeResponse:
+    def __init__(self, status, headers=None, body=b'[]'):
+        self.status = status
+        self.headers = headers or {}
+        self.url = async_monitor.COEFFICIENTS_URL
+        self.body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def read(self):
+        return self.body
+
+
+class FakeSession:
+    """Отдаёт заранее заданные ответы по очереди и запоминает токены запросов."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.tokens = []
+
+    def get(self, url, params, headers):
+        self.tokens.append(headers['Authorization'].split()[-1])
+        return self.responses.pop(0)
+
+
+@unittest.skipIf(async_monitor.aiohttp is None, 'нужен aiohttp: poetry install -E async')
+class FetchRetryTest(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(circuit_breaker._breakers.pop, 'coefficients', None)
+        self.pauses = []
+        patcher = mock.patch.object(async_monitor.asyncio, 'sleep', self.sleep)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def sleep(self, delay):
+        # Паузы только запоминаются: квота токена после 429 освобождается через 10 с
+        if delay > 0:
+            self.pauses.append(delay)
+
+    def fetch(self, token, session):
+        monitor = async_monitor.AsyncMonitor(token, lambda delivery: None, lambda keys, error: None)
+        self.addCleanup(monitor._executor.shutdown)
+        self.addCleanup(monitor._process_executor.shutdown)
+
+        async def run():
+            monitor._loop = asyncio.get_running_loop()
+            return await monitor.fetch(session, [1, 2])
+        return asyncio.run(run())
+
+    def test_server_errors_are_retried(self):
+        session = FakeSession(FakeResponse(503), FakeResponse(502), FakeResponse(200, body=b'[1]'))
+        self.assertEqual(self.fetch('async-5xx', session), b'[1]')
+        self.assertEqual(len(session.tokens), 3)
+        self.assertEqual(self.pauses, [0.5, 1.0])
+        self.assertEqual(circuit_breaker.get_breaker('coefficients').state, circuit_breaker.CLOSED)
+
+    def test_server_error_after_all_retries_is_raised(self):
+        session = FakeSession(*(FakeResponse(500) for _ in range(3)))
+        with self.assertRaises(requests.HTTPError) as raised:
+            self.fetch('async-5xx-final', session)
+        self.assertEqual(raised.exception.response.status_code, 500)
+        self.assertEqual(session.responses, [])
+
+    def test_rate_limited_request_is_retried_after_retry_after(self):
+        session = FakeSession(FakeResponse(429, {'Retry-After': '0'}), FakeResponse(200, body=b'[2]'))
+        self.assertEqual(self.fetch('async-429', session), b'[2]')
+        self.assertEqual(session.responses, [])
+        self.assertEqual(len(self.pauses), 1)
+
+    def test_rate_limit_gives_up_after_max_retries(self):
+        session = FakeSession(*(FakeResponse(429, {'Retry-After': '0'}) for _ in range(4)))
+        with self.assertRaises(requests.HTTPError) as raised:
+            self.fetch('async-429-final', session)
+        self.assertEqual(raised.exception.response.status_code, 429)
+        self.assertEqual(session.responses, [])
+
+    def test_unauthorized_token_fails_over(self):
+        session = FakeSession(FakeResponse(401), FakeResponse(200, body=b'[3]'))
+        self.assertEqual(self.fetch('async-bad,async-good', session), b'[3]')
+        self.assertEqual(session.tokens, ['async-bad', 'async-good'])
+
+
+if __name__ == '__main__':
+    unittest.main()
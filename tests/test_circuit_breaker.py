@@ -0,0 +1,114 @@
+import unittest
+from unittest import mock
+from wb_zero_supply import CircuitBreaker as circuit_breaker
+from wb_zero_supply.CircuitBreaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from wb_zero_supply.Metrics import collect_stats
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('wb_zero_supply.CircuitBreaker.time.monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker('test', failure_threshold=3, recovery_timeout=60, max_recovery_timeout=200)
+
+    def trip(self):
+        for _ in range(3):
+            self.breaker.allow()
+            self.breaker.record(503)
+
+    def test_opens_after_threshold_of_consecutive_failures(self):
+        self.breaker.record(500)
+        self.breaker.record(500)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.breaker.record(500)
+        self.assertEqual(self.breaker.state, OPEN)
+        with self.assertRaises(CircuitOpenError) as raised:
+            self.breaker.allow()
+        self.assertEqual(raised.exception.retry_in, 60)
+        self.assertEqual(self.breaker.stats()['rejected'], 1)
+
+    def test_success_resets_failure_count(self):
+        self.breaker.record(500)
+        self.breaker.record(500)
+        self.breaker.record(200)
+        self.breaker.record(500)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_client_errors_are_not_failures(self):
+        for status in (400, 401, 429, 429, 429):
+            self.breaker.record(status)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_closed_open_half_open_closed(self):
+        self.trip()
+        self.clock.now += 59
+        self.assertRaises(CircuitOpenError, self.breaker.allow)
+        self.clock.now += 1
+        self.breaker.allow()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.breaker.record(200)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.breaker.allow()
+
+    def test_half_open_lets_through_single_probe(self):
+        self.trip()
+        self.clock.now += 60
+        self.breaker.allow()
+        self.assertRaises(CircuitOpenError, self.breaker.allow)
+        self.breaker.cancel()
+        self.breaker.allow()
+
+    def test_failed_probe_doubles_timeout_up_to_limit(self):
+        self.trip()
+        timeouts = []
+        for _ in range(3):
+            self.clock.now += self.breaker.retry_in()
+            self.breaker.allow()
+            self.breaker.record(502)
+            self.assertEqual(self.breaker.state, OPEN)
+            timeouts.append(self.breaker.retry_in())
+        self.assertEqual(timeouts, [120, 200, 200])
+
+    def test_successful_probe_resets_timeout(self):
+        self.trip()
+        self.clock.now += 60
+        self.breaker.allow()
+        self.breaker.record(502)
+        self.clock.now += 120
+        self.breaker.allow()
+        self.breaker.record(200)
+        self.trip()
+        self.assertEqual(self.breaker.retry_in(), 60)
+
+    def test_listeners_see_every_transition(self):
+        transitions = []
+        listener = lambda name, previous, state: transitions.append((name, previous, state))
+        circuit_breaker.add_listener(listener)
+        self.addCleanup(circuit_breaker.remove_listener, listener)
+        self.trip()
+        self.clock.now += 60
+        self.breaker.allow()
+        self.breaker.record(200)
+        self.assertEqual(transitions, [('test', CLOSED, OPEN), ('test', OPEN, HALF_OPEN), ('test', HALF_OPEN, CLOSED)])
+
+
+class BreakerStatsTest(unittest.TestCase):
+    def test_breakers_are_exposed_in_stats(self):
+        breaker = circuit_breaker.get_breaker('stats-endpoint')
+        breaker.record(500)
+        stats = collect_stats()['circuits']['stats-endpoint']
+        self.assertEqual((stats['state'], stats['failures'], stats['retry_in']), (CLOSED, 1, 0.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
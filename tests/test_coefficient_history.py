@@ -0,0 +1,57 @@
+import glob
+import os
+import tempfile
+import time
+import unittest
+from wb_zero_supply.CoefficientHistory import CoefficientHistory
+from wb_zero_supply.CoefficientRecord import parse_day
+from wb_zero_supply.SnapshotDiff import SlotChange
+
+
+def change(warehouse_id, coefficient):
+    return SlotChange((warehouse_id, 'Короба', parse_day('2024-10-01')), None, coefficient)
+
+
+class CompactionTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+
+    def segments(self):
+        return glob.glob(os.path.join(self.directory, 'segment-*.bin'))
+
+    def test_rows_are_flushed_by_time(self):
+        history = CoefficientHistory(self.directory, compact_interval=0.05)
+        self.addCleanup(history.stop)
+        history.start()
+        history.record([change(1, 0), change(2, 3)], timestamp=1727740800)
+        deadline = time.monotonic() + 5
+        while not self.segments() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(self.segments()), 1)
+        self.assertEqual(len(history), 0)
+
+    def test_empty_interval_writes_no_segment(self):
+        history = CoefficientHistory(self.directory, compact_interval=0.01)
+        history.start()
+        time.sleep(0.05)
+        history.stop()
+        self.assertEqual(self.segments(), [])
+
+    def test_stop_flushes_remaining_rows(self):
+        history = CoefficientHistory(self.directory, compact_interval=3600)
+        history.start()
+        history.record([change(1, 0)], timestamp=1727740800)
+        history.stop()
+        self.assertEqual(len(self.segments()), 1)
+
+    def test_memory_only_history_starts_no_thread(self):
+        history = CoefficientHistory(None, compact_interval=0.01)
+        history.start()
+        self.assertIsNone(history._thread)
+        history.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
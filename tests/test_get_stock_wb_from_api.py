@@ -0,0 +1,41 @@
+import json
+import unittest
+from unittest import mock
+import requests
+from wb_zero_supply import get_stock_wb_from_api as api
+from wb_zero_supply.CoefficientRecord import CoefficientRecord
+
+
+def response(status, body=b'[]'):
+    result = requests.Response()
+    result.status_code = status
+    result._content = body
+    result.url = api.COEFFICIENTS_URL
+    result.close = mock.Mock()
+    return result
+
+
+def row(box_type_name, date, coefficient):
+    return {'warehouseID': 1, 'warehouseName': 'Тула', 'boxTypeName': box_type_name, 'date': f'{date}T00:00:00Z', 'coefficient': coefficient}
+
+
+class StreamingRequestTest(unittest.TestCase):
+    def test_http_error_closes_streamed_response(self):
+        failed = response(503)
+        with mock.patch.object(api.http_client, 'get', return_value=failed):
+            with self.assertRaises(requests.HTTPError):
+                list(api.iter_coefficients('token', [1], box_type='Короба'))
+        failed.close.assert_called_once_with()
+
+    def test_filtered_result_needs_no_second_pass(self):
+        rows = [row('Короба', '2024-10-01', 0), row('Монопаллеты', '2024-10-01', 0), row('Короба', '2024-10-02', 5)]
+        body = json.dumps(rows).encode()
+        with mock.patch.object(api.http_client, 'get', return_value=response(200, body)):
+            coefficients = api.get_stock_wb_from_api('token', {'Тула': 1}, box_type='Короба', min_coefficient=0, max_coefficient=1)
+        self.assertEqual(len(coefficients), 1)
+        self.assertIsInstance(coefficients[0], CoefficientRecord)
+        self.assertEqual(api.check_coefficients_in_range(coefficients, max_degree=1), coefficients)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import json
+import unittest
+from unittest import mock
+from wb_zero_supply import get_stock_wb_from_domen as domen
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, url, headers, timeout):
+        self.calls += 1
+        return FakeResponse(json.dumps({'Короба': [{'date': '2024-10-01T00:00:00Z', 'coefficient': 0}]}).encode())
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.session = FakeSession()
+        patcher = mock.patch.object(domen.http_client, 'get_session', return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(domen._cache.clear)
+        domen._cache.clear()
+
+    def test_default_ttl_reuses_recent_response(self):
+        self.assertGreater(domen.CACHE_TTL, 0)
+        first = domen.get_stock_wb_from_domen({'Тула': 1}, 'example.org', 'cookie')
+        second = domen.get_stock_wb_from_domen({'Тула': 1}, 'example.org', 'cookie')
+        self.assertEqual(first, second)
+        self.assertEqual(self.session.calls, 1)
+
+    def test_zero_ttl_disables_cache(self):
+        for _ in range(2):
+            domen.get_stock_wb_from_domen({'Тула': 1}, 'example.org', 'cookie', ttl=0)
+        self.assertEqual(self.session.calls, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from wb_zero_supply.CoefficientRecord import CoefficientRecord, parse_day
+from wb_zero_supply.RedisManager import RedisManagerData
+
+
+class FakeRedis:
+    """Хранилище хэшей в памяти; скрипт дедупликации выполняется так же, как DEDUP_SCRIPT."""
+
+    def __init__(self):
+        self.hashes = {}
+        self.ttl = {}
+
+    def register_script(self, script):
+        def run(keys, args):
+            ttl, new = args[0], []
+            for i, key in enumerate(keys, 1):
+                if key not in self.hashes:
+                    new.append(i)
+                self.hashes[key] = {'type': args[2 * i - 1], 'coefficient': args[2 * i]}
+                self.ttl[key] = ttl
+            return new
+        return run
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+
+def location(warehouse_name='Тула', date='2024-10-01', coefficient=0):
+    return CoefficientRecord(206348, warehouse_name, 'Короба', parse_day(date), coefficient)
+
+
+class RedisManagerDataTest(unittest.TestCase):
+    def setUp(self):
+        self.manager = RedisManagerData()
+        self.manager._redis_client = FakeRedis()
+
+    def test_two_users_on_same_warehouse_are_both_notified(self):
+        slot = location()
+        first = self.manager.process_locations([slot], ttl=60, user_id=1)
+        second = self.manager.process_locations([slot], ttl=60, user_id=2)
+        self.assertEqual(len(first), 1)
+        self.assertEqual(first, second)
+
+    def test_same_user_is_notified_once(self):
+        slot = location()
+        self.assertEqual(len(self.manager.process_locations([slot], ttl=60, user_id=1)), 1)
+        self.assertEqual(self.manager.process_locations([slot], ttl=60, user_id=1), [])
+
+    def test_changed_coefficient_is_new(self):
+        self.manager.process_locations([location(coefficient=0)], ttl=60, user_id=1)
+        self.assertEqual(len(self.manager.process_locations([location(coefficient=1)], ttl=60, user_id=1)), 1)
+
+    def test_duplicates_in_batch_are_reported_once(self):
+        slot = location()
+        self.assertEqual(self.manager.find_new_locations([slot, slot], ttl=60, user_id=1), [slot])
+
+    def test_get_data_reads_user_key(self):
+        self.manager.process_locations([location()], ttl=60, user_id=1)
+        self.assertEqual(self.manager.get_data('Тула', '2024-10-01', 0, user_id=1), {'type': 'Короба', 'coefficient': 0})
+        self.assertIsNone(self.manager.get_data('Тула', '2024-10-01', 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import heapq
+import unittest
+from unittest import mock
+from wb_zero_supply.Scheduler import Scheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class SchedulerBatchingTest(unittest.TestCase):
+    """Сколько запросов (пачек) за цикл опроса отправляет планировщик; время подменено."""
+
+    INTERVAL = 60.0
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('wb_zero_supply.Scheduler.time.monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_cycles(self, scheduler, cycles):
+        """Прогоняет планировщик без потока: [(время, ключи пачки)] за cycles интервалов."""
+        scheduler._running = True
+        started = self.clock.now
+        batches = []
+        while True:
+            while scheduler._heap:
+                due, seq, key = scheduler._heap[0]
+                entry = scheduler._entries.get(key)
+                if entry is not None and entry.seq == seq:
+                    break
+                heapq.heappop(scheduler._heap)
+            due = scheduler._heap[0][0]
+            if due - started >= cycles * self.INTERVAL:
+                return batches
+            self.clock.now = max(self.clock.now, due)
+            keys, _ = scheduler._collect(self.clock.now)
+            batches.append((self.clock.now, keys))
+
+    def make_scheduler(self, units, batch_size=100):
+        scheduler = Scheduler(lambda keys: None, interval=self.INTERVAL, batch_size=batch_size)
+        scheduler._random.seed(1)
+        for key in range(units):
+            scheduler.add(key)
+        return scheduler
+
+    def test_units_below_batch_size_go_in_one_request_per_cycle(self):
+        scheduler = self.make_scheduler(40)
+        batches = self.run_cycles(scheduler, 10)
+        self.assertTrue(all(len(keys) == 40 for _, keys in batches))
+        # Сдвиг ±10% интервала: за 10 интервалов — не больше 12 запусков
+        self.assertLessEqual(len(batches), 12)
+
+    def test_units_added_later_join_existing_request(self):
+        scheduler = self.make_scheduler(10)
+        self.run_cycles(scheduler, 1)
+        for key in range(10, 20):
+            self.clock.now += 7
+            scheduler.add(key)
+        batches = self.run_cycles(scheduler, 10)
+        self.assertTrue(all(len(keys) == 20 for _, keys in batches[1:]))
+
+    def test_units_above_batch_size_need_ceil_requests_per_cycle(self):
+        scheduler = self.make_scheduler(150)
+        batches = self.run_cycles(scheduler, 10)
+        self.assertTrue(all(len(keys) <= 100 for _, keys in batches))
+        self.assertLessEqual(len(batches), 2 * 11)
+        # Свободные места пачки занимают ближайшие по сроку единицы: каждая опрашивается не реже раза за интервал
+        for key in range(150):
+            times = [at for at, keys in batches if key in keys]
+            self.assertGreaterEqual(len(times), 10)
+            self.assertTrue(all(b - a <= 1.1 * self.INTERVAL for a, b in zip(times, times[1:])))
+
+    def test_every_unit_polled_once_per_cycle(self):
+        scheduler = self.make_scheduler(40)
+        batches = self.run_cycles(scheduler, 5)
+        polled = [key for _, keys in batches for key in keys]
+        self.assertEqual(len(set(polled)), 40)
+        for key in range(40):
+            times = [at for at, keys in batches if key in keys]
+            gaps = [b - a for a, b in zip(times, times[1:])]
+            self.assertTrue(all(0.85 * self.INTERVAL <= gap <= 1.1 * self.INTERVAL for gap in gaps), gaps)
+
+
+if __name__ == '__main__':
+    unittest.main()
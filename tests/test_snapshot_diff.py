@@ -0,0 +1,93 @@
+import unittest
+from wb_zero_supply.CoefficientRecord import CoefficientRecord, parse_day
+from wb_zero_supply.SnapshotDiff import SlotChange, SnapshotDiff
+
+
+DAY = parse_day('2024-10-01')
+
+
+def record(warehouse_id, coefficient, box_type_name='Короба', day=DAY):
+    return CoefficientRecord(warehouse_id, f'Склад {warehouse_id}', box_type_name, day, coefficient)
+
+
+class SnapshotDiffTest(unittest.TestCase):
+    def setUp(self):
+        self.diff = SnapshotDiff()
+        self.diff.update([1, 2], [record(1, 0), record(1, 5, day=DAY + 1), record(2, 3)])
+
+    def test_first_response_adds_all_slots(self):
+        diff = SnapshotDiff().update([1], [record(1, 0)])
+        self.assertEqual(diff.added, [SlotChange((1, 'Короба', DAY), None, 0)])
+        self.assertEqual(diff.removed, [])
+        self.assertEqual(diff.changed, [])
+
+    def test_changed_coefficient(self):
+        diff = self.diff.update([1, 2], [record(1, 1), record(1, 5, day=DAY + 1), record(2, 3)])
+        self.assertEqual(diff.changed, [SlotChange((1, 'Короба', DAY), 0, 1)])
+        self.assertFalse(diff.added or diff.removed)
+
+    def test_added_and_removed_slots(self):
+        diff = self.diff.update([1, 2], [record(1, 0), record(1, 2, 'Монопаллеты'), record(2, 3)])
+        self.assertEqual(diff.added, [SlotChange((1, 'Монопаллеты', DAY), None, 2)])
+        self.assertEqual(diff.removed, [SlotChange((1, 'Короба', DAY + 1), 5, None)])
+        self.assertEqual(diff.changed, [])
+
+    def test_identical_response_has_no_changes(self):
+        diff = self.diff.update([1, 2], [record(1, 0), record(1, 5, day=DAY + 1), record(2, 3)])
+        self.assertFalse(diff)
+
+    def test_partial_response_only_touches_requested_warehouses(self):
+        # Склад 2 не запрашивался: его слоты не считаются пропавшими, а чужие строки ответа игнорируются
+        diff = self.diff.update([1], [record(1, 0), record(3, 0)])
+        self.assertEqual(diff.removed, [SlotChange((1, 'Короба', DAY + 1), 5, None)])
+        self.assertFalse(diff.added or diff.changed)
+        self.assertEqual(self.diff.snapshot(2), [SlotChange((2, 'Короба', DAY), None, 3)])
+        self.assertFalse(self.diff.has_snapshot(3))
+
+    def test_empty_response_removes_slots_of_requested_warehouse(self):
+        diff = self.diff.update([2], [])
+        self.assertEqual(diff.removed, [SlotChange((2, 'Короба', DAY), 3, None)])
+
+
+class DigestShortcutTest(unittest.TestCase):
+    BODY = b'[{"warehouseID": 1}]'
+
+    def setUp(self):
+        self.diff = SnapshotDiff()
+        self.diff.update([1, 2], [record(1, 0)], self.BODY)
+
+    def test_same_body_for_same_batch_is_unchanged(self):
+        self.assertTrue(self.diff.is_unchanged([1, 2], self.BODY))
+        self.assertFalse(self.diff.update([1, 2], [record(1, 7)], self.BODY))
+
+    def test_different_body_is_changed(self):
+        self.assertFalse(self.diff.is_unchanged([1, 2], b'[]'))
+
+    def test_same_body_for_different_batch_is_changed(self):
+        self.assertFalse(self.diff.is_unchanged([1], self.BODY))
+        self.assertFalse(self.diff.is_unchanged([1, 2, 3], self.BODY))
+
+    def test_warehouse_moved_to_another_batch_invalidates_old_batch(self):
+        self.diff.update([2, 3], [record(2, 4)], b'other')
+        self.assertFalse(self.diff.is_unchanged([1, 2], self.BODY))
+        diff = self.diff.update([1, 2], [record(1, 0)], self.BODY)
+        self.assertEqual(diff.removed, [SlotChange((2, 'Короба', DAY), 4, None)])
+
+    def test_update_without_body_drops_digest(self):
+        self.diff.update([1, 2], [record(1, 0)])
+        self.assertFalse(self.diff.is_unchanged([1, 2], self.BODY))
+
+    def test_forget_drops_digest_and_snapshot(self):
+        self.diff.forget([1])
+        self.assertFalse(self.diff.is_unchanged([1, 2], self.BODY))
+        self.assertFalse(self.diff.has_snapshot(1))
+        self.assertEqual(len(self.diff._digests), 1)
+
+    def test_restore_drops_digest(self):
+        self.diff.restore({1: {('Короба', DAY): 9}})
+        self.assertFalse(self.diff.is_unchanged([1, 2], self.BODY))
+        self.assertEqual(self.diff.update([1, 2], [record(1, 0)], self.BODY).changed, [SlotChange((1, 'Короба', DAY), 9, 0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+from wb_zero_supply.SubscriptionIndex import SubscriptionIndex
+
+
+BOX = 'Короба'
+PALLET = 'Монопаллеты'
+
+
+class MatchTest(unittest.TestCase):
+    def setUp(self):
+        self.index = SubscriptionIndex()
+        self.index.add(1, 100, 'Тула', BOX, 0)
+        self.index.add(2, 100, 'Тула', BOX, 2)
+        self.index.add(3, 100, 'Тула', BOX, 2)
+        self.index.add(4, 100, 'Тула', BOX, 5)
+
+    def users(self, coefficient, warehouse_id=100, box_type_name=BOX):
+        return sorted(subscription.user_id for subscription in self.index.match(warehouse_id, box_type_name, coefficient))
+
+    def test_threshold_is_inclusive(self):
+        self.assertEqual(self.users(0), [1, 2, 3, 4])
+        self.assertEqual(self.users(2), [2, 3, 4])
+        self.assertEqual(self.users(5), [4])
+
+    def test_between_thresholds(self):
+        self.assertEqual(self.users(1), [2, 3, 4])
+        self.assertEqual(self.users(3), [4])
+
+    def test_above_all_thresholds(self):
+        self.assertEqual(self.users(6), [])
+
+    def test_other_warehouse_or_box_type(self):
+        self.assertEqual(self.users(0, warehouse_id=101), [])
+        self.assertEqual(self.users(0, box_type_name=PALLET), [])
+
+    def test_max_coefficient(self):
+        self.assertEqual(self.index.max_coefficient(100, BOX), 5)
+        self.assertIsNone(self.index.max_coefficient(100, PALLET))
+
+
+class UserSubscriptionsTest(unittest.TestCase):
+    def setUp(self):
+        self.index = SubscriptionIndex()
+
+    def test_numbers_per_user(self):
+        first = self.index.add(1, 100, 'Тула', BOX, 1)
+        second = self.index.add(1, 100, 'Тула', PALLET, 3)
+        other = self.index.add(2, 100, 'Тула', BOX, 1)
+        self.assertEqual((first.number, second.number, other.number), (1, 2, 1))
+        self.assertEqual(self.index.for_user(1), [first, second])
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.users(), 2)
+
+    def test_same_warehouse_and_box_type_replaces_threshold_keeping_number(self):
+        self.index.add(1, 100, 'Тула', BOX, 1)
+        replaced = self.index.add(1, 100, 'Тула', BOX, 4)
+        self.assertEqual(replaced.number, 1)
+        self.assertEqual(len(self.index), 1)
+        self.assertEqual([s.max_coefficient for s in self.index.match(100, BOX, 3)], [4])
+
+    def test_one_user_matches_each_own_subscription(self):
+        self.index.add(1, 100, 'Тула', BOX, 1)
+        self.index.add(1, 200, 'Пушкино', BOX, 1)
+        self.assertEqual([s.number for s in self.index.match(100, BOX, 0)], [1])
+        self.assertEqual([s.number for s in self.index.match(200, BOX, 0)], [2])
+
+    def test_remove_by_user_and_number(self):
+        self.index.add(1, 100, 'Тула', BOX, 1)
+        self.index.add(1, 200, 'Пушкино', BOX, 1)
+        self.index.add(2, 100, 'Тула', BOX, 1)
+        removed = self.index.remove(1, 1)
+        self.assertEqual((removed.user_id, removed.warehouse_id), (1, 100))
+        self.assertEqual([s.user_id for s in self.index.match(100, BOX, 0)], [2])
+        self.assertEqual([s.number for s in self.index.for_user(1)], [2])
+        self.assertIsNone(self.index.remove(1, 1))
+        self.assertIsNone(self.index.remove(3, 1))
+
+    def test_remove_last_subscription_drops_user_and_index_entry(self):
+        self.index.add(1, 100, 'Тула', BOX, 1)
+        self.index.remove(1, 1)
+        self.assertEqual(self.index.users(), 0)
+        self.assertEqual(self.index.match(100, BOX, 0), [])
+        self.assertIsNone(self.index.max_coefficient(100, BOX))
+
+    def test_numbers_after_remove(self):
+        for warehouse_id in (100, 200, 300):
+            self.index.add(1, warehouse_id, 'Склад', BOX, 1)
+        # Номера оставшихся подписок не меняются: пользователь ссылается на них в /remove
+        self.index.remove(1, 2)
+        self.assertEqual([s.number for s in self.index.for_user(1)], [1, 3])
+        self.assertEqual(self.index.add(1, 400, 'Склад', BOX, 1).number, 4)
+        # Освободившийся наибольший номер используется снова
+        self.index.remove(1, 4)
+        self.assertEqual(self.index.add(1, 500, 'Склад', BOX, 1).number, 4)
+
+    def test_restore_with_explicit_number(self):
+        restored = self.index.add(1, 100, 'Тула', BOX, 1, number=7)
+        self.assertEqual(restored.number, 7)
+        self.assertEqual(self.index.add(1, 200, 'Пушкино', BOX, 1).number, 8)
+
+    def test_remove_user(self):
+        self.index.add(1, 100, 'Тула', BOX, 1)
+        self.index.add(1, 200, 'Пушкино', BOX, 1)
+        self.assertEqual(len(self.index.remove_user(1)), 2)
+        self.assertEqual(self.index.for_user(1), [])
+        self.assertEqual(self.index.match(200, BOX, 0), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
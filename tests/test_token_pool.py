@@ -0,0 +1,179 @@
+import unittest
+from unittest import mock
+import requests
+from wb_zero_supply import TokenPool as token_pool
+from wb_zero_supply.Metrics import collect_stats
+from wb_zero_supply.RateLimiter import rate_limited_get
+from wb_zero_supply.TokenPool import TokenPool
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeSession:
+    """Отвечает кодом, заданным для токена из заголовка Authorization."""
+
+    def __init__(self, statuses, headers=None):
+        self.statuses = statuses
+        self.headers = headers or {}
+        self.tokens = []
+
+    def get(self, url, **kwargs):
+        token = kwargs['headers']['Authorization'].split()[-1]
+        self.tokens.append(token)
+        response = requests.Response()
+        response.status_code = self.statuses[token]
+        response.headers.update(self.headers)
+        response._content = b'[]'
+        response.url = url
+        return response
+
+
+class FakeQuota:
+    """Общая квота: запоминает резервирования и возвращает заданную паузу."""
+
+    def __init__(self, delay=0.0, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = []
+
+    def reserve(self, token_id, endpoint, rate, per):
+        self.calls.append((token_id, endpoint, rate, per))
+        if self.error is not None:
+            raise self.error
+        return self.delay
+
+
+class SharedQuotaTest(unittest.TestCase):
+    def tearDown(self):
+        token_pool.use_shared_quota(None)
+
+    def test_shared_delay_wins_over_local(self):
+        quota = FakeQuota(delay=7.5)
+        token_pool.use_shared_quota(quota)
+        pool = TokenPool(['secret-a'])
+        token, _, delay = pool.acquire('coefficients')
+        self.assertEqual(delay, 7.5)
+        self.assertEqual(quota.calls, [(token.fingerprint, 'coefficients', 6, 60)])
+        self.assertNotIn('secret', token.fingerprint)
+
+    def test_processes_sharing_token_share_quota_key(self):
+        quota = FakeQuota()
+        token_pool.use_shared_quota(quota)
+        TokenPool(['secret-a']).acquire('coefficients')
+        TokenPool(['secret-a']).acquire('coefficients')
+        self.assertEqual(quota.calls[0][0], quota.calls[1][0])
+
+    def test_unavailable_shared_quota_falls_back_to_local(self):
+        token_pool.use_shared_quota(FakeQuota(error=ConnectionError('down')))
+        pool = TokenPool(['secret-a'])
+        delays = [pool.acquire('coefficients')[2] for _ in range(7)]
+        self.assertEqual(delays[:6], [0.0] * 6)
+        self.assertGreater(delays[6], 0)
+
+
+class QuarantineTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('wb_zero_supply.TokenPool.time.monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = TokenPool(['secret-a', 'secret-b'], quarantine_timeout=100, max_quarantine_timeout=300)
+        self.bad, self.good = self.pool.tokens
+
+    def test_401_quarantines_token(self):
+        self.pool.record(self.bad, 'coefficients', 401)
+        self.assertEqual(self.pool.available(), 1)
+        self.assertTrue(all(self.pool.acquire('coefficients')[0] is self.good for _ in range(5)))
+        self.assertEqual(self.pool.stats()[self.bad.name]['state'], 'quarantined')
+
+    def test_quarantine_expires(self):
+        self.pool.record(self.bad, 'coefficients', 403)
+        self.clock.now += 101
+        self.assertEqual(self.pool.available(), 2)
+
+    def test_repeated_refusal_doubles_quarantine_up_to_limit(self):
+        timeouts = []
+        for _ in range(4):
+            self.pool.record(self.bad, 'coefficients', 401)
+            timeouts.append(self.bad.quarantined_until - self.clock.now)
+            self.clock.now = self.bad.quarantined_until
+        self.assertEqual(timeouts, [100, 200, 300, 300])
+
+    def test_refusal_during_quarantine_does_not_extend_it(self):
+        self.pool.record(self.bad, 'coefficients', 401)
+        until = self.bad.quarantined_until
+        self.clock.now += 10
+        self.pool.record(self.bad, 'coefficients', 401)
+        self.assertEqual(self.bad.quarantined_until, until)
+        self.assertEqual(self.bad.quarantined, 1)
+
+    def test_success_after_quarantine_resets_timeout(self):
+        self.pool.record(self.bad, 'coefficients', 401)
+        self.clock.now = self.bad.quarantined_until
+        self.pool.record(self.bad, 'coefficients', 200)
+        self.pool.record(self.bad, 'coefficients', 401)
+        self.assertEqual(self.bad.quarantined_until - self.clock.now, 100)
+
+    def test_all_quarantined_uses_token_released_first(self):
+        self.pool.record(self.bad, 'coefficients', 401)
+        self.clock.now += 10
+        self.pool.record(self.good, 'coefficients', 401)
+        self.assertIs(self.pool.acquire('coefficients')[0], self.bad)
+
+    def test_listener_notified_on_quarantine_and_release(self):
+        events = []
+        token_pool.add_listener(lambda name, quarantined, status: events.append((name, quarantined, status)))
+        self.addCleanup(token_pool._listeners.clear)
+        self.pool.record(self.bad, 'coefficients', 401)
+        self.clock.now = self.bad.quarantined_until
+        self.pool.record(self.bad, 'coefficients', 200)
+        self.assertEqual(events, [(self.bad.name, True, 401), (self.bad.name, False, None)])
+
+    def test_exhausted_remaining_quota_holds_token(self):
+        self.pool.record(self.bad, 'coefficients', 200, {'X-Ratelimit-Remaining': '0', 'X-Ratelimit-Reset': '30'})
+        self.assertEqual(self.bad.remaining, {'coefficients': 0})
+        self.assertGreater(self.bad.limiter('coefficients').wait_time(), 0)
+        self.assertTrue(all(self.pool.acquire('coefficients')[0] is self.good for _ in range(3)))
+
+    def test_remaining_quota_without_reset_is_only_recorded(self):
+        self.pool.record(self.bad, 'coefficients', 200, {'X-Ratelimit-Remaining': '4'})
+        self.assertEqual(self.bad.remaining, {'coefficients': 4})
+        self.assertEqual(self.bad.limiter('coefficients').wait_time(), 0)
+
+    def test_error_rate_prefers_healthy_token(self):
+        for _ in range(5):
+            self.pool.record(self.good, 'coefficients', 500)
+        self.assertIs(self.pool.acquire('coefficients')[0], self.bad)
+
+
+class FailoverTest(unittest.TestCase):
+    def test_401_is_retried_with_another_token(self):
+        pool = TokenPool(['bad', 'good'])
+        session = FakeSession({'bad': 401, 'good': 200})
+        response = rate_limited_get('failover-test', 'https://wb/api', pool, session=session)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(session.tokens, ['bad', 'good'])
+        self.assertEqual(pool.available(), 1)
+
+    def test_401_returned_when_no_token_left(self):
+        pool = TokenPool(['bad'])
+        session = FakeSession({'bad': 401})
+        response = rate_limited_get('failover-single', 'https://wb/api', pool, session=session)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(session.tokens, ['bad'])
+
+    def test_stats_exposed(self):
+        pool = token_pool.get_pool('stats-token-1')
+        pool.record(pool.tokens[0], 'coefficients', 429)
+        stats = collect_stats()['tokens'][pool.tokens[0].name]
+        self.assertEqual((stats['requests'], stats['rate_limited']), (1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
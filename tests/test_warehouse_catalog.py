@@ -0,0 +1,45 @@
+import os
+import unittest
+from unittest import mock
+from wb_zero_supply import WarehouseCatalog as warehouse_catalog
+from wb_zero_supply.WarehouseCatalog import REDIS_SNAPSHOT_KEY, WarehouseCatalog
+
+
+WAREHOUSES = [{'ID': 206348, 'name': 'Тула'}, {'ID': 207743, 'name': 'СЦ Пушкино'}]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value):
+        self.values[key] = value
+
+
+def unavailable():
+    raise ConnectionError('API WB недоступен')
+
+
+class RedisSnapshotTest(unittest.TestCase):
+    def test_snapshot_saved_by_one_process_is_loaded_by_another(self):
+        redis_client = FakeRedis()
+        WarehouseCatalog(lambda: WAREHOUSES, snapshot_path=None, redis_client=redis_client).refresh()
+        self.assertIn(REDIS_SNAPSHOT_KEY, redis_client.values)
+        catalog = WarehouseCatalog(unavailable, snapshot_path=None, redis_client=redis_client)
+        self.assertEqual(catalog.get(), WAREHOUSES)
+        self.assertEqual(catalog.misses, 0)
+
+    def test_get_catalog_uses_redis_when_configured(self):
+        self.addCleanup(warehouse_catalog._catalogs.clear)
+        with mock.patch.dict(os.environ, {'REDIS_URL': 'redis://localhost:6379'}):
+            self.assertIsNotNone(warehouse_catalog.get_catalog('token-with-redis').redis_client)
+        with mock.patch.dict(os.environ):
+            os.environ.pop('REDIS_URL', None)
+            self.assertIsNone(warehouse_catalog.get_catalog('token-without-redis').redis_client)
+
+
+if __name__ == '__main__':
+    unittest.main()
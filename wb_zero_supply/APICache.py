@@ -1,85 +1,46 @@
 import time
-import requests
-import logging
-
-
-# Настройка логирования
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from wb_zero_supply.WarehouseCatalog import get_catalog
+from wb_zero_supply.log_setup import setup_logging
 
 
 class APICache:
+    """Обёртка над общим кэшем каталога складов (WarehouseCatalog) со старым интерфейсом."""
+
     def __init__(self, token, cache_duration=86400):  # 86400 секунд = 1 день
         """
         Инициализация кэша API.
 
         :param token: Токен для авторизации API.
-        :param cache_duration: Время кэширования в секундах (по умолчанию 1 день).
+        :param cache_duration: Время кэширования в секундах (по умолчанию 1 день), задаётся общему каталогу.
         """
         self.token = token
         self.cache_duration = cache_duration
-        self.last_fetch_time = 0
-        self.cached_data = None
+        self.catalog = get_catalog(token)
+        self.catalog.ttl = cache_duration
 
     def get_data(self):
         """
         Получение данных из кэша или API.
 
-        :return: Данные из кэша или API.
+        Устаревшие данные возвращаются сразу, а обновление идёт в фоне.
+
+        :return: Данные из кэша или API (None, если получить их не удалось).
         """
-        current_time = time.time()
-        # Проверяем, нужно ли обновить кэш
-        if current_time - self.last_fetch_time > self.cache_duration:
-            logging.info("Обращение к API для получения новых данных...")
-            self.cached_data = self.fetch_data_from_api()
-            if self.cached_data is not None:  # Проверяем, что данные получены
-                self.last_fetch_time = current_time
-        else:
-            logging.info("Возвращаем данные из кэша.")
-        return self.cached_data
+        return self.catalog.get() or None
 
     def fetch_data_from_api(self):
         """
-        Запрос данных из API.
+        Принудительное обновление данных из API.
 
         :return: Данные из API в формате JSON или None в случае ошибки.
         """
-        url = 'https://supplies-api.wildberries.ru/api/v1/warehouses'
-        headers = {
-            'Authorization': f'Bearer {self.token}',  # Добавляем токен в заголовок Authorization
-        }
+        if self.catalog.refresh():
+            return self.catalog.get()
+        return None
 
-        try:
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()  # Проверка на ошибки HTTP
-        except requests.exceptions.HTTPError:
-            self.handle_http_error(response)
-            return None  # Возвращаем None в случае ошибки
-        except requests.exceptions.RequestException as err:
-            logging.error(f"Произошла ошибка при выполнении запроса: {err}")
-            return None  # Возвращаем None в случае ошибки
-        else:
-            # Если запрос успешен, обрабатываем ответ
-            warehouses = response.json()  # Возвращаем данные в формате JSON
-            return warehouses
-
-    def handle_http_error(self, response):
-        """
-        Обработка ошибок HTTP.
-
-        :param response: Ответ от API.
-        """
-        if response.status_code == 401:
-            logging.error("Ошибка авторизации: Убедитесь, что ваши учетные данные верны.")
-        elif response.status_code == 403:
-            logging.error("Доступ запрещён: У вас нет прав для доступа к этому ресурсу.")
-        elif response.status_code == 404:
-            logging.error("Адрес не найден: Проверьте правильность URL.")
-        elif response.status_code == 429:
-            logging.error("Слишком много запросов: Попробуйте позже.")
-        elif response.status_code == 500:
-            logging.error("Внутренняя ошибка сервера: Попробуйте позже.")
-        else:
-            logging.error(f"Произошла ошибка: {response.status_code}")
+    def invalidate(self):
+        """Помечает кэш устаревшим."""
+        self.catalog.invalidate()
 
 
 def frequently_called_function(api_cache):
@@ -93,6 +54,7 @@ def frequently_called_function(api_cache):
 
 # Пример использования
 if __name__ == "__main__":
+    setup_logging()
     api_cache = APICache(token='your_api_token_here')
 
     # Пример вызова функции каждые 12 секунд
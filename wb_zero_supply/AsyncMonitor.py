@@ -0,0 +1,267 @@
+import asyncio
+import logging
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+from wb_zero_supply import http_client
+from wb_zero_supply.CircuitBreaker import CircuitOpenError, get_breaker
+from wb_zero_supply.CoefficientHistory import CoefficientHistory
+from wb_zero_supply.CoefficientPoller import CoefficientPoller, Delivery
+from wb_zero_supply.Metrics import JOB_LAG
+from wb_zero_supply.RateLimiter import (
+    SERVER_ERRORS,
+    SERVER_RETRIES,
+    SERVER_RETRY_BACKOFF,
+    WB_RATE_LIMIT_WAIT,
+    WB_REQUEST_LATENCY,
+    WB_REQUESTS,
+    parse_retry_after,
+)
+from wb_zero_supply.RedisManager import RedisManagerSubscriptions
+from wb_zero_supply.TokenPool import get_pool
+from wb_zero_supply.get_stock_wb_from_api import COEFFICIENTS_URL
+
+try:
+    import aiohttp
+except ImportError:  # Асинхронный режим необязателен: poetry install -E async
+    aiohttp = None
+
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT_REQUESTS = 4  # одновременных запросов к API WB
+NOTIFY_WORKERS = 8  # потоков для синхронной отправки уведомлений через PTB
+
+
+class AsyncMonitor:
+    """
+    Асинхронный движок мониторинга — альтернатива планировщику в потоке (Scheduler).
+
+    Работает в отдельном потоке с собственным циклом asyncio: пачки складов
+    опрашиваются конкурентно через aiohttp с ограничением числа одновременных
+    запросов и таймаутами, а медленный ответ не занимает потоки PTB. Разбор
+    ответа и запись снимков в Redis и историю идут в отдельном пуле потоков,
+    чтобы не останавливать цикл с остальными запросами. Учёт
+    подписок общий с CoefficientPoller, поэтому опрос по-прежнему идёт одной
+    пачкой на группу складов.
+    """
+
+    def __init__(self, api_key: str, on_data: Callable[[Delivery], None], on_error: Callable[[Set[Hashable], Exception], None],
+                 interval: float = 11, max_concurrency: int = MAX_CONCURRENT_REQUESTS, history: Optional[CoefficientHistory] = None,
+                 store: Optional[RedisManagerSubscriptions] = None):
+        """
+        :param api_key: Токен API Wildberries.
+        :param on_data: Обработчик изменений слотов склада (вызывается в пуле потоков).
+        :param on_error: Обработчик ошибки запроса для подписок пачки.
+        :param interval: Интервал опроса в секундах.
+        :param max_concurrency: Максимум одновременных запросов к API.
+        :param history: Хранилище истории изменений слотов.
+        :param store: Хранилище снимков слотов в Redis для восстановления после перезапуска.
+        """
+        if aiohttp is None:
+            raise RuntimeError('Для асинхронного режима установите aiohttp: poetry install -E async')
+        self.api_key = api_key
+        self.on_data = on_data
+        self.on_error = on_error
+        self.interval = interval
+        self.max_concurrency = max_concurrency
+        self.poller = CoefficientPoller(fetch=None, history=history, store=store)
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[Thread] = None
+        self._main_task: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=NOTIFY_WORKERS, thread_name_prefix='notify')
+        self._process_executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='process')
+        self._warehouse_tasks: Dict[int, Set[asyncio.Future]] = {}
+
+    def subscribe(self, key: Hashable, warehouse_id: Any) -> Optional[int]:
+        """Подписывает на склад (см. CoefficientPoller.subscribe)."""
+        forgotten = self.poller.subscribe(key, warehouse_id)
+        self._cancel_warehouse(forgotten)
+        return forgotten
+
+    def unsubscribe(self, key: Hashable) -> Optional[int]:
+        """Отменяет подписку; если склад больше не опрашивается, его незавершённые уведомления отменяются."""
+        forgotten = self.poller.unsubscribe(key)
+        self._cancel_warehouse(forgotten)
+        return forgotten
+
+    def subscribers(self, warehouse_ids: List[int]) -> Dict[int, Set[Hashable]]:
+        """Снимок подписок на заданные склады."""
+        return self.poller.subscribers(warehouse_ids)
+
+    def restore(self, subscriptions: Dict[Hashable, int], snapshots: Dict[int, Dict[Tuple[str, int], int]]) -> None:
+        """Восстанавливает подписки и снимки складов после перезапуска (см. CoefficientPoller.restore)."""
+        self.poller.restore(subscriptions, snapshots)
+
+    def warehouse_ids(self) -> List[int]:
+        """Объединение складов всех подписчиков."""
+        return self.poller.warehouse_ids()
+
+    def _cancel_warehouse(self, warehouse_id: Optional[int]) -> None:
+        if warehouse_id is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._cancel_warehouse_tasks, warehouse_id)
+
+    def _cancel_warehouse_tasks(self, warehouse_id: int) -> None:
+        for task in self._warehouse_tasks.pop(warehouse_id, ()):
+            task.cancel()
+
+    def start(self) -> None:
+        """Запускает цикл мониторинга в отдельном потоке."""
+        self._loop = asyncio.new_event_loop()
+        self._thread = Thread(target=self._run_loop, name='async-monitor', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10) -> None:
+        """Останавливает мониторинг, отменяя текущие запросы."""
+        if self._loop is None:
+            return
+        if self._main_task is not None:
+            self._loop.call_soon_threadsafe(self._main_task.cancel)
+        self._thread.join(timeout)
+        self._executor.shutdown(wait=False)
+        self._process_executor.shutdown(wait=False)
+        self._loop = None
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._main_task = self._loop.create_task(self.run())
+        try:
+            self._loop.run_until_complete(self._main_task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+
+    async def run(self) -> None:
+        """Основной цикл: раз в интервал опрашивает все пачки складов."""
+        connect_timeout, read_timeout = http_client.get_timeout()
+        timeout = aiohttp.ClientTimeout(connect=connect_timeout, sock_read=read_timeout)
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+        headers = {'Accept': 'application/json'}
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
+            planned = self._loop.time()
+            while True:
+                started = self._loop.time()
+                JOB_LAG.labels('check_coefficients').observe(max(0.0, started - planned))
+                batches = self.poller.batches()
+                await asyncio.gather(*(self.poll_batch(session, semaphore, batch) for batch in batches))
+                planned = started + self.interval
+                await asyncio.sleep(max(0.0, planned - self._loop.time()))
+
+    async def fetch(self, session: 'aiohttp.ClientSession', warehouse_ids: List[int], max_retries: int = 3) -> bytes:
+        """
+        Запрос коэффициентов по пачке складов через общий предохранитель эндпоинта
+        и ограничитель токена, выбранного пулом токенов.
+
+        Повторы как в синхронном режиме (rate_limited_get): ответ 5xx повторяется
+        до SERVER_RETRIES раз с нарастающей паузой, пока предохранитель замкнут,
+        ответ 429 — до max_retries раз после паузы по Retry-After, а 401/403 —
+        с другим токеном.
+
+        :raises requests.HTTPError: Если последний ответ — ошибка.
+        :raises CircuitOpenError: Если предохранитель эндпоинта разомкнут.
+        """
+        breaker = get_breaker('coefficients')
+        breaker.allow()
+        params = {'warehouseIDs': ','.join(map(str, warehouse_ids))}
+        for attempt in range(SERVER_RETRIES + 1):
+            try:
+                status, headers, body, url = await self._get_with_retries(session, params, max_retries)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                breaker.failure()
+                raise
+            except BaseException:
+                breaker.cancel()
+                raise
+            breaker.record(status)
+            if status not in SERVER_ERRORS or attempt == SERVER_RETRIES:
+                break
+            try:
+                breaker.allow()
+            except CircuitOpenError:
+                break
+            delay = SERVER_RETRY_BACKOFF * 2 ** attempt
+            logger.warning(f'{status} от coefficients: повтор через {delay:.1f} с (попытка {attempt + 1} из {SERVER_RETRIES + 1})')
+            try:
+                await asyncio.sleep(delay)
+            except BaseException:
+                breaker.cancel()
+                raise
+
+        if status >= 400:
+            error_response = http_client.response_from_status(url, status, headers, body)
+            raise requests.HTTPError(f'{status} Error for url: {url}', response=error_response)
+        return body
+
+    async def _get_with_retries(self, session: 'aiohttp.ClientSession', params: Dict[str, str],
+                                max_retries: int) -> Tuple[int, Dict[str, str], bytes, str]:
+        """Запрос с повтором после 429 и сменой токена после 401/403: (код, заголовки, тело, адрес)."""
+        pool = get_pool(self.api_key)
+        for attempt in range(max_retries + 1):
+            token, limiter, waited = pool.acquire('coefficients')
+            WB_RATE_LIMIT_WAIT.labels('coefficients').observe(waited)
+            await asyncio.sleep(waited)
+            started = self._loop.time()
+            try:
+                async with session.get(COEFFICIENTS_URL, params=params, headers={'Authorization': f'Bearer {token.secret}'}) as response:
+                    body = await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                WB_REQUESTS.labels('coefficients', 'error').inc()
+                pool.failure(token)
+                raise
+            finally:
+                WB_REQUEST_LATENCY.labels('coefficients').observe(self._loop.time() - started)
+
+            status, headers, url = response.status, dict(response.headers), str(response.url)
+            WB_REQUESTS.labels('coefficients', status).inc()
+            pool.record(token, 'coefficients', status, response.headers)
+            if status in (401, 403) and attempt < max_retries and pool.available():
+                logger.warning(f'{status} от coefficients с токеном {token.name}: повтор с другим токеном')
+                continue
+            if status != 429:
+                limiter.success()
+                break
+            # Пауза ставится и после последней попытки, чтобы её учли следующие запросы
+            delay = limiter.backoff(parse_retry_after(http_client.response_from_status(url, status, headers, body)))
+            logger.warning(f'429 от coefficients: пауза {delay:.1f} с (попытка {attempt + 1} из {max_retries + 1})')
+        return status, headers, body, url
+
+    async def poll_batch(self, session: 'aiohttp.ClientSession', semaphore: asyncio.Semaphore, batch: List[int]) -> None:
+        """Опрос одной пачки складов и раздача результата подписчикам."""
+        try:
+            async with semaphore:
+                body = await self.fetch(session, batch)
+            deliveries = await self._loop.run_in_executor(self._process_executor, self.poller.process_batch, batch, body)
+        except asyncio.CancelledError:
+            raise
+        except CircuitOpenError as e:
+            logger.debug(f'Опрос складов {batch} пропущен: {e}')
+            deliveries = self.poller.process_outage(batch)
+        except Exception as e:
+            logger.warning(f'Ошибка при опросе складов {batch}: {e!r}')
+            subscribers = self.poller.subscribers(batch)
+            await self._loop.run_in_executor(self._executor, self.on_error, set().union(*subscribers.values()), e)
+            return
+
+        for delivery in deliveries:
+            self._notify(delivery)
+
+    def _notify(self, delivery: Delivery) -> None:
+        warehouse_id = delivery.warehouse_id
+        task = self._loop.run_in_executor(self._executor, self.on_data, delivery)
+        tasks = self._warehouse_tasks.setdefault(warehouse_id, set())
+        tasks.add(task)
+        task.add_done_callback(lambda done: self._forget_task(warehouse_id, done))
+
+    def _forget_task(self, warehouse_id: int, task: asyncio.Future) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f'Ошибка при уведомлении подписчиков склада {warehouse_id}: {task.exception()!r}')
+        tasks = self._warehouse_tasks.get(warehouse_id)
+        if tasks is not None:
+            tasks.discard(task)
+            if not tasks:
+                del self._warehouse_tasks[warehouse_id]
@@ -0,0 +1,232 @@
+import os
+import time
+import logging
+import requests
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from wb_zero_supply.Metrics import counter, gauge, register_stats
+
+
+logger = logging.getLogger(__name__)
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Пороги по умолчанию: (ошибок подряд до размыкания, секунд до пробного запроса)
+DEFAULT_THRESHOLDS: Dict[str, Tuple[int, float]] = {
+    'coefficients': (3, 60),
+    'warehouses': (3, 300),
+}
+MAX_RECOVERY_TIMEOUT = 600.0  # секунд: после каждой неудачной пробы пауза удваивается до этой границы
+
+CIRCUIT_STATE = gauge('wb_circuit_state', 'Предохранитель эндпоинта API WB: 0 — замкнут, 1 — пробный запрос, 2 — разомкнут', ['endpoint'])
+CIRCUIT_REJECTED = counter('wb_circuit_rejected_total', 'Запросы к API WB, не отправленные из-за разомкнутого предохранителя', ['endpoint'])
+
+# Обработчик смены состояния: (эндпоинт, прежнее состояние, новое состояние)
+StateListener = Callable[[str, str, str], None]
+
+
+class CircuitOpenError(requests.RequestException):
+    """Запрос не отправлен: предохранитель эндпоинта разомкнут."""
+
+    def __init__(self, endpoint: str, retry_in: float):
+        super().__init__(f'API WB ({endpoint}) недоступен, следующая попытка через {retry_in:.0f} с')
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Предохранитель эндпоинта: замкнут → разомкнут → пробный запрос.
+
+    После failure_threshold ошибок подряд (нет ответа или 5xx) запросы
+    перестают отправляться и сразу завершаются CircuitOpenError, не занимая
+    квоту и потоки. Через recovery_timeout пропускается ровно один пробный
+    запрос: если он успешен, предохранитель замыкается, иначе снова
+    размыкается с удвоенной паузой. Ответы 4xx и 429 ошибками сервера не
+    считаются — с ними работает ограничитель запросов.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, recovery_timeout: float,
+                 max_recovery_timeout: float = MAX_RECOVERY_TIMEOUT):
+        """
+        :param name: Имя эндпоинта (для логов и метрик).
+        :param failure_threshold: Сколько ошибок подряд размыкают предохранитель.
+        :param recovery_timeout: Через сколько секунд после размыкания отправляется пробный запрос.
+        :param max_recovery_timeout: Верхняя граница паузы после неудачных проб.
+        """
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self.max_recovery_timeout = max(recovery_timeout, max_recovery_timeout)
+        self._lock = Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._timeout = recovery_timeout
+        self._probing = False
+
+        self.opened = 0
+        self.rejected = 0
+        CIRCUIT_STATE.labels(name).set(STATE_CODES[CLOSED])
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def retry_in(self) -> float:
+        """Сколько секунд осталось до пробного запроса (0 — запросы разрешены)."""
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self._timeout - time.monotonic())
+
+    def allow(self) -> None:
+        """
+        Разрешение на запрос. Разомкнутый предохранитель по истечении паузы
+        пропускает один пробный запрос, остальные получают отказ.
+
+        :raises CircuitOpenError: Если запрос отправлять не нужно.
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            now = time.monotonic()
+            transition = None
+            if self._state == OPEN and now >= self._opened_at + self._timeout:
+                transition = self._set_state(HALF_OPEN)
+            probe = self._state == HALF_OPEN and not self._probing
+            if probe:
+                self._probing = True
+            else:
+                self.rejected += 1
+                retry_in = max(0.0, self._opened_at + self._timeout - now)
+        self._notify(transition)
+        if not probe:
+            CIRCUIT_REJECTED.labels(self.name).inc()
+            raise CircuitOpenError(self.name, retry_in)
+
+    def record(self, status: int) -> None:
+        """Учитывает ответ сервера: 5xx — ошибка, остальное — успех."""
+        if status >= 500:
+            self.failure()
+        else:
+            self.success()
+
+    def success(self) -> None:
+        transition = None
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            self._timeout = self.recovery_timeout
+            if self._state != CLOSED:
+                transition = self._set_state(CLOSED)
+        self._notify(transition)
+
+    def failure(self) -> None:
+        transition = None
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN:
+                self._probing = False
+                self._timeout = min(self.max_recovery_timeout, self._timeout * 2)
+                transition = self._open()
+            elif self._state == CLOSED and self._failures >= self.failure_threshold:
+                transition = self._open()
+        self._notify(transition)
+
+    def cancel(self) -> None:
+        """Запрос прерван без ответа (например, при остановке): пробный запрос можно повторить."""
+        with self._lock:
+            self._probing = False
+
+    def _open(self) -> Tuple[str, str]:
+        self._opened_at = time.monotonic()
+        self.opened += 1
+        return self._set_state(OPEN)
+
+    def _set_state(self, state: str) -> Tuple[str, str]:
+        previous, self._state = self._state, state
+        CIRCUIT_STATE.labels(self.name).set(STATE_CODES[state])
+        if state == OPEN:
+            logger.warning(f'Предохранитель {self.name} разомкнут после {self._failures} ошибок, пробный запрос через {self._timeout:.0f} с')
+        else:
+            logger.info(f'Предохранитель {self.name}: {previous} → {state}')
+        return previous, state
+
+    def _notify(self, transition: Optional[Tuple[str, str]]) -> None:
+        """Вызывает обработчики смены состояния (вне блокировки, чтобы они могли обращаться к предохранителю)."""
+        if transition is None:
+            return
+        for listener in list(_listeners):
+            try:
+                listener(self.name, *transition)
+            except Exception as e:
+                logger.error(f'Ошибка обработчика смены состояния предохранителя {self.name}: {e!r}')
+
+    def stats(self) -> Dict[str, Any]:
+        """Состояние и счётчики предохранителя."""
+        with self._lock:
+            retry_in = 0.0
+            if self._state == OPEN:
+                retry_in = max(0.0, self._opened_at + self._timeout - time.monotonic())
+            return {
+                'state': self._state,
+                'retry_in': round(retry_in, 1),
+                'failures': self._failures,
+                'opened': self.opened,
+                'rejected': self.rejected,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = Lock()
+_listeners: List[StateListener] = []
+
+
+def load_thresholds() -> Dict[str, Tuple[int, float]]:
+    """
+    Пороги эндпоинтов с учётом переменной окружения WB_CIRCUIT_BREAKERS.
+
+    Формат: ``coefficients=3/60,warehouses=3/300`` (ошибок подряд/секунд до пробного запроса).
+    """
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    for item in filter(None, os.getenv('WB_CIRCUIT_BREAKERS', '').split(',')):
+        try:
+            endpoint, threshold = item.split('=')
+            failures, timeout = threshold.split('/')
+            thresholds[endpoint.strip()] = (int(failures), float(timeout))
+        except ValueError:
+            logger.error(f'Некорректный порог в WB_CIRCUIT_BREAKERS: {item}')
+    return thresholds
+
+
+def get_breaker(endpoint: str) -> CircuitBreaker:
+    """Общий для процесса предохранитель эндпоинта."""
+    with _breakers_lock:
+        breaker = _breakers.get(endpoint)
+        if breaker is None:
+            failures, timeout = load_thresholds().get(endpoint, (3, 60))
+            breaker = _breakers[endpoint] = CircuitBreaker(endpoint, failures, timeout)
+        return breaker
+
+
+def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    """Состояние всех предохранителей процесса (отдаётся сервером метрик на /stats)."""
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {endpoint: breaker.stats() for endpoint, breaker in breakers.items()}
+
+
+register_stats('circuits', breaker_stats)
+
+
+def add_listener(listener: StateListener) -> None:
+    """Подписывает обработчик на смену состояния любого предохранителя."""
+    _listeners.append(listener)
+
+
+def remove_listener(listener: StateListener) -> None:
+    if listener in _listeners:
+        _listeners.remove(listener)
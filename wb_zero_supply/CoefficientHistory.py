@@ -0,0 +1,303 @@
+import os
+import sys
+import glob
+import json
+import time
+import struct
+import logging
+import argparse
+from array import array
+from datetime import datetime, timedelta, timezone
+from threading import Event, Lock, Thread
+from typing import Dict, Iterable, List, Optional, Tuple
+from wb_zero_supply.SnapshotDiff import SlotChange
+
+try:
+    import numpy as np
+except ImportError:  # Аналитика необязательна: poetry install -E analytics
+    np = None
+
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DIR = os.path.join('.cache', 'history')
+MAX_ROWS = 1_000_000  # строк в памяти (~11 МБ), после чего они сбрасываются на диск
+COMPACT_INTERVAL = 600  # секунд между сбросами на диск по времени: при падении процесса теряется не больше
+MSK = timezone(timedelta(hours=3))  # WB работает по московскому времени
+MSK_OFFSET = 3 * 3600
+
+# Колонки: имя и код типа array
+COLUMNS = (
+    ('timestamp', 'I'),  # время наблюдения, секунды Unix
+    ('warehouse', 'I'),  # ID склада
+    ('box_type', 'B'),  # код типа поставки (см. box_types)
+    ('date_offset', 'h'),  # дата слота минус дата наблюдения, дней
+    ('coefficient', 'h'),  # коэффициент приёмки
+)
+_HEADER = struct.Struct('<I')
+
+
+class CoefficientHistory:
+    """
+    Колоночное хранилище истории изменений коэффициентов приёмки.
+
+    Пишутся только изменения слотов (результат SnapshotDiff), поэтому месяцы
+    опроса раз в 11 секунд занимают немного места. Колонки лежат в массивах
+    array фиксированного типа; при заполнении они сбрасываются на диск
+    сегментами, а запросы читают сегменты обратно и считаются векторно
+    средствами NumPy без циклов по строкам. Кроме того, после start() строки
+    сбрасываются на диск раз в compact_interval секунд, чтобы при падении
+    процесса не терялась накопленная в памяти история.
+    """
+
+    def __init__(self, directory: Optional[str] = HISTORY_DIR, max_rows: int = MAX_ROWS,
+                 compact_interval: float = COMPACT_INTERVAL):
+        """
+        :param directory: Каталог сегментов на диске (None — только память).
+        :param max_rows: Сколько строк держать в памяти до сброса на диск.
+        :param compact_interval: Период сброса на диск по времени в секундах (0 — только по max_rows).
+        """
+        self.directory = directory
+        self.max_rows = max_rows
+        self.compact_interval = compact_interval
+        self.box_types: Dict[str, int] = {}
+        self._lock = Lock()
+        self._columns = {name: array(code) for name, code in COLUMNS}
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+        if directory:
+            self._load_box_types()
+
+    def __len__(self) -> int:
+        return len(self._columns['timestamp'])
+
+    def record(self, changes: Iterable[SlotChange], timestamp: Optional[float] = None) -> None:
+        """Добавляет изменения слотов (пропавшие слоты не пишутся)."""
+        timestamp = int(timestamp if timestamp is not None else time.time())
+        observed = datetime.fromtimestamp(timestamp, MSK).date().toordinal()
+        with self._lock:
+            columns = self._columns
+            for change in changes:
+                if change.new is None:
+                    continue
+                box_type = self.box_types.get(change.box_type_name)
+                if box_type is None:
+                    box_type = self.box_types[change.box_type_name] = len(self.box_types)
+                    self._save_box_types()
+                columns['timestamp'].append(timestamp)
+                columns['warehouse'].append(change.warehouse_id)
+                columns['box_type'].append(box_type)
+                columns['date_offset'].append(change.day - observed)
+                columns['coefficient'].append(change.new)
+            full = len(columns['timestamp']) >= self.max_rows
+        if full:
+            self.compact()
+
+    def compact(self) -> None:
+        """Сбрасывает строки из памяти на диск отдельным сегментом."""
+        if not self.directory:
+            with self._lock:
+                # Без диска храним только последние max_rows / 2 строк
+                keep = self.max_rows // 2
+                for column in self._columns.values():
+                    del column[:-keep or None]
+            return
+
+        with self._lock:
+            columns = self._columns
+            if not len(columns['timestamp']):
+                return
+            self._columns = {name: array(code) for name, code in COLUMNS}
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"segment-{columns['timestamp'][0]}-{len(columns['timestamp'])}.bin")
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(len(columns['timestamp'])))
+            for name, _ in COLUMNS:
+                columns[name].tofile(f)
+        os.replace(tmp_path, path)
+        logger.info(f"История коэффициентов: сохранён сегмент {path} ({len(columns['timestamp'])} строк)")
+
+    def start(self) -> None:
+        """Запускает поток, сбрасывающий строки на диск раз в compact_interval секунд."""
+        if self._thread is not None or not self.directory or self.compact_interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name='history-compact', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5) -> None:
+        """Останавливает поток и сбрасывает оставшиеся строки на диск."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.compact()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.compact_interval):
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f'Не удалось сохранить сегмент истории коэффициентов: {e!r}')
+
+    def load(self, since: Optional[float] = None) -> Dict[str, 'np.ndarray']:
+        """
+        Все строки (с диска и из памяти) в виде массивов NumPy.
+
+        :param since: Учитывать только наблюдения не раньше этого времени (Unix).
+        """
+        _require_numpy()
+        parts: Dict[str, List['np.ndarray']] = {name: [] for name, _ in COLUMNS}
+        paths = sorted(glob.glob(os.path.join(self.directory, 'segment-*.bin'))) if self.directory else []
+        for path in paths:
+            with open(path, 'rb') as f:
+                (rows,) = _HEADER.unpack(f.read(_HEADER.size))
+                for name, code in COLUMNS:
+                    parts[name].append(np.fromfile(f, dtype=np.dtype(code), count=rows))
+        with self._lock:
+            for name, _ in COLUMNS:
+                parts[name].append(np.array(self._columns[name], dtype=np.dtype(self._columns[name].typecode)))
+
+        data = {name: np.concatenate(chunks) for name, chunks in parts.items()}
+        if since is not None:
+            mask = data['timestamp'] >= since
+            data = {name: column[mask] for name, column in data.items()}
+        return data
+
+    def _select(self, warehouse_id: Optional[int], box_type_name: Optional[str], since: Optional[float]) -> Dict[str, 'np.ndarray']:
+        data = self.load(since)
+        mask = np.ones(len(data['timestamp']), dtype=bool)
+        if warehouse_id is not None:
+            mask &= data['warehouse'] == warehouse_id
+        if box_type_name is not None:
+            mask &= data['box_type'] == self.box_types.get(box_type_name, -1)
+        return {name: column[mask] for name, column in data.items()}
+
+    def free_slot_frequency(self, warehouse_id: Optional[int] = None, box_type_name: Optional[str] = None,
+                            since: Optional[float] = None) -> 'np.ndarray':
+        """
+        Как часто слоты становятся бесплатными по дням недели и часам (МСК).
+
+        :return: Матрица 7×24 (понедельник — 0) с долей событий «коэффициент стал 0».
+        """
+        data = self._select(warehouse_id, box_type_name, since)
+        local = data['timestamp'].astype(np.int64) + MSK_OFFSET
+        free = data['coefficient'] == 0
+        hours = (local[free] // 3600) % 24
+        weekdays = (local[free] // 86400 + 3) % 7  # 1970-01-01 — четверг
+        counts = np.bincount(weekdays * 24 + hours, minlength=7 * 24).reshape(7, 24).astype(float)
+        total = counts.sum()
+        return counts / total if total else counts
+
+    def time_to_free_slot(self, warehouse_id: Optional[int] = None, box_type_name: Optional[str] = None,
+                          since: Optional[float] = None) -> 'np.ndarray':
+        """
+        Сколько секунд проходит от появления слота до его освобождения (коэффициент 0).
+
+        Слот — склад, тип поставки и дата приёмки. Учитываются только слоты, которые освобождались.
+        """
+        data = self._select(warehouse_id, box_type_name, since)
+        if not len(data['timestamp']):
+            return np.array([], dtype=np.int64)
+        slot = self._slot_ids(data)
+        order = np.lexsort((data['timestamp'], slot))
+        slot, timestamp, coefficient = slot[order], data['timestamp'][order].astype(np.int64), data['coefficient'][order]
+
+        # Первое наблюдение каждого слота
+        slots, first_index = np.unique(slot, return_index=True)
+        first_seen = timestamp[first_index]
+        # Первое освобождение каждого слота
+        free = coefficient == 0
+        free_slots, free_index = np.unique(slot[free], return_index=True)
+        first_free = timestamp[free][free_index]
+        return first_free - first_seen[np.searchsorted(slots, free_slots)]
+
+    def volatility(self, box_type_name: Optional[str] = None, since: Optional[float] = None) -> Dict[int, Tuple[int, float]]:
+        """
+        Изменчивость коэффициентов по складам.
+
+        :return: {ID склада: (число изменений, стандартное отклонение шага коэффициента)}.
+        """
+        data = self._select(None, box_type_name, since)
+        if len(data['timestamp']) < 2:
+            return {}
+        slot = self._slot_ids(data)
+        order = np.lexsort((data['timestamp'], slot))
+        slot, warehouse = slot[order], data['warehouse'][order]
+        coefficient = data['coefficient'][order].astype(np.int64)
+
+        same_slot = slot[1:] == slot[:-1]
+        steps = (coefficient[1:] - coefficient[:-1])[same_slot].astype(float)
+        warehouses, inverse = np.unique(warehouse[1:][same_slot], return_inverse=True)
+        count = np.bincount(inverse, minlength=len(warehouses))
+        mean = np.bincount(inverse, weights=steps, minlength=len(warehouses)) / np.maximum(count, 1)
+        square = np.bincount(inverse, weights=steps ** 2, minlength=len(warehouses)) / np.maximum(count, 1)
+        std = np.sqrt(np.maximum(square - mean ** 2, 0))
+        return {int(w): (int(c), float(s)) for w, c, s in zip(warehouses, count, std)}
+
+    @staticmethod
+    def _slot_ids(data: Dict[str, 'np.ndarray']) -> 'np.ndarray':
+        """Числовой ключ слота: склад, тип поставки и абсолютный день приёмки."""
+        day = (data['timestamp'].astype(np.int64) + MSK_OFFSET) // 86400 + data['date_offset']
+        return (data['warehouse'].astype(np.int64) << 24) | (data['box_type'].astype(np.int64) << 16) | (day & 0xFFFF)
+
+    def _box_types_path(self) -> str:
+        return os.path.join(self.directory, 'box_types.json')
+
+    def _load_box_types(self) -> None:
+        try:
+            with open(self._box_types_path(), encoding='utf-8') as f:
+                self.box_types = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f'Не удалось прочитать коды типов поставки: {e}')
+
+    def _save_box_types(self) -> None:
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._box_types_path(), 'w', encoding='utf-8') as f:
+            json.dump(self.box_types, f, ensure_ascii=False)
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError('Для аналитики по истории установите numpy: poetry install -E analytics')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Аналитика по истории коэффициентов приёмки')
+    parser.add_argument('--dir', default=os.getenv('WB_HISTORY_DIR', HISTORY_DIR), help='каталог истории')
+    parser.add_argument('--warehouse', type=int, help='ID склада')
+    parser.add_argument('--box-type', help='тип поставки, например «Монопаллеты»')
+    parser.add_argument('--days', type=int, default=30, help='за сколько последних дней')
+    args = parser.parse_args()
+
+    history = CoefficientHistory(args.dir)
+    since = time.time() - args.days * 86400
+    try:
+        frequency = history.free_slot_frequency(args.warehouse, args.box_type, since)
+        waits = history.time_to_free_slot(args.warehouse, args.box_type, since)
+        volatility = history.volatility(args.box_type, since)
+    except RuntimeError as e:
+        print(e)
+        sys.exit(1)
+
+    weekdays = ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс']
+    if frequency.any():
+        weekday, hour = divmod(int(frequency.argmax()), 24)
+        print(f'Чаще всего слоты освобождаются: {weekdays[weekday]} около {hour}:00 МСК ({frequency.max():.1%} событий)')
+    else:
+        print('Освобождений слотов в истории нет.')
+    if len(waits):
+        p50, p90 = np.percentile(waits, [50, 90]) / 3600
+        print(f'Время до бесплатного слота: медиана {p50:.1f} ч, 90-й перцентиль {p90:.1f} ч ({len(waits)} слотов)')
+    for warehouse_id, (changes, std) in sorted(volatility.items(), key=lambda item: -item[1][1])[:10]:
+        print(f'Склад {warehouse_id}: {changes} изменений, σ шага коэффициента {std:.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+import logging
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Iterable, List, NamedTuple, Optional, Set, Tuple
+from wb_zero_supply import fast_json
+from wb_zero_supply.CircuitBreaker import CircuitOpenError
+from wb_zero_supply.CoefficientHistory import CoefficientHistory
+from wb_zero_supply.CoefficientRecord import records
+from wb_zero_supply.Metrics import counter
+from wb_zero_supply.RedisManager import RedisManagerSubscriptions
+from wb_zero_supply.SnapshotDiff import SlotChange, SnapshotDiff
+
+
+# Сколько складов запрашивать одним запросом к /api/v1/acceptance/coefficients
+MAX_WAREHOUSES_PER_REQUEST = 100
+
+logger = logging.getLogger(__name__)
+
+COEFFICIENT_RESPONSES = counter('coefficient_responses_total', 'Ответы API коэффициентов: unchanged — совпали с прошлым байт в байт', ['result'])
+SLOT_CHANGES = counter('coefficient_slot_changes_total', 'Изменения слотов по всем складам')
+
+
+class Delivery(NamedTuple):
+    """Что раздать по складу после ответа API."""
+    warehouse_id: int
+    changes: List[SlotChange]  # изменения слотов склада с прошлого ответа
+    fresh: Set[Hashable]  # подписки, ещё не получавшие снимок склада
+    snapshot: List[SlotChange]  # весь текущий снимок (только если fresh не пуст)
+    stale: bool = False  # снимок из последнего удачного ответа: API сейчас недоступен
+
+
+class CoefficientPoller:
+    """
+    Общий опрос коэффициентов приёмки для всех подписчиков.
+
+    Хранит объединение складов, на которые оформлены подписки (ключ подписки —
+    любое хешируемое значение), и за один проход запрашивает их пачками. Ответ
+    сравнивается с предыдущим снимком (SnapshotDiff), и по каждому складу
+    отдаются только изменившиеся слоты; новые подписки при первой доставке
+    получают весь текущий снимок. Число запросов к API зависит от числа
+    различных складов, а не от числа подписок.
+    """
+
+    def __init__(self, fetch: Callable[[List[int]], bytes], batch_size: int = MAX_WAREHOUSES_PER_REQUEST,
+                 history: Optional[CoefficientHistory] = None, store: Optional[RedisManagerSubscriptions] = None):
+        """
+        :param fetch: Функция запроса коэффициентов по списку ID складов, возвращающая тело ответа.
+        :param batch_size: Максимальное число складов в одном запросе.
+        :param history: Хранилище истории, в которое пишутся изменения слотов.
+        :param store: Хранилище в Redis, куда записывается снимок слотов для восстановления после перезапуска.
+        """
+        self.fetch = fetch
+        self.batch_size = batch_size
+        self.history = history
+        self.store = store
+        self.diff = SnapshotDiff()
+        self._lock = Lock()
+        self._subscriptions: Dict[Hashable, int] = {}  # подписка -> warehouse_id
+        self._subscribers: Dict[int, Set[Hashable]] = {}  # warehouse_id -> {подписка}
+        self._fresh: Set[Hashable] = set()  # подписки, ещё не получившие снимок
+        self._baseline: Set[int] = set()  # восстановленные склады без сохранённого снимка: первый ответ не рассылается
+
+    def subscribe(self, key: Hashable, warehouse_id: Any) -> Optional[int]:
+        """
+        Подписывает на склад (повторная подписка с тем же ключом заменяет прежнюю).
+
+        Возвращает склад прежней подписки, если он больше не опрашивается.
+        """
+        warehouse_id = int(warehouse_id)
+        with self._lock:
+            forgotten = self._remove(key)
+            self._subscriptions[key] = warehouse_id
+            self._subscribers.setdefault(warehouse_id, set()).add(key)
+            self._fresh.add(key)
+        if forgotten is not None and forgotten != warehouse_id:
+            self._delete_stored([forgotten])
+            return forgotten
+        return None
+
+    def unsubscribe(self, key: Hashable) -> Optional[int]:
+        """Отменяет подписку; возвращает её склад, если он больше не опрашивается."""
+        with self._lock:
+            forgotten = self._remove(key)
+        if forgotten is not None:
+            self._delete_stored([forgotten])
+        return forgotten
+
+    def restore(self, subscriptions: Dict[Hashable, int], snapshots: Dict[int, Dict[Tuple[str, int], int]]) -> None:
+        """
+        Восстанавливает подписки и снимки складов после перезапуска.
+
+        Восстановленные подписки не считаются новыми: по ним придут только
+        изменения относительно сохранённого снимка. Если снимка склада нет,
+        первый ответ по нему становится базой и не рассылается, чтобы не
+        повторять уже отправленные уведомления. Склад, который уже опрашивается,
+        сохраняет текущий снимок.
+
+        :param subscriptions: {подписка: warehouse_id}.
+        :param snapshots: Сохранённые снимки: {warehouse_id: {(тип поставки, дата): коэффициент}}.
+        """
+        self.diff.restore(snapshots)
+        with self._lock:
+            for key, warehouse_id in subscriptions.items():
+                warehouse_id = int(warehouse_id)
+                self._remove(key)
+                polled = warehouse_id in self._subscribers
+                self._subscriptions[key] = warehouse_id
+                self._subscribers.setdefault(warehouse_id, set()).add(key)
+                if warehouse_id not in snapshots and not polled:
+                    self._baseline.add(warehouse_id)
+
+    def _remove(self, key: Hashable) -> Optional[int]:
+        """Снимает подписку; возвращает склад, если на него больше никто не подписан."""
+        self._fresh.discard(key)
+        warehouse_id = self._subscriptions.pop(key, None)
+        if warehouse_id is None:
+            return None
+        subscribers = self._subscribers[warehouse_id]
+        subscribers.discard(key)
+        if subscribers:
+            return None
+        del self._subscribers[warehouse_id]
+        self._baseline.discard(warehouse_id)
+        self.diff.forget([warehouse_id])
+        return warehouse_id
+
+    def _delete_stored(self, warehouse_ids: List[int]) -> None:
+        if self.store is None:
+            return
+        try:
+            self.store.delete_slots(warehouse_ids)
+        except Exception as e:
+            logger.warning(f'Не удалось удалить сохранённые снимки складов {warehouse_ids}: {e}')
+
+    def warehouse_ids(self) -> List[int]:
+        """Объединение складов всех подписок."""
+        with self._lock:
+            return sorted(self._subscribers)
+
+    def subscribers(self, warehouse_ids: Iterable[int]) -> Dict[int, Set[Hashable]]:
+        """Снимок подписок на заданные склады."""
+        with self._lock:
+            return {wid: set(self._subscribers.get(wid, ())) for wid in warehouse_ids}
+
+    def batches(self) -> List[List[int]]:
+        """Разбивает склады подписок на пачки для запросов к API."""
+        warehouse_ids = self.warehouse_ids()
+        return [warehouse_ids[i:i + self.batch_size] for i in range(0, len(warehouse_ids), self.batch_size)]
+
+    def process_batch(self, batch: List[int], body: bytes) -> List[Delivery]:
+        """
+        Применяет ответ API по пачке складов к снимку и возвращает, что раздать по складам.
+
+        Если тело ответа не изменилось, оно даже не разбирается. Склады без
+        изменений и без новых подписок в результат не попадают.
+        """
+        changes_by_warehouse: Dict[int, List[SlotChange]] = {}
+        if self.diff.is_unchanged(batch, body):
+            COEFFICIENT_RESPONSES.labels('unchanged').inc()
+        else:
+            COEFFICIENT_RESPONSES.labels('changed').inc()
+            diff = self.diff.update(batch, records(fast_json.loads(body)), body)
+            SLOT_CHANGES.inc(len(diff.added) + len(diff.removed) + len(diff.changed))
+            if self.history is not None and diff:
+                self.history.record(diff.all())
+            if self.store is not None and diff:
+                try:
+                    self.store.save_slots(diff.all())
+                except Exception as e:
+                    logger.warning(f'Не удалось сохранить снимок складов {batch}: {e}')
+            for change in diff.all():
+                changes_by_warehouse.setdefault(change.warehouse_id, []).append(change)
+
+        with self._lock:
+            fresh = {key for key in self._fresh if self._subscriptions.get(key) in batch}
+            self._fresh -= fresh
+            baseline = self._baseline.intersection(batch)
+            self._baseline -= baseline
+        for warehouse_id in baseline:
+            changes_by_warehouse.pop(warehouse_id, None)
+
+        deliveries: List[Delivery] = []
+        for warehouse_id, keys in self.subscribers(batch).items():
+            changes = changes_by_warehouse.get(warehouse_id, [])
+            fresh_keys = keys & fresh
+            if changes or fresh_keys:
+                snapshot = self.diff.snapshot(warehouse_id) if fresh_keys else []
+                deliveries.append(Delivery(warehouse_id, changes, fresh_keys, snapshot))
+        return deliveries
+
+    def process_outage(self, batch: List[int]) -> List[Delivery]:
+        """
+        Раздача при разомкнутом предохранителе API: новые подписки получают
+        последний удачный снимок склада, помеченный устаревшим.
+
+        Подписки складов без снимка ждут восстановления API, остальным
+        подписчикам ничего не отправляется — ошибки не рассылаются на каждом опросе.
+        """
+        with self._lock:
+            fresh = {key for key in self._fresh
+                     if self._subscriptions.get(key) in batch and self.diff.has_snapshot(self._subscriptions[key])}
+            self._fresh -= fresh
+
+        deliveries: List[Delivery] = []
+        for warehouse_id, keys in self.subscribers(batch).items():
+            fresh_keys = keys & fresh
+            if fresh_keys:
+                deliveries.append(Delivery(warehouse_id, [], fresh_keys, self.diff.snapshot(warehouse_id), stale=True))
+        return deliveries
+
+    def poll(self, on_changes: Callable[[Delivery], None], on_error: Callable[[Set[Hashable], Exception], None]) -> None:
+        """
+        Один проход опроса.
+
+        :param on_changes: Вызывается для каждого склада с изменениями или новыми подписками.
+        :param on_error: Вызывается один раз на пачку с подписками пачки и ошибкой запроса
+            (кроме отказа разомкнутого предохранителя — тогда раздаются устаревшие снимки, см. process_outage).
+        """
+        for batch in self.batches():
+            self.poll_batch(batch, on_changes, on_error)
+
+    def poll_batch(self, batch: List[int], on_changes: Callable[[Delivery], None],
+                   on_error: Callable[[Set[Hashable], Exception], None]) -> None:
+        """Запрос и раздача одной пачки складов (обработчики — как в poll)."""
+        try:
+            deliveries = self.process_batch(batch, self.fetch(batch))
+        except CircuitOpenError as e:
+            logger.debug(f'Опрос складов {batch} пропущен: {e}')
+            deliveries = self.process_outage(batch)
+        except Exception as e:
+            logger.warning(f'Ошибка при опросе складов {batch}: {e}')
+            subscribers = self.subscribers(batch)
+            on_error(set().union(*subscribers.values()), e)
+            return
+
+        for delivery in deliveries:
+            on_changes(delivery)
@@ -0,0 +1,81 @@
+import sys
+from datetime import date
+from typing import Any, Dict, Iterable, Iterator, NamedTuple, Optional
+
+
+# Кэши разбора и форматирования дат: в ответах API — 14 дат вперёд, за год набирается несколько сотен
+MAX_CACHED_DAYS = 4096
+_days: Dict[str, int] = {}
+_iso: Dict[int, str] = {}
+_ru: Dict[int, str] = {}
+
+
+def parse_day(value: str) -> int:
+    """
+    Номер дня (date.toordinal) по дате из API: '2024-10-01T00:00:00Z' или '2024-10-01'.
+
+    Каждая строка разбирается один раз, дальше номер берётся из кэша.
+    """
+    day = _days.get(value)
+    if day is None:
+        if len(_days) >= MAX_CACHED_DAYS:
+            _days.clear()
+        day = _days[value] = date.fromisoformat(value[:10]).toordinal()
+    return day
+
+
+def format_day(day: int) -> str:
+    """Дата дня в виде '2024-10-01'."""
+    text = _iso.get(day)
+    if text is None:
+        if len(_iso) >= MAX_CACHED_DAYS:
+            _iso.clear()
+        text = _iso[day] = date.fromordinal(day).isoformat()
+    return text
+
+
+def format_day_ru(day: int) -> str:
+    """Дата дня в виде '01.10.2024' для сообщений пользователю."""
+    text = _ru.get(day)
+    if text is None:
+        if len(_ru) >= MAX_CACHED_DAYS:
+            _ru.clear()
+        text = _ru[day] = date.fromordinal(day).strftime('%d.%m.%Y')
+    return text
+
+
+class CoefficientRecord(NamedTuple):
+    """
+    Строка ответа API коэффициентов приёмки.
+
+    Кортеж без __dict__ (у NamedTuple __slots__ пустой): названия склада и типа
+    поставки интернированы, дата хранится номером дня и разбирается один раз
+    при приёме ответа. Записи сравниваются и хэшируются как кортежи, поэтому
+    годятся ключами для сравнения снимков и дедупликации.
+    """
+    warehouse_id: int
+    warehouse_name: str
+    box_type_name: str
+    day: int  # date.toordinal() даты слота
+    coefficient: int
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> 'CoefficientRecord':
+        """Запись из строки ответа API."""
+        return cls(
+            int(row['warehouseID']),
+            sys.intern(row.get('warehouseName') or ''),
+            sys.intern(row.get('boxTypeName') or ''),
+            parse_day(row['date']),
+            int(row['coefficient']),
+        )
+
+    @property
+    def date(self) -> str:
+        """Дата слота в виде '2024-10-01'."""
+        return format_day(self.day)
+
+
+def records(rows: Optional[Iterable[Dict[str, Any]]]) -> Iterator[CoefficientRecord]:
+    """Записи по строкам ответа API (лениво; None — пустой ответ)."""
+    return map(CoefficientRecord.from_row, rows or ())
@@ -0,0 +1,175 @@
+import time
+import logging
+import requests
+from datetime import datetime
+from threading import Event, Lock, Thread
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Union
+from wb_zero_supply.Metrics import counter
+
+
+logger = logging.getLogger(__name__)
+
+DIGEST_INTERVAL = 300.0  # секунд: окно, за которое администратору приходит одна сводка
+FORGET_AFTER = 86400.0  # секунд тишины, после которых отпечаток снова считается новым
+MAX_DIGEST_LINES = 15  # отпечатков в одной сводке (самые частые), чтобы она уместилась в одно сообщение
+MAX_EXAMPLE_LENGTH = 120
+
+BOT_ERRORS = counter('bot_errors_total', 'Ошибки, отправляемые администратору, по отпечатку', ['endpoint', 'kind', 'status'])
+
+
+class ErrorFingerprint(NamedTuple):
+    endpoint: str  # источник ошибки: эндпоинт API WB или 'bot'
+    kind: str  # тип исключения или вид сообщения
+    status: str  # код ответа HTTP ('-' — ответа нет)
+
+    def __str__(self) -> str:
+        return f'{self.endpoint} {self.kind}' + (f' {self.status}' if self.status != '-' else '')
+
+
+def fingerprint(error: Union[BaseException, str], endpoint: str = 'bot', kind: Optional[str] = None) -> ErrorFingerprint:
+    """
+    Отпечаток ошибки: источник, тип и код ответа, без деталей, которые меняются
+    от случая к случаю (названия складов, ID, текст ответа).
+
+    :param kind: Вид ошибки для текстовых сообщений (по умолчанию — 'message').
+    """
+    if isinstance(error, BaseException):
+        status = '-'
+        response = getattr(error, 'response', None)
+        if isinstance(error, requests.RequestException) and response is not None:
+            status = str(response.status_code)
+        return ErrorFingerprint(endpoint, kind or type(error).__name__, status)
+    return ErrorFingerprint(endpoint, kind or 'message', '-')
+
+
+class _Window:
+    """Учёт одного отпечатка в текущем окне."""
+    __slots__ = ('count', 'users', 'first_seen', 'last_seen', 'example', 'alerted')
+
+    def __init__(self, now: float, example: str):
+        self.alerted = False  # первая ошибка окна уже ушла администратору как новая
+        self.count = 0
+        self.users: Set[int] = set()
+        self.first_seen = now
+        self.last_seen = now
+        self.example = example
+
+
+class ErrorAggregator:
+    """
+    Агрегация ошибок для канала администратора.
+
+    Ошибки группируются по отпечатку (источник, тип, код ответа) и считаются
+    в окнах по interval секунд: по итогам окна уходит одна сводка с числом
+    ошибок, затронутыми пользователями и временем первой и последней ошибки.
+    Сразу отправляется только ошибка с новым отпечатком — ещё не встречавшимся
+    или не встречавшимся дольше forget_after секунд. Так сбой API WB при сотнях
+    подписчиков даёт одно сообщение и сводку, а не тысячи сообщений, отнимающих
+    лимит Telegram у уведомлений пользователей.
+    """
+
+    def __init__(self, send: Callable[[str], None], interval: float = DIGEST_INTERVAL, forget_after: float = FORGET_AFTER):
+        """
+        :param send: Отправка текста администратору (например, через MessageSender).
+        :param interval: Длительность окна сводки в секундах.
+        :param forget_after: Через сколько секунд тишины отпечаток снова считается новым.
+        """
+        self.send = send
+        self.interval = interval
+        self.forget_after = forget_after
+        self._lock = Lock()
+        self._window: Dict[ErrorFingerprint, _Window] = {}
+        self._window_started = time.time()
+        self._last_seen: Dict[ErrorFingerprint, float] = {}
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+
+    def report(self, error: Union[BaseException, str], endpoint: str = 'bot', user_ids: Iterable[int] = (),
+               kind: Optional[str] = None) -> bool:
+        """
+        Учитывает ошибку.
+
+        :param error: Исключение или текст ошибки.
+        :param endpoint: Источник ошибки.
+        :param user_ids: Затронутые пользователи.
+        :param kind: Вид ошибки для текстовых сообщений.
+        :return: Был ли отпечаток новым (тогда администратор уже получил сообщение).
+        """
+        key = fingerprint(error, endpoint, kind)
+        example = str(error)[:MAX_EXAMPLE_LENGTH]
+        now = time.time()
+        with self._lock:
+            last_seen = self._last_seen.get(key)
+            new = last_seen is None or now - last_seen > self.forget_after
+            self._last_seen[key] = now
+            window = self._window.get(key)
+            if window is None:
+                window = self._window[key] = _Window(now, example)
+            window.count += 1
+            window.users.update(user_ids)
+            window.last_seen = now
+            window.alerted = window.alerted or new
+        BOT_ERRORS.labels(*key).inc()
+        if new:
+            self.send(f'Ошибка бота (новая): {key}\n{example}')
+        return new
+
+    def digest(self) -> Optional[str]:
+        """Закрывает текущее окно и возвращает текст сводки (None — ошибок не было)."""
+        now = time.time()
+        with self._lock:
+            window, self._window = self._window, {}
+            started, self._window_started = self._window_started, now
+            # Отпечатки, не встречавшиеся дольше forget_after, больше не нужны
+            self._last_seen = {key: seen for key, seen in self._last_seen.items() if now - seen <= self.forget_after}
+        # Единичная ошибка, о которой администратор уже получил сообщение, в сводке не повторяется
+        window = {key: entry for key, entry in window.items() if entry.count > 1 or not entry.alerted}
+        if not window:
+            return None
+
+        items = sorted(window.items(), key=lambda item: item[1].count, reverse=True)
+        total = sum(entry.count for entry in window.values())
+        users = set().union(*(entry.users for entry in window.values()))
+        lines: List[str] = [
+            f'Сводка ошибок бота {_clock(started)}–{_clock(now)}: {total} ошибок, отпечатков: {len(window)}, '
+            f'пользователей: {len(users)}'
+        ]
+        for key, entry in items[:MAX_DIGEST_LINES]:
+            lines.append(f'• {key} — {entry.count} раз, пользователей: {len(entry.users)}, '
+                         f'{_clock(entry.first_seen)}–{_clock(entry.last_seen)}\n  {entry.example}')
+        if len(items) > MAX_DIGEST_LINES:
+            lines.append(f'… и ещё отпечатков: {len(items) - MAX_DIGEST_LINES}')
+        return '\n'.join(lines)
+
+    def flush(self) -> None:
+        """Отправляет сводку за текущее окно, если в нём были ошибки."""
+        text = self.digest()
+        if text is not None:
+            self.send(text)
+
+    def start(self) -> None:
+        """Запускает поток, отправляющий сводку раз в interval секунд."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name='error-digest', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5) -> None:
+        """Останавливает поток и отправляет сводку за незакрытое окно."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f'Не удалось отправить сводку ошибок: {e!r}')
+
+
+def _clock(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).strftime('%H:%M:%S')
@@ -0,0 +1,227 @@
+import time
+import heapq
+import logging
+from itertools import count
+from threading import Condition, Thread
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple, Union
+from telegram.error import RetryAfter, Unauthorized, BadRequest, TelegramError
+from wb_zero_supply.Metrics import counter, gauge, histogram
+from wb_zero_supply.RateLimiter import TokenBucket
+
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_RATE = 30  # сообщений в секунду на бота (лимит Telegram)
+CHAT_INTERVAL = 1.0  # секунд между сообщениями в личный чат
+GROUP_INTERVAL = 3.0  # секунд между сообщениями в группу/канал (20 в минуту)
+DIGEST_WINDOW = 1.0  # секунд ожидания, чтобы собрать несколько обновлений в одно сообщение
+MAX_MESSAGE_LENGTH = 4096
+ERROR_PRIORITY = 50  # ошибки отправляются после уведомлений о слотах
+
+ChatId = Union[int, str]
+
+TELEGRAM_SEND_LATENCY = histogram('telegram_send_duration_seconds', 'Время вызова sendMessage')
+TELEGRAM_SENDS = counter('telegram_sends_total', 'Отправки в Telegram по результату', ['result'])
+TELEGRAM_QUEUE = gauge('telegram_queued_messages', 'Сообщений в очереди на отправку')
+
+
+class OutgoingMessage(NamedTuple):
+    priority: int
+    text: str
+    reply_markup: Any = None
+    digest: bool = False
+
+
+class MessageSender:
+    """
+    Очередь исходящих сообщений Telegram с приоритетами и ограничением частоты.
+
+    Отправкой занимается отдельный поток, поэтому вызывающий код не ждёт сети
+    и не держит свои блокировки во время отправки. Чаты обслуживаются по
+    приоритету (меньше — раньше, для слотов это коэффициент), с общим лимитом
+    на бота и паузой между сообщениями в один чат. Несколько обновлений для
+    одного чата, помеченные как digest, склеиваются в одно сообщение.
+    """
+
+    def __init__(self, bot, global_rate: int = GLOBAL_RATE, chat_interval: float = CHAT_INTERVAL,
+                 group_interval: float = GROUP_INTERVAL, digest_window: float = DIGEST_WINDOW):
+        """
+        :param bot: Экземпляр telegram.Bot.
+        :param global_rate: Максимум сообщений в секунду на бота.
+        :param chat_interval: Минимальная пауза между сообщениями в личный чат.
+        :param group_interval: Минимальная пауза между сообщениями в группу или канал.
+        :param digest_window: Сколько ждать новых обновлений для чата перед отправкой сводки.
+        """
+        self.bot = bot
+        self.chat_interval = chat_interval
+        self.group_interval = group_interval
+        self.digest_window = digest_window
+        self._global_limiter = TokenBucket(global_rate, 1, name='telegram')
+
+        self._cond = Condition()
+        self._seq = count()
+        self._ready: List[Tuple[int, int, ChatId]] = []  # (приоритет, порядок, chat_id)
+        self._delayed: List[Tuple[float, int, int, ChatId]] = []  # (время готовности, приоритет, порядок, chat_id)
+        self._scheduled: Dict[ChatId, Tuple[float, int, int]] = {}  # chat_id -> актуальная запись в очереди
+        self._pending: Dict[ChatId, List[OutgoingMessage]] = {}
+        self._in_flight: Set[ChatId] = set()
+        self._next_allowed: Dict[ChatId, float] = {}
+        self._thread: Optional[Thread] = None
+        self._running = False
+        self._draining = False  # при остановке: отправить очередь, не дожидаясь окон сводок и пауз чатов
+
+        self.sent = 0
+        self.failed = 0
+        self.merged = 0
+
+    def send(self, chat_id: ChatId, text: str, reply_markup: Any = None, priority: int = ERROR_PRIORITY, digest: bool = False) -> None:
+        """
+        Ставит сообщение в очередь и сразу возвращает управление.
+
+        :param priority: Приоритет (меньше — раньше).
+        :param digest: Разрешить склейку с другими такими же сообщениями для этого чата.
+        """
+        message = OutgoingMessage(priority, text, reply_markup, digest)
+        with self._cond:
+            self._pending.setdefault(chat_id, []).append(message)
+            if chat_id in self._in_flight:
+                return  # чат запланируют заново после текущей отправки
+            scheduled = self._scheduled.get(chat_id)
+            if scheduled is None:
+                ready_at = max(self._next_allowed.get(chat_id, 0.0), time.monotonic() + (self.digest_window if digest else 0.0))
+                self._schedule(chat_id, ready_at, priority)
+            elif priority < scheduled[1]:
+                # Более срочное сообщение поднимает приоритет чата, не сдвигая время готовности
+                self._schedule(chat_id, scheduled[0], priority)
+            self._cond.notify()
+
+    def _schedule(self, chat_id: ChatId, ready_at: float, priority: int) -> None:
+        seq = next(self._seq)
+        self._scheduled[chat_id] = (ready_at, priority, seq)
+        heapq.heappush(self._delayed, (ready_at, priority, seq, chat_id))
+
+    def start(self) -> None:
+        """Запускает поток отправки."""
+        self._running = True
+        self._draining = False
+        TELEGRAM_QUEUE.set_function(lambda: self.stats()['queued'])
+        self._thread = Thread(target=self._run, name='telegram-sender', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5) -> None:
+        """
+        Досылает очередь и останавливает поток отправки.
+
+        :param timeout: Сколько секунд ждать отправки очереди; что не успело уйти, отбрасывается.
+        """
+        with self._cond:
+            self._draining = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+    def stats(self) -> Dict[str, int]:
+        """Статистика отправки."""
+        with self._cond:
+            queued = sum(len(messages) for messages in self._pending.values())
+        return {'sent': self.sent, 'failed': self.failed, 'merged': self.merged, 'queued': queued}
+
+    def _next_chat(self) -> Optional[Tuple[ChatId, List[OutgoingMessage]]]:
+        """Ждёт готовый к отправке чат и забирает его сообщения. None — если отправитель остановлен или очередь дослана."""
+        with self._cond:
+            while self._running:
+                now = time.monotonic()
+                while self._delayed and (self._draining or self._delayed[0][0] <= now):
+                    _, priority, seq, chat_id = heapq.heappop(self._delayed)
+                    heapq.heappush(self._ready, (priority, seq, chat_id))
+
+                while self._ready:
+                    _, seq, chat_id = heapq.heappop(self._ready)
+                    scheduled = self._scheduled.get(chat_id)
+                    if scheduled is None or scheduled[2] != seq:
+                        continue  # запись устарела после повышения приоритета
+                    del self._scheduled[chat_id]
+                    self._in_flight.add(chat_id)
+                    return chat_id, sorted(self._pending.pop(chat_id), key=lambda m: m.priority)
+
+                if self._draining:
+                    return None
+                self._cond.wait(self._delayed[0][0] - now if self._delayed else None)
+            return None
+
+    def _run(self) -> None:
+        while True:
+            item = self._next_chat()
+            if item is None:
+                return
+            chat_id, messages = item
+            # Отрицательные ID и @username — группы и каналы, у них лимит строже
+            interval = self.group_interval if isinstance(chat_id, str) or chat_id < 0 else self.chat_interval
+            merged = self._merge(messages)
+            for i, message in enumerate(merged):
+                self._global_limiter.acquire()
+                retry_after = self._deliver(chat_id, message)
+                if retry_after is not None:
+                    with self._cond:
+                        self._pending.setdefault(chat_id, [])[:0] = merged[i:]
+                    interval = max(interval, retry_after)
+                    break
+
+            with self._cond:
+                self._in_flight.discard(chat_id)
+                self._next_allowed[chat_id] = time.monotonic() + interval
+                if chat_id in self._pending:
+                    # Сообщения, пришедшие во время отправки, ждут паузы чата
+                    priority = min(m.priority for m in self._pending[chat_id])
+                    self._schedule(chat_id, self._next_allowed[chat_id], priority)
+
+    def _merge(self, messages: List[OutgoingMessage]) -> List[OutgoingMessage]:
+        """Склеивает digest-сообщения чата в сводки, не превышая лимит длины Telegram."""
+        result: List[OutgoingMessage] = []
+        digest: List[OutgoingMessage] = []
+        for message in messages:
+            (digest if message.digest else result).append(message)
+
+        chunk: List[OutgoingMessage] = []
+        for message in digest:
+            if chunk and len('\n\n'.join(m.text for m in chunk + [message])) > MAX_MESSAGE_LENGTH:
+                result.append(self._digest_message(chunk))
+                chunk = []
+            chunk.append(message)
+        if chunk:
+            result.append(self._digest_message(chunk))
+        return sorted(result, key=lambda m: m.priority)
+
+    def _digest_message(self, messages: List[OutgoingMessage]) -> OutgoingMessage:
+        if len(messages) == 1:
+            return messages[0]
+        self.merged += len(messages) - 1
+        return OutgoingMessage(messages[0].priority, '\n\n'.join(m.text for m in messages), messages[0].reply_markup, True)
+
+    def _deliver(self, chat_id: ChatId, message: OutgoingMessage) -> Optional[float]:
+        """Отправляет сообщение. Возвращает паузу в секундах, если Telegram просит повторить позже."""
+        started = time.perf_counter()
+        try:
+            self.bot.send_message(chat_id=chat_id, text=message.text, reply_markup=message.reply_markup)
+            self.sent += 1
+            TELEGRAM_SENDS.labels('ok').inc()
+        except RetryAfter as e:
+            TELEGRAM_SENDS.labels('retry_after').inc()
+            logger.warning(f'Telegram просит подождать {e.retry_after} с перед отправкой в чат {chat_id}')
+            self._global_limiter.backoff(e.retry_after)
+            return float(e.retry_after)
+        except (Unauthorized, BadRequest) as e:
+            # Пользователь заблокировал бота или чат недоступен — повторять бессмысленно
+            self.failed += 1
+            TELEGRAM_SENDS.labels('rejected').inc()
+            logger.warning(f'Сообщение в чат {chat_id} не доставлено: {e}')
+        except TelegramError as e:
+            self.failed += 1
+            TELEGRAM_SENDS.labels('error').inc()
+            logger.error(f'Ошибка отправки сообщения в чат {chat_id}: {e}')
+        finally:
+            TELEGRAM_SEND_LATENCY.observe(time.perf_counter() - started)
+        return None
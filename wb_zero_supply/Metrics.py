@@ -0,0 +1,312 @@
+import os
+import json
+import time
+import logging
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм по умолчанию, секунд
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRICS_HOST = '127.0.0.1'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+STATS_CONTENT_TYPE = 'application/json; charset=utf-8'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Базовый класс метрики с метками; значения по меткам хранятся в дочерних объектах."""
+
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values) -> object:
+        """Значение метрики для конкретных меток (объект кэшируется, повторный вызов дешёвый)."""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f'{self.name}: ожидаются метки {self.labelnames}, получено {key}')
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self) -> object:
+        raise NotImplementedError
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        documentation = self.documentation.replace('\\', '\\\\').replace('\n', '\\n')
+        lines = [f'# HELP {self.name} {documentation}', f'# TYPE {self.name} {self.type}']
+        lines.extend(self._samples())
+        return '\n'.join(lines)
+
+
+class _Value:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(Metric):
+    """Монотонно растущий счётчик (имя по соглашению Prometheus оканчивается на _total)."""
+
+    type = 'counter'
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1) -> None:
+        """Увеличивает счётчик без меток."""
+        self.labels().inc(amount)
+
+    def _samples(self) -> List[str]:
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}'
+                for key, child in list(self._children.items())]
+
+
+class Gauge(Metric):
+    """Текущее значение; может вычисляться при каждом чтении (set_function)."""
+
+    type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._function: Optional[Callable[[], float]] = None
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self.labels().dec(amount)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Значение без меток берётся из функции в момент чтения метрик: горячий путь не трогается."""
+        self._function = function
+
+    def _samples(self) -> List[str]:
+        if self._function is not None:
+            try:
+                return [f'{self.name} {_format_value(self._function())}']
+            except Exception as e:
+                logger.warning(f'Не удалось вычислить метрику {self.name}: {e}')
+                return []
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}'
+                for key, child in list(self._children.items())]
+
+
+class _HistogramValue:
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # последняя корзина — +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Histogram(Metric):
+    """Распределение значений по корзинам (задержки)."""
+
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, child in list(self._children.items()):
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Registry:
+    """Набор метрик процесса; повторная регистрация с тем же именем возвращает существующую метрику."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f'Метрика {metric.name} уже зарегистрирована с другим типом или метками')
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+_stats_providers: Dict[str, Callable[[], Any]] = {}
+
+
+def register_stats(name: str, provider: Callable[[], Any]) -> None:
+    """Добавляет подробную статистику компонента (например, по токенам) в ответ /stats."""
+    _stats_providers[name] = provider
+
+
+def collect_stats() -> Dict[str, Any]:
+    """Статистика всех зарегистрированных компонентов; ошибка одного не мешает остальным."""
+    stats: Dict[str, Any] = {}
+    for name, provider in list(_stats_providers.items()):
+        try:
+            stats[name] = provider()
+        except Exception as e:
+            stats[name] = {'error': repr(e)}
+    return stats
+
+
+# Общая метрика отставания запуска периодических задач от расписания
+JOB_LAG = histogram('job_scheduling_lag_seconds', 'Отставание фактического запуска задачи от запланированного', ['job'])
+
+
+def observe_job_lag(job, name: Optional[str] = None) -> None:
+    """
+    Записывает отставание запуска задачи JobQueue (telegram.ext.Job) от расписания.
+
+    :param name: Метка задачи (по умолчанию имя задачи).
+
+    К моменту вызова APScheduler обычно уже сдвинул next_run_time на следующий
+    период, поэтому плановое время — next_run_time минус интервал.
+    """
+    next_run = getattr(job, 'next_t', None)
+    interval = getattr(getattr(job.job, 'trigger', None), 'interval', None)
+    if next_run is None or interval is None:
+        return
+    now = time.time()
+    planned = next_run.timestamp()
+    if planned > now:
+        planned -= interval.total_seconds()
+    JOB_LAG.labels(name or job.name).observe(max(0.0, now - planned))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry: Registry = REGISTRY
+
+    def do_GET(self) -> None:
+        path = self.path.split('?')[0]
+        if path in ('/metrics', '/'):
+            body, content_type = self.registry.render().encode('utf-8'), CONTENT_TYPE
+        elif path == '/stats':
+            body, content_type = json.dumps(collect_stats(), ensure_ascii=False, indent=2).encode('utf-8'), STATS_CONTENT_TYPE
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def start_http_server(port: int, host: str = METRICS_HOST) -> ThreadingHTTPServer:
+    """Отдаёт метрики на http://host:port/metrics и статистику компонентов на /stats из фонового потока."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    logger.info(f'Метрики доступны на http://{host}:{server.server_port}/metrics')
+    return server
+
+
+def start_from_env() -> Optional[ThreadingHTTPServer]:
+    """Запускает сервер метрик, если задан METRICS_PORT (адрес — METRICS_HOST, по умолчанию 127.0.0.1)."""
+    port = os.getenv('METRICS_PORT')
+    if not port:
+        return None
+    return start_http_server(int(port), os.getenv('METRICS_HOST', METRICS_HOST))
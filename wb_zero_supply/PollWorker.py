@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import redis
+import signal
+import socket
+import logging
+import requests
+from threading import Event
+from typing import Callable, Dict, List, Optional
+from wb_zero_supply import fast_json, http_client
+from wb_zero_supply.CircuitBreaker import CircuitOpenError
+from wb_zero_supply.Metrics import counter, start_from_env
+from wb_zero_supply.RedisManager import RedisManager, RedisManagerQuota, timed
+from wb_zero_supply.TokenPool import use_shared_quota
+from wb_zero_supply.get_stock_wb_from_api import COEFFICIENTS_URL, fetch_coefficients_body
+
+
+logger = logging.getLogger(__name__)
+
+TASKS_STREAM = 'poll:tasks'
+RESULTS_STREAM = 'poll:results'
+WORKERS_GROUP = 'workers'
+NOTIFIER_GROUP = 'notifier'
+NOTIFIER_CONSUMER = 'notifier'  # уведомитель один, фиксированное имя позволяет дочитать свои задачи после перезапуска
+STREAM_MAXLEN = 10_000  # приблизительная длина потока задач
+RESULTS_MAXLEN = 1_000  # приблизительная длина потока результатов, пока уведомитель недоступен
+ROW_FIELDS = ('warehouseID', 'warehouseName', 'boxTypeName', 'date', 'coefficient')  # поля строки, нужные уведомителю
+BLOCK_MS = 2000  # ожидание новых записей; меньше таймаута сокета Redis
+LEASE_TIMEOUT = 30.0  # секунд: неподтверждённую задачу забирает другой воркер
+TASK_TTL = 60.0  # секунд: более старые задачи не выполняются, следующий опрос уже поставлен
+
+POLL_TASKS = counter('poll_tasks_total', 'Задачи опроса на воркерах по результату', ['result'])
+
+# Обработчик результата: (склады пачки, тело ответа или None, ошибка или None)
+ResultHandler = Callable[[List[int], Optional[bytes], Optional[Exception]], None]
+
+
+def consumer_name() -> str:
+    """Имя воркера в группе: хост и PID."""
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+def _ensure_group(client, stream: str, group: str) -> None:
+    try:
+        client.xgroup_create(stream, group, id='0', mkstream=True)
+    except redis.ResponseError as e:
+        if 'BUSYGROUP' not in str(e):
+            raise
+
+
+def _batch(field: str) -> List[int]:
+    return [int(warehouse_id) for warehouse_id in field.split(',') if warehouse_id]
+
+
+def compact_body(body: bytes, warehouse_ids: List[int]) -> bytes:
+    """
+    Ответ API, урезанный до строк складов пачки и полей, нужных уведомителю.
+
+    Сериализация детерминирована, поэтому одинаковые ответы дают одинаковое
+    тело и уведомитель по-прежнему пропускает их без разбора.
+    """
+    wanted = set(warehouse_ids)
+    rows = [{field: row.get(field) for field in ROW_FIELDS}
+            for row in fast_json.loads(body) or () if row.get('warehouseID') in wanted]
+    return json.dumps(rows, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class PollTaskQueue(RedisManager):
+    """
+    Сторона уведомителя: ставит пачки складов в поток задач Redis и читает результаты.
+
+    Задачи разбирают воркеры из группы consumer group, ответы возвращаются в
+    отдельный поток, который читает единственный уведомитель; обработанные
+    результаты удаляются из потока сразу после подтверждения. Опоздавшие
+    результаты (например, от воркера, чья задача уже была перехвачена)
+    отбрасываются, чтобы старый снимок не перезаписал новый.
+    """
+
+    def __init__(self, db_number=1, password=None):
+        super().__init__(db_number=db_number, password=password)
+        self._groups_ready = False
+        self._applied: Dict[str, float] = {}  # пачка -> время постановки последней применённой задачи
+
+    def _ensure_groups(self) -> None:
+        if not self._groups_ready:
+            _ensure_group(self.redis_client, TASKS_STREAM, WORKERS_GROUP)
+            _ensure_group(self.redis_client, RESULTS_STREAM, NOTIFIER_GROUP)
+            self._groups_ready = True
+
+    @timed('submit_poll_task')
+    def submit(self, batch: List[int]) -> None:
+        """Ставит пачку складов в очередь опроса."""
+        self._ensure_groups()
+        self.redis_client.xadd(
+            TASKS_STREAM,
+            {'batch': ','.join(map(str, batch)), 'created': f'{time.time():.3f}'},
+            maxlen=STREAM_MAXLEN, approximate=True,
+        )
+
+    def consume(self, handler: ResultHandler, stop: Event) -> None:
+        """Читает результаты воркеров до установки stop (сначала — неподтверждённые после перезапуска)."""
+        last_id = '0'
+        while not stop.is_set():
+            try:
+                self._ensure_groups()
+                entries = self.redis_client.xreadgroup(NOTIFIER_GROUP, NOTIFIER_CONSUMER, {RESULTS_STREAM: last_id},
+                                                       count=100, block=BLOCK_MS)
+                messages = entries[0][1] if entries else []
+                if last_id == '0' and not messages:
+                    last_id = '>'  # свои неподтверждённые результаты дочитаны
+                for message_id, fields in messages:
+                    try:
+                        self._handle(fields, handler)
+                    except Exception as e:
+                        logger.error(f'Ошибка обработки результата опроса {message_id}: {e!r}')
+                    pipe = self.redis_client.pipeline(transaction=True)
+                    pipe.xack(RESULTS_STREAM, NOTIFIER_GROUP, message_id)
+                    pipe.xdel(RESULTS_STREAM, message_id)
+                    pipe.execute()
+            except redis.RedisError as e:
+                logger.error(f'Ошибка чтения результатов опроса из Redis: {e}')
+                last_id = '0'  # после сбоя дочитываем неподтверждённое
+                stop.wait(1)
+
+    def _handle(self, fields: Dict[str, str], handler: ResultHandler) -> None:
+        created = float(fields.get('created', 0))
+        if created < self._applied.get(fields['batch'], 0):
+            return
+        if len(self._applied) > STREAM_MAXLEN:
+            self._applied.clear()
+        self._applied[fields['batch']] = created
+
+        status = int(fields['status'])
+        if fields.get('circuit'):
+            handler(_batch(fields['batch']), None, CircuitOpenError(fields['circuit'], float(fields.get('retry_in', 0))))
+        elif status == 200:
+            handler(_batch(fields['batch']), fields['body'].encode('utf-8'), None)
+        elif status:
+            response = http_client.response_from_status(COEFFICIENTS_URL, status, {}, b'')
+            handler(_batch(fields['batch']), None, requests.HTTPError(fields['error'], response=response))
+        else:
+            handler(_batch(fields['batch']), None, requests.RequestException(fields['error']))
+
+
+class PollWorker(RedisManager):
+    """
+    Воркер опроса: разбирает задачи из потока Redis, запрашивает API WB и возвращает ответ.
+
+    Воркеров может быть сколько угодно на любых машинах — задачи делятся
+    между ними группой потребителей. В поток результатов уходят только
+    строки складов пачки без лишних полей. Задача подтверждается и удаляется
+    только вместе с записью результата; задачи упавшего воркера по истечении аренды
+    перехватываются (XAUTOCLAIM) живыми воркерами.
+    """
+
+    def __init__(self, fetch: Callable[[List[int]], bytes], db_number=1, password=None, consumer: Optional[str] = None,
+                 lease_timeout: float = LEASE_TIMEOUT, task_ttl: float = TASK_TTL):
+        """
+        :param fetch: Запрос коэффициентов по списку складов, возвращающий тело ответа.
+        :param consumer: Имя воркера в группе (по умолчанию хост и PID).
+        :param lease_timeout: Через сколько секунд неподтверждённая задача считается брошенной.
+        :param task_ttl: Задачи старше стольких секунд пропускаются без запроса.
+        """
+        super().__init__(db_number=db_number, password=password)
+        self.fetch = fetch
+        self.consumer = consumer or consumer_name()
+        self.lease_timeout = lease_timeout
+        self.task_ttl = task_ttl
+
+    def run(self, stop: Event) -> None:
+        """Цикл воркера до установки stop."""
+        logger.info(f'Воркер опроса {self.consumer} запущен')
+        last_claim = 0.0
+        group_ready = False
+        while not stop.is_set():
+            try:
+                if not group_ready:
+                    _ensure_group(self.redis_client, TASKS_STREAM, WORKERS_GROUP)
+                    group_ready = True
+                messages = []
+                if time.monotonic() - last_claim >= self.lease_timeout / 2:
+                    last_claim = time.monotonic()
+                    messages = self.redis_client.xautoclaim(TASKS_STREAM, WORKERS_GROUP, self.consumer,
+                                                            min_idle_time=int(self.lease_timeout * 1000), count=10)[1]
+                    if messages:
+                        logger.warning(f'Воркер {self.consumer} перехватил {len(messages)} задач у недоступных воркеров')
+                if not messages:
+                    entries = self.redis_client.xreadgroup(WORKERS_GROUP, self.consumer, {TASKS_STREAM: '>'},
+                                                           count=1, block=BLOCK_MS)
+                    messages = entries[0][1] if entries else []
+                for message_id, fields in messages:
+                    self.handle(message_id, fields)
+            except redis.RedisError as e:
+                logger.error(f'Ошибка Redis в воркере {self.consumer}: {e}')
+                stop.wait(1)
+        logger.info(f'Воркер опроса {self.consumer} остановлен')
+
+    def handle(self, message_id: str, fields: Optional[Dict[str, str]]) -> None:
+        """Выполняет задачу и атомарно записывает результат вместе с подтверждением."""
+        if not fields or time.time() - float(fields.get('created', 0)) > self.task_ttl:
+            POLL_TASKS.labels('stale').inc()
+            pipe = self.redis_client.pipeline(transaction=True)
+            pipe.xack(TASKS_STREAM, WORKERS_GROUP, message_id)
+            pipe.xdel(TASKS_STREAM, message_id)
+            pipe.execute()
+            return
+
+        result = {'batch': fields['batch'], 'created': fields['created'], 'worker': self.consumer}
+        try:
+            batch = _batch(fields['batch'])
+            body = compact_body(self.fetch(batch), batch)
+            result.update(status='200', body=body.decode('utf-8'))
+            POLL_TASKS.labels('ok').inc()
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else 0
+            result.update(status=str(status), error=str(e))
+            POLL_TASKS.labels('error').inc()
+        except CircuitOpenError as e:
+            result.update(status='0', error=str(e), circuit=e.endpoint, retry_in=f'{e.retry_in:.0f}')
+            POLL_TASKS.labels('circuit_open').inc()
+        except Exception as e:
+            result.update(status='0', error=str(e) or repr(e))
+            POLL_TASKS.labels('error').inc()
+
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.xadd(RESULTS_STREAM, result, maxlen=RESULTS_MAXLEN, approximate=True)
+        pipe.xack(TASKS_STREAM, WORKERS_GROUP, message_id)
+        pipe.xdel(TASKS_STREAM, message_id)
+        pipe.execute()
+
+
+def run_worker(api_key: str) -> None:
+    """Запускает воркер опроса в текущем процессе до SIGINT/SIGTERM."""
+    worker = PollWorker(lambda warehouse_ids: fetch_coefficients_body(api_key, warehouse_ids))
+    if not worker.check_connection():
+        logger.error('Не удалось подключиться к Redis.')
+        return
+    # Воркеры могут делить токены: квоты WB на токен учитываются в Redis для всех процессов
+    use_shared_quota(RedisManagerQuota())
+
+    stop = Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    start_from_env()
+    worker.run(stop)
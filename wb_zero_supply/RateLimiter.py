@@ -0,0 +1,255 @@
+import os
+import time
+import logging
+import requests
+from threading import Lock
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+from wb_zero_supply.CircuitBreaker import CircuitOpenError, get_breaker
+from wb_zero_supply.Metrics import counter, histogram
+
+if TYPE_CHECKING:
+    from wb_zero_supply.TokenPool import TokenPool
+
+
+logger = logging.getLogger(__name__)
+
+# Квоты по умолчанию: (запросов, за секунд). Лимиты WB для supplies-api — 6 запросов в минуту.
+DEFAULT_LIMITS: Dict[str, Tuple[int, float]] = {
+    'coefficients': (6, 60),
+    'warehouses': (6, 60),
+}
+WB_REQUEST_LATENCY = histogram('wb_request_duration_seconds', 'Время ответа API WB', ['endpoint'])
+WB_REQUESTS = counter('wb_requests_total', 'Запросы к API WB по кодам ответа (error — без ответа)', ['endpoint', 'status'])
+WB_RATE_LIMIT_WAIT = histogram('wb_rate_limit_wait_seconds', 'Ожидание квоты перед запросом к API WB', ['endpoint'])
+
+BASE_BACKOFF = 1.0  # секунд, первая пауза после 429 без Retry-After
+MAX_BACKOFF = 300.0  # секунд, верхняя граница экспоненциальной паузы
+SERVER_ERRORS = frozenset({500, 502, 503, 504})  # ответы, после которых запрос повторяется
+SERVER_RETRIES = 2  # повторов после ответа 5xx
+SERVER_RETRY_BACKOFF = 0.5  # секунд, первая пауза перед повтором после 5xx (дальше удваивается)
+
+
+class TokenBucket:
+    """
+    Ограничитель запросов «корзина токенов» с очередью и адаптивной паузой.
+
+    Каждый вызов резервирует себе токен, даже если корзина пуста: баланс уходит
+    в минус, а вызывающий ждёт, пока его токен накопится. Так всплеск запросов
+    растягивается во времени в порядке поступления, а не отбрасывается.
+    """
+
+    def __init__(self, rate: int, per: float, name: str = ''):
+        """
+        :param rate: Число запросов, разрешённых за период.
+        :param per: Длительность периода в секундах.
+        :param name: Имя эндпоинта (для логов и статистики).
+        """
+        self.name = name
+        self.capacity = float(rate)
+        self.fill_rate = rate / per
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._backoff_attempts = 0
+        self._lock = Lock()
+
+        self.requests = 0
+        self.throttled = 0
+        self.rate_limited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def reserve(self) -> float:
+        """Резервирует токен и возвращает, сколько секунд нужно подождать перед запросом."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.fill_rate)
+            self._updated = now
+            self._tokens -= 1
+
+            delay = -self._tokens / self.fill_rate if self._tokens < 0 else 0.0
+            delay = max(delay, self._blocked_until - now)
+
+            self.requests += 1
+            if delay > 0:
+                self.throttled += 1
+                self.total_wait += delay
+                self.max_wait = max(self.max_wait, delay)
+            return delay
+
+    def wait_time(self) -> float:
+        """Сколько секунд ждал бы запрос, зарезервированный сейчас (токен не резервируется)."""
+        with self._lock:
+            now = time.monotonic()
+            tokens = min(self.capacity, self._tokens + (now - self._updated) * self.fill_rate) - 1
+            delay = -tokens / self.fill_rate if tokens < 0 else 0.0
+            return max(delay, self._blocked_until - now)
+
+    def available(self) -> float:
+        """Свободный запас запросов в корзине (отрицательный — запросы уже в очереди)."""
+        with self._lock:
+            return min(self.capacity, self._tokens + (time.monotonic() - self._updated) * self.fill_rate)
+
+    def acquire(self) -> float:
+        """Блокирует поток до разрешения запроса. Возвращает время ожидания в секундах."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def backoff(self, retry_after: Optional[float] = None) -> float:
+        """
+        Приостанавливает эндпоинт после ответа 429.
+
+        :param retry_after: Пауза из заголовка ответа; без неё пауза растёт экспоненциально.
+        :return: Длительность паузы в секундах.
+        """
+        with self._lock:
+            self._backoff_attempts += 1
+            self.rate_limited += 1
+            if retry_after is None:
+                retry_after = min(MAX_BACKOFF, BASE_BACKOFF * 2 ** (self._backoff_attempts - 1))
+            self._hold(retry_after)
+            return retry_after
+
+    def hold(self, seconds: float) -> None:
+        """Не пропускает запросы seconds секунд (например, пока API не восстановит исчерпанную квоту)."""
+        with self._lock:
+            self._hold(seconds)
+
+    def _hold(self, seconds: float) -> None:
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        # Токены, накопленные до паузы, не должны пропустить пачку запросов сразу после неё
+        self._tokens = min(self._tokens, 0.0)
+
+    def success(self) -> None:
+        """Сбрасывает счётчик последовательных ответов 429."""
+        with self._lock:
+            self._backoff_attempts = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Статистика ожиданий и ограничений."""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'rate_limited': self.rate_limited,
+                'total_wait': round(self.total_wait, 3),
+                'avg_wait': round(self.total_wait / self.requests, 3) if self.requests else 0.0,
+                'max_wait': round(self.max_wait, 3),
+            }
+
+
+def load_limits() -> Dict[str, Tuple[int, float]]:
+    """
+    Квоты эндпоинтов с учётом переменной окружения WB_RATE_LIMITS.
+
+    Формат: ``coefficients=6/60,warehouses=6/60`` (запросов/секунд).
+    """
+    limits = dict(DEFAULT_LIMITS)
+    for item in filter(None, os.getenv('WB_RATE_LIMITS', '').split(',')):
+        try:
+            endpoint, quota = item.split('=')
+            rate, per = quota.split('/')
+            limits[endpoint.strip()] = (int(rate), float(per))
+        except ValueError:
+            logger.error(f'Некорректная квота в WB_RATE_LIMITS: {item}')
+    return limits
+
+
+def parse_retry_after(response: requests.Response) -> Optional[float]:
+    """Пауза из заголовков X-Ratelimit-Retry / Retry-After (секунды или HTTP-дата)."""
+    value = response.headers.get('X-Ratelimit-Retry') or response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def rate_limited_get(endpoint: str, url: str, pool: 'TokenPool', max_retries: int = 3,
+                     session: Optional[requests.Session] = None, **kwargs) -> requests.Response:
+    """
+    GET-запрос через ограничитель эндпоинта у токена из пула.
+
+    При ответе 429 эндпоинт приостанавливается (по Retry-After или экспоненциально)
+    и запрос повторяется до max_retries раз. Ответ 5xx повторяется до SERVER_RETRIES
+    раз с нарастающей паузой: каждая попытка тратит квоту и учитывается предохранителем,
+    а если он разомкнулся, возвращается последний ответ. Возвращает последний ответ.
+    Пока предохранитель эндпоинта разомкнут, запрос не отправляется и квота не тратится.
+
+    :param pool: Пул токенов API WB: каждая попытка идёт с выбранного пулом токена через
+                 его ограничитель, а ответ 401/403 повторяется с другим токеном.
+    :param session: Сессия для запроса (по умолчанию — отдельное соединение requests.get).
+    :raises CircuitOpenError: Если предохранитель эндпоинта разомкнут.
+    """
+    breaker = get_breaker(endpoint)
+    breaker.allow()
+    for attempt in range(SERVER_RETRIES + 1):
+        try:
+            response = _get_with_retries(endpoint, url, pool, max_retries, session, **kwargs)
+        except requests.RequestException:
+            breaker.failure()
+            raise
+        except BaseException:
+            breaker.cancel()
+            raise
+        breaker.record(response.status_code)
+        if response.status_code not in SERVER_ERRORS or attempt == SERVER_RETRIES:
+            return response
+        try:
+            breaker.allow()
+        except CircuitOpenError:
+            return response
+        response.close()
+        delay = SERVER_RETRY_BACKOFF * 2 ** attempt
+        logger.warning(f'{response.status_code} от {endpoint}: повтор через {delay:.1f} с (попытка {attempt + 1} из {SERVER_RETRIES + 1})')
+        try:
+            time.sleep(delay)
+        except BaseException:
+            breaker.cancel()
+            raise
+    return response
+
+
+def _get_with_retries(endpoint: str, url: str, pool: 'TokenPool', max_retries: int, session: Optional[requests.Session],
+                      **kwargs) -> requests.Response:
+    for attempt in range(max_retries + 1):
+        token, limiter, waited = pool.acquire(endpoint)
+        kwargs['headers'] = dict(kwargs.get('headers') or {}, Authorization=f'Bearer {token.secret}')
+        if waited > 0:
+            time.sleep(waited)
+        WB_RATE_LIMIT_WAIT.labels(endpoint).observe(waited)
+        if waited:
+            logger.info(f'Запрос к {endpoint} ожидал {waited:.2f} с из-за лимита')
+        started = time.perf_counter()
+        try:
+            response = (session or requests).get(url, **kwargs)
+        except requests.RequestException:
+            WB_REQUESTS.labels(endpoint, 'error').inc()
+            pool.failure(token)
+            raise
+        finally:
+            WB_REQUEST_LATENCY.labels(endpoint).observe(time.perf_counter() - started)
+        WB_REQUESTS.labels(endpoint, response.status_code).inc()
+        pool.record(token, endpoint, response.status_code, response.headers)
+        if response.status_code in (401, 403) and attempt < max_retries and pool.available():
+            logger.warning(f'{response.status_code} от {endpoint} с токеном {token.name}: повтор с другим токеном')
+            response.close()
+            continue
+        if response.status_code != 429:
+            limiter.success()
+            return response
+        # Пауза ставится и после последней попытки, чтобы её учли следующие запросы
+        delay = limiter.backoff(parse_retry_after(response))
+        logger.warning(f'429 от {endpoint}: пауза {delay:.1f} с (попытка {attempt + 1} из {max_retries + 1})')
+        if attempt < max_retries:
+            # Потоковый ответ держит соединение пула, пока его не закрыть
+            response.close()
+    return response
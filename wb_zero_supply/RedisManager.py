@@ -1,23 +1,96 @@
+import os
 import json
+import time
 import redis
-import logging
+from functools import wraps
+from threading import Lock
+from wb_zero_supply.CoefficientRecord import parse_day
+from wb_zero_supply.Metrics import counter, histogram
 
-logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+
+DEFAULT_REDIS_URL = 'redis://localhost:6379'
+MAX_CONNECTIONS = 50
+HEALTH_CHECK_INTERVAL = 30  # секунд простоя, после которых соединение проверяется перед командой
+SOCKET_TIMEOUT = 5.0  # секунд
+
+REDIS_LATENCY = histogram('redis_command_duration_seconds', 'Время операций с Redis', ['operation'],
+                          buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0))
+REDIS_ERRORS = counter('redis_errors_total', 'Ошибки операций с Redis', ['operation'])
+
+_pools = {}
+_pools_lock = Lock()
+
+
+def get_connection_pool(db_number=1, password=None):
+    """
+    Общий для процесса пул соединений Redis для базы db_number.
+
+    Настройки берутся из окружения: REDIS_URL (rediss:// — TLS), REDIS_MAX_CONNECTIONS,
+    REDIS_HEALTH_CHECK_INTERVAL, REDIS_SOCKET_TIMEOUT, REDIS_SOCKET_CONNECT_TIMEOUT,
+    REDIS_SSL_CA_CERTS, REDIS_SSL_CERT_REQS. Пул не подключается к серверу до первой команды.
+    """
+    with _pools_lock:
+        pool = _pools.get((db_number, password))
+        if pool is None:
+            url = os.getenv('REDIS_URL', DEFAULT_REDIS_URL)
+            options = {
+                'db': db_number,
+                'decode_responses': True,
+                'max_connections': int(os.getenv('REDIS_MAX_CONNECTIONS', MAX_CONNECTIONS)),
+                'health_check_interval': int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', HEALTH_CHECK_INTERVAL)),
+                'socket_timeout': float(os.getenv('REDIS_SOCKET_TIMEOUT', SOCKET_TIMEOUT)),
+                'socket_connect_timeout': float(os.getenv('REDIS_SOCKET_CONNECT_TIMEOUT', SOCKET_TIMEOUT)),
+                'socket_keepalive': True,
+                'retry_on_timeout': True,
+            }
+            if password:
+                options['password'] = password
+            if url.startswith('rediss://'):
+                options['ssl_cert_reqs'] = os.getenv('REDIS_SSL_CERT_REQS', 'required')
+                if os.getenv('REDIS_SSL_CA_CERTS'):
+                    options['ssl_ca_certs'] = os.getenv('REDIS_SSL_CA_CERTS')
+            pool = _pools[(db_number, password)] = redis.ConnectionPool.from_url(url, **options)
+        return pool
+
+
+def timed(operation):
+    """Декоратор: время операции и ошибки Redis попадают в метрики."""
+    def decorator(func):
+        latency = REDIS_LATENCY.labels(operation)
+        errors = REDIS_ERRORS.labels(operation)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except redis.RedisError:
+                errors.inc()
+                raise
+            finally:
+                latency.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
 
 
 class RedisManager:
     def __init__(self, db_number=1, password=None):
-        """Инициализация подключения к Redis."""
-        self.redis_client = redis.Redis(
-            host='localhost',
-            port=6379,
-            db=db_number,
-            password=password,
-            decode_responses=True
-        )
-        if not self.check_connection():
-            logging.error("Не удалось подключиться к Redis.")
-            raise ConnectionError("Не удалось подключиться к Redis.")
+        """
+        Менеджер поверх общего пула соединений.
+
+        Подключение происходит при первой команде; пароль по умолчанию берётся из PASS_REDIS.
+        """
+        self.db_number = db_number
+        self.password = password
+        self._redis_client = None
+
+    @property
+    def redis_client(self):
+        """Клиент Redis на общем пуле (создаётся при первом обращении)."""
+        if self._redis_client is None:
+            password = self.password or os.getenv('PASS_REDIS')
+            self._redis_client = redis.Redis(connection_pool=get_connection_pool(self.db_number, password))
+        return self._redis_client
 
     def check_connection(self):
         """Проверяет, доступен ли Redis."""
@@ -26,99 +99,275 @@ class RedisManager:
         except redis.ConnectionError:
             return False
 
+    @timed('dbsize')
     def check_database_empty(self):
         """Проверяет, пуста ли база данных."""
         return self.redis_client.dbsize() == 0
 
 
+# Атомарная проверка и запись пачки локаций за один вызов.
+# KEYS — ключи локаций, ARGV[1] — TTL, далее пары (тип, коэффициент) для каждого ключа.
+# Возвращает номера (с 1) ключей, которых ещё не было.
+DEDUP_SCRIPT = """
+local ttl = tonumber(ARGV[1])
+local new = {}
+for i, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 0 then
+        table.insert(new, i)
+    end
+    redis.call('HSET', key, 'type', ARGV[2 * i], 'coefficient', ARGV[2 * i + 1])
+    redis.call('EXPIRE', key, ttl)
+end
+return new
+"""
+
+
 class RedisManagerData(RedisManager):
-    """
-        Сохраняет данные о коэффициентах приемки в Redis с установленным временем жизни.
+    """Хранит данные о коэффициентах приёмки в Redis с установленным временем жизни."""
 
-        :param data: Словарь, содержащий 'warehouse', 'date' и 'type'.
-        :param ttl: Время жизни в секундах.
-        :return: Кортеж (успех: bool, локация: str)
+    def __init__(self, db_number=1, password=None):
+        super().__init__(db_number=db_number, password=password)
+        self._dedup_script = None
+
+    @staticmethod
+    def location_key(location, user_id=None):
         """
-    def save_data(self, location, ttl):
-        """Сохраняет данные о коэффициентах приёмки в Redis с установленным временем жизни."""
-        warehouse = location.get('Склад')
-        date = location.get('Дата')
-        type_ = location.get('Тип')
-        coefficient = location.get('Коэффициент')
-
-        # Создание уникального ключа
-        key = f"warehouse:{warehouse}:{date}:{coefficient}"
+        Уникальный ключ локации (CoefficientRecord): склад, дата и коэффициент.
 
-        # Проверка, существует ли запись
-        if not self.redis_client.exists(key):
-            # Сохранение данных в хэш
-            self.redis_client.hset(key, mapping={'type': type_, 'coefficient': coefficient})
-            # Установка времени жизни для ключа
-            self.redis_client.expire(key, ttl)  # Устанавливаем TTL в секундах
-            message = f"Склад: {warehouse}, Дата: {date}, Тип: {type_}, Коэффициент {coefficient}"
-            return True, message
-        else:
-            return False, ""  # Данные уже существуют
+        :param user_id: Получатель уведомления: локация считается новой для каждого пользователя отдельно.
+        """
+        key = f"warehouse:{location.warehouse_name}:{location.date}:{location.coefficient}"
+        return key if user_id is None else f"user:{user_id}:{key}"
 
-    def update_data(self, location, ttl):
-        """Обновляет существующие данные о коэффициентах приёмки в Redis."""
-        warehouse = location.get('Склад')
-        date = location.get('Дата')
-        type_ = location.get('Тип')
-        coefficient = location.get('Коэффициент')
+    @timed('find_new_locations')
+    def find_new_locations(self, locations, ttl, user_id=None):
+        """
+        Записывает пачку локаций одним атомарным вызовом и возвращает только новые.
 
-        # Создание уникального ключа
-        key = f"warehouse:{warehouse}:{date}:{coefficient}"
+        Существующим записям продлевается время жизни. Повтор одной и той же
+        локации в пачке или параллельная обработка в другом процессе не дают
+        повторного «нового» результата.
 
-        # Проверка, существует ли запись
-        if self.redis_client.exists(key):
-            # Обновление данных в хэш
-            self.redis_client.hset(key, mapping={'type': type_, 'coefficient': coefficient})
-            # Обновление времени жизни для ключа
-            self.redis_client.expire(key, ttl)
-            message = f"Обновлено: Склад: {warehouse}, Дата: {date}, Тип: {type_}, Коэффициент {coefficient}"
-            return True, message
-        else:
-            return False, "Данные для обновления не найдены"
+        :param locations: Список записей CoefficientRecord.
+        :param ttl: Время жизни в секундах.
+        :param user_id: Пользователь, для которого отбираются новые локации (None — общий учёт).
+        :return: Список новых локаций в исходном порядке.
+        """
+        if not locations:
+            return []
+        keys = [self.location_key(location, user_id) for location in locations]
+        args = [ttl]
+        for location in locations:
+            args.extend((location.box_type_name, location.coefficient))
+        if self._dedup_script is None:
+            self._dedup_script = self.redis_client.register_script(DEDUP_SCRIPT)
+        new_positions = self._dedup_script(keys=keys, args=args)
+        return [locations[int(i) - 1] for i in new_positions]
 
-    def get_data(self, warehouse, date, coefficient):
+    @timed('get_data')
+    def get_data(self, warehouse, date, coefficient, user_id=None):
         """Получает данные о коэффициентах приёмки из Redis."""
         key = f"warehouse:{warehouse}:{date}:{coefficient}"
+        if user_id is not None:
+            key = f"user:{user_id}:{key}"
         data = self.redis_client.hgetall(key)
         if data:
             return {k: v for k, v in data.items()}
         else:
             return None
 
-    def process_locations(self, locations, ttl):
-        """Обрабатывает список локаций и сохраняет или обновляет данные с установленным временем жизни."""
-        messages = []
-        for location in locations:
-            save_result, save_message = self.save_data(location, ttl)
-            if not save_result:
-                update_result, update_message = self.update_data(location, ttl)
-                if update_result:
-                    messages.append(update_message)
-            else:
-                messages.append(save_message)
-        return messages
+    def process_locations(self, locations, ttl, user_id=None):
+        """
+        Сохраняет список локаций с установленным временем жизни и возвращает сообщения о новых.
+
+        :param user_id: Получатель сообщений: каждый пользователь получает локацию один раз,
+                        независимо от того, видели ли её другие подписчики склада.
+        """
+        return [
+            f"Склад: {location.warehouse_name}, Дата: {location.date}, Тип: {location.box_type_name}, Коэффициент {location.coefficient}"
+            for location in self.find_new_locations(locations, ttl, user_id)
+        ]
 
 
 class RedisManagerUser(RedisManager):
+    @timed('set_user_data')
     def set_user_data(self, user_id, data):
         """Сохраняет данные пользователя в Redis."""
         serialized_data = {key: json.dumps(value) for key, value in data.items()}
         self.redis_client.hmset(f"user:{user_id}", serialized_data)
 
+    @timed('get_user_data')
     def get_user_data(self, user_id):
         """Получает данные пользователя из Redis."""
         data = self.redis_client.hgetall(f"user:{user_id}")
         return {key: json.loads(value) for key, value in data.items()}
 
+    @timed('delete_user_data')
     def delete_user_data(self, user_id):
         """Удаляет данные пользователя из Redis."""
         self.redis_client.delete(f"user:{user_id}")
 
 
+# Общая для всех процессов квота токена API WB (GCRA): каждый вызов резервирует запрос.
+# KEYS[1] — ключ квоты, ARGV[1] — интервал между запросами, ARGV[2] — окно квоты (секунд).
+# Возвращает, сколько секунд ждать перед запросом. Время берётся у Redis, чтобы часы машин не расходились.
+QUOTA_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local interval = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or '0')
+if tat < now then
+    tat = now
+end
+tat = tat + interval
+redis.call('SET', KEYS[1], tostring(tat), 'PX', math.ceil((tat - now) * 1000) + 1000)
+return tostring(math.max(0, tat - window - now))
+"""
+
+
+class RedisManagerQuota(RedisManager):
+    """
+    Квоты токенов API WB, общие для всех процессов (воркеров опроса и бота).
+
+    Квоты WB действуют на токен, а не на процесс: без общего учёта N воркеров
+    с одним токеном отправляли бы в N раз больше запросов и получали 429.
+    Ключ квоты — quota:<эндпоинт>:<отпечаток токена>, сам токен в Redis не попадает.
+    """
+
+    def __init__(self, db_number=1, password=None):
+        super().__init__(db_number=db_number, password=password)
+        self._script = None
+
+    @timed('reserve_quota')
+    def reserve(self, token_id, endpoint, rate, per):
+        """
+        Резервирует запрос в квоте токена и возвращает, сколько секунд ждать перед ним.
+
+        :param token_id: Отпечаток токена.
+        :param rate: Число запросов, разрешённых за период.
+        :param per: Длительность периода в секундах.
+        """
+        if self._script is None:
+            self._script = self.redis_client.register_script(QUOTA_SCRIPT)
+        return float(self._script(keys=[f"quota:{endpoint}:{token_id}"], args=[per / rate, per]))
+
+
+SUBSCRIPTIONS_KEY = 'subscriptions'  # множество ID пользователей с сохранённой подпиской
+SLOTS_TTL = 7 * 24 * 3600  # секунд: снимок склада, который давно не менялся и не опрашивается, удаляется
+LOAD_CHUNK = 1000  # ключей на один конвейер при загрузке
+
+
+class RedisManagerSubscriptions(RedisManager):
+    """
+    Подписки бота и последний снимок слотов по складам для восстановления после перезапуска.
+
+    Подписки пользователя хранятся в хэше subscription:<user_id>: поле — номер
+    подписки, значение — её параметры в JSON. Снимок склада — в хэше
+    slots:<warehouse_id> с полями «тип поставки|дата» и коэффициентом. Запись идёт
+    при каждом изменении, загрузка — конвейерами по LOAD_CHUNK ключей.
+    """
+
+    @staticmethod
+    def subscription_key(user_id):
+        return f"subscription:{user_id}"
+
+    @staticmethod
+    def slots_key(warehouse_id):
+        return f"slots:{warehouse_id}"
+
+    @timed('save_subscription')
+    def save_subscription(self, user_id, number, data):
+        """Сохраняет (или заменяет) подписку пользователя с номером number."""
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.hset(self.subscription_key(user_id), str(number), json.dumps(data))
+        pipe.sadd(SUBSCRIPTIONS_KEY, user_id)
+        pipe.execute()
+
+    @timed('delete_subscription')
+    def delete_subscription(self, user_id, number=None):
+        """Удаляет подписку пользователя с номером number (None — все подписки пользователя)."""
+        key = self.subscription_key(user_id)
+        if number is not None:
+            pipe = self.redis_client.pipeline(transaction=True)
+            pipe.hdel(key, str(number))
+            pipe.hlen(key)
+            if pipe.execute()[1]:
+                return
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.delete(key)
+        pipe.srem(SUBSCRIPTIONS_KEY, user_id)
+        pipe.execute()
+
+    @staticmethod
+    def _decode_subscriptions(data):
+        return {int(number): json.loads(value) for number, value in data.items()}
+
+    @timed('load_subscriptions')
+    def load_subscriptions(self):
+        """Все сохранённые подписки: {user_id: {номер подписки: параметры}}."""
+        user_ids = sorted(int(user_id) for user_id in self.redis_client.smembers(SUBSCRIPTIONS_KEY))
+        subscriptions = {}
+        for i in range(0, len(user_ids), LOAD_CHUNK):
+            chunk = user_ids[i:i + LOAD_CHUNK]
+            pipe = self.redis_client.pipeline(transaction=False)
+            for user_id in chunk:
+                pipe.hgetall(self.subscription_key(user_id))
+            for user_id, data in zip(chunk, pipe.execute()):
+                if data:
+                    subscriptions[user_id] = self._decode_subscriptions(data)
+        return subscriptions
+
+    @timed('save_slots')
+    def save_slots(self, changes):
+        """
+        Записывает изменения слотов (SlotChange) в снимки складов одним конвейером.
+
+        Пропавшие слоты удаляются, новые и изменившиеся — перезаписываются.
+        """
+        updates, removals = {}, {}
+        for change in changes:
+            field = f'{change.box_type_name}|{change.date}'
+            if change.new is None:
+                removals.setdefault(change.warehouse_id, []).append(field)
+            else:
+                updates.setdefault(change.warehouse_id, {})[field] = change.new
+        if not updates and not removals:
+            return
+        pipe = self.redis_client.pipeline(transaction=False)
+        for warehouse_id, fields in removals.items():
+            pipe.hdel(self.slots_key(warehouse_id), *fields)
+        for warehouse_id, mapping in updates.items():
+            pipe.hset(self.slots_key(warehouse_id), mapping=mapping)
+        for warehouse_id in set(updates) | set(removals):
+            pipe.expire(self.slots_key(warehouse_id), SLOTS_TTL)
+        pipe.execute()
+
+    @timed('delete_slots')
+    def delete_slots(self, warehouse_ids):
+        """Удаляет снимки складов, которые больше не опрашиваются."""
+        keys = [self.slots_key(warehouse_id) for warehouse_id in warehouse_ids]
+        if keys:
+            self.redis_client.delete(*keys)
+
+    @timed('load_slots')
+    def load_slots(self, warehouse_ids):
+        """Снимки складов: {warehouse_id: {(тип поставки, номер дня): коэффициент}}; склады без снимка пропускаются."""
+        warehouse_ids = sorted(set(warehouse_ids))
+        snapshots = {}
+        for i in range(0, len(warehouse_ids), LOAD_CHUNK):
+            chunk = warehouse_ids[i:i + LOAD_CHUNK]
+            pipe = self.redis_client.pipeline(transaction=False)
+            for warehouse_id in chunk:
+                pipe.hgetall(self.slots_key(warehouse_id))
+            for warehouse_id, data in zip(chunk, pipe.execute()):
+                if data:
+                    snapshot = snapshots[warehouse_id] = {}
+                    for field, value in data.items():
+                        box_type_name, date = field.split('|', 1)
+                        snapshot[(box_type_name, parse_day(date))] = int(value)
+        return snapshots
+
+
 if __name__ == '__main__':
     pass
@@ -0,0 +1,226 @@
+import time
+import heapq
+import random
+import logging
+from threading import Condition, Thread
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+from wb_zero_supply.Metrics import JOB_LAG, counter
+
+
+logger = logging.getLogger(__name__)
+
+JITTER = 0.1  # доля интервала, на которую случайно сдвигается каждый следующий запуск
+COALESCE = 2.0  # секунд: единицы, до срока которых осталось меньше, забираются в текущую пачку
+DEFAULT_PRIORITY = 0
+
+DROPPED_TICKS = counter('scheduler_dropped_ticks_total', 'Пропущенные из-за перегрузки запуски (склеены с текущим)')
+
+
+class _Entry:
+    __slots__ = ('due', 'priority', 'interval', 'seq')
+
+    def __init__(self, due: float, priority: int, interval: float, seq: int):
+        self.due = due
+        self.priority = priority
+        self.interval = interval
+        self.seq = seq
+
+
+class Scheduler:
+    """
+    Единый планировщик периодической работы на куче сроков.
+
+    Единица работы (например, склад) задаётся ключом и имеет свой интервал.
+    Когда подходит срок ближайшей единицы, поток планировщика забирает все
+    просроченные единицы и те, до срока которых осталось несколько секунд,
+    упорядочивает их по приоритету (меньше — раньше) и передаёт в dispatch
+    пачками до batch_size ключей. Неполная пачка дополняется единицами,
+    срок которых наступит в пределах их интервала: пачка — это один запрос
+    к API, и единицы, опрошенные чуть раньше срока, не тратят отдельных
+    запросов. Следующий срок сдвигается на случайную долю интервала, одну
+    на всю пачку, поэтому пачка остаётся одним запросом, а разные пачки не
+    идут в ногу. Если обработка не успевает, пропущенные запуски не
+    накапливаются: единица выполняется один раз, а пропуски учитываются
+    в статистике.
+    """
+
+    def __init__(self, dispatch: Callable[[List[Hashable]], None], interval: float, batch_size: int = 100,
+                 jitter: float = JITTER, coalesce: float = COALESCE, name: str = 'scheduler'):
+        """
+        :param dispatch: Обработчик пачки ключей, вызывается в потоке планировщика.
+        :param interval: Интервал по умолчанию между запусками единицы, секунд.
+        :param batch_size: Максимум ключей в одной пачке.
+        :param jitter: Случайный сдвиг срока в долях интервала.
+        :param coalesce: Насколько заранее (в секундах, не больше jitter от интервала) единица может попасть в текущую пачку.
+        :param name: Имя потока и метка в метриках.
+        """
+        self.dispatch = dispatch
+        self.interval = interval
+        self.batch_size = batch_size
+        self.jitter = jitter
+        self.coalesce = coalesce
+        self.name = name
+        self._random = random.Random()
+
+        self._cond = Condition()
+        self._heap: List[Tuple[float, int, Hashable]] = []  # (срок, порядок, ключ); устаревшие записи пропускаются
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._seq = 0
+        self._thread: Optional[Thread] = None
+        self._running = False
+
+        self.runs = 0
+        self.dispatched = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def _push(self, key: Hashable, entry: _Entry) -> None:
+        self._seq += 1
+        entry.seq = self._seq
+        heapq.heappush(self._heap, (entry.due, entry.seq, key))
+
+    def add(self, key: Hashable, priority: int = DEFAULT_PRIORITY, interval: Optional[float] = None,
+            delay: Optional[float] = None) -> None:
+        """
+        Добавляет единицу работы. Первый запуск — в пределах доли jitter от интервала.
+
+        Повторное добавление существующего ключа меняет только приоритет и интервал.
+
+        :param delay: Через сколько секунд первый запуск (например, чтобы разнести восстановленные единицы).
+        """
+        interval = interval or self.interval
+        if delay is None:
+            delay = self._random.uniform(0, self.jitter * interval)
+        with self._cond:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.priority = priority
+                entry.interval = interval
+                return
+            entry = self._entries[key] = _Entry(time.monotonic() + delay, priority, interval, 0)
+            self._push(key, entry)
+            self._cond.notify()
+
+    def remove(self, key: Hashable) -> bool:
+        """Удаляет единицу работы; запись в куче становится недействительной. Возвращает, была ли она."""
+        with self._cond:
+            return self._entries.pop(key, None) is not None
+
+    def set_priority(self, key: Hashable, priority: int) -> None:
+        """Меняет приоритет единицы (меньше — раньше при выборе из просроченных)."""
+        with self._cond:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.priority = priority
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._cond:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._entries)
+
+    def start(self) -> None:
+        """Запускает поток планировщика."""
+        self._running = True
+        self._thread = Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5) -> None:
+        """Останавливает поток планировщика (текущая пачка дорабатывает)."""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        """Статистика планировщика."""
+        with self._cond:
+            return {'units': len(self._entries), 'runs': self.runs, 'dispatched': self.dispatched,
+                    'dropped': self.dropped, 'errors': self.errors}
+
+    def _next_batch(self) -> Optional[Tuple[List[Hashable], float]]:
+        """Ждёт срока и выбирает пачку ключей. Возвращает (ключи, отставание) или None при остановке."""
+        with self._cond:
+            while self._running:
+                # Пропускаем записи удалённых и перепланированных единиц
+                while self._heap:
+                    due, seq, key = self._heap[0]
+                    entry = self._entries.get(key)
+                    if entry is not None and entry.seq == seq:
+                        break
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                now = time.monotonic()
+                if self._heap[0][0] > now:
+                    self._cond.wait(self._heap[0][0] - now)
+                    continue
+                return self._collect(now)
+            return None
+
+    def _collect(self, now: float) -> Tuple[List[Hashable], float]:
+        """Забирает просроченные и почти наступившие единицы (вызывается под блокировкой)."""
+        candidates: List[Tuple[int, float, Hashable, _Entry]] = []
+        while self._heap:
+            due, seq, key = self._heap[0]
+            entry = self._entries.get(key)
+            if entry is None or entry.seq != seq:
+                heapq.heappop(self._heap)
+                continue
+            if due > now + min(self.coalesce, self.jitter * entry.interval):
+                break
+            heapq.heappop(self._heap)
+            candidates.append((entry.priority, due, key, entry))
+
+        candidates.sort(key=lambda candidate: (candidate[0], candidate[1]))
+        chosen, rest = candidates[:self.batch_size], candidates[self.batch_size:]
+        for _, due, key, entry in rest:
+            # Не вошедшие в пачку остаются с прежним сроком и будут выбраны следующими
+            self._push(key, entry)
+        if not rest:
+            self._fill(chosen, now)
+
+        lag = max(0.0, now - min(due for _, due, _, _ in chosen))
+        # Один сдвиг на пачку: её единицы и дальше уходят одним запросом
+        shift = 1 + self._random.uniform(-self.jitter, self.jitter)
+        for _, due, key, entry in chosen:
+            missed = int((now - due) // entry.interval)
+            if missed > 0:
+                self.dropped += missed
+                DROPPED_TICKS.inc(missed)
+            entry.due = now + entry.interval * shift
+            self._push(key, entry)
+        self.runs += 1
+        self.dispatched += len(chosen)
+        return [key for _, _, key, _ in chosen], lag
+
+    def _fill(self, chosen: List[Tuple[int, float, Hashable, _Entry]], now: float) -> None:
+        """Дополняет неполную пачку ближайшими единицами, срок которых наступит в пределах их интервала."""
+        while self._heap and len(chosen) < self.batch_size:
+            due, seq, key = self._heap[0]
+            entry = self._entries.get(key)
+            if entry is None or entry.seq != seq:
+                heapq.heappop(self._heap)
+                continue
+            if due > now + entry.interval:
+                break
+            heapq.heappop(self._heap)
+            chosen.append((entry.priority, due, key, entry))
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            keys, lag = batch
+            JOB_LAG.labels(self.name).observe(lag)
+            try:
+                self.dispatch(keys)
+            except Exception as e:
+                with self._cond:
+                    self.errors += 1
+                logger.error(f'Ошибка при обработке пачки планировщика {self.name}: {e!r}')
@@ -0,0 +1,153 @@
+import sys
+from hashlib import blake2b
+from threading import Lock
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from wb_zero_supply.CoefficientRecord import CoefficientRecord, format_day
+
+
+SlotKey = Tuple[int, str, int]  # (ID склада, тип поставки, номер дня)
+
+
+class SlotChange(NamedTuple):
+    key: SlotKey
+    old: Optional[int]  # прежний коэффициент (None — слота не было)
+    new: Optional[int]  # новый коэффициент (None — слот пропал)
+
+    @property
+    def warehouse_id(self) -> int:
+        return self.key[0]
+
+    @property
+    def box_type_name(self) -> str:
+        return self.key[1]
+
+    @property
+    def day(self) -> int:
+        return self.key[2]
+
+    @property
+    def date(self) -> str:
+        """Дата слота в виде '2024-10-01'."""
+        return format_day(self.key[2])
+
+
+class Diff(NamedTuple):
+    added: List[SlotChange]
+    removed: List[SlotChange]
+    changed: List[SlotChange]
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    def all(self) -> List[SlotChange]:
+        return self.added + self.removed + self.changed
+
+
+EMPTY_DIFF = Diff([], [], [])
+
+
+class SnapshotDiff:
+    """
+    Сравнение ответов API коэффициентов с предыдущим снимком.
+
+    Снимок хранится по складам в виде {(тип поставки, номер дня): коэффициент}
+    с интернированными строками. Для каждого склада запоминается хэш последнего
+    ответа, в который он входил (вместе с составом запроса): если ответ на тот
+    же набор складов совпадает байт в байт, разбор и сравнение пропускаются
+    целиком. Хэши хранятся по складам, поэтому их не больше, чем складов в
+    опросе, а смена состава пакета не даёт ложного совпадения.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._snapshots: Dict[int, Dict[Tuple[str, int], int]] = {}
+        self._digests: Dict[int, bytes] = {}
+
+    @staticmethod
+    def digest(warehouse_ids: Sequence[int], body: bytes) -> bytes:
+        """Хэш тела ответа вместе с составом запроса."""
+        h = blake2b(','.join(map(str, warehouse_ids)).encode(), digest_size=16)
+        h.update(b'\n')
+        h.update(body)
+        return h.digest()
+
+    def _unchanged(self, warehouse_ids: Sequence[int], digest: bytes) -> bool:
+        return bool(warehouse_ids) and all(self._digests.get(wid) == digest for wid in warehouse_ids)
+
+    def is_unchanged(self, warehouse_ids: Iterable[int], body: bytes) -> bool:
+        """Совпадает ли тело ответа для набора складов с предыдущим ответом на тот же набор."""
+        warehouse_ids = tuple(warehouse_ids)
+        digest = self.digest(warehouse_ids, body)
+        with self._lock:
+            return self._unchanged(warehouse_ids, digest)
+
+    def update(self, warehouse_ids: Iterable[int], records: Iterable[CoefficientRecord], body: Optional[bytes] = None) -> Diff:
+        """
+        Применяет новый ответ API к снимку и возвращает изменения.
+
+        :param warehouse_ids: Склады, запрошенные в этом ответе (пропавшие из ответа слоты считаются удалёнными).
+        :param records: Записи ответа API.
+        :param body: Тело ответа для быстрой проверки на полное совпадение.
+        """
+        warehouse_ids = tuple(warehouse_ids)
+        digest = self.digest(warehouse_ids, body) if body is not None else None
+
+        fresh: Dict[int, Dict[Tuple[str, int], int]] = {wid: {} for wid in warehouse_ids}
+        for record in records:
+            slots = fresh.get(record.warehouse_id)
+            if slots is not None:
+                slots[(record.box_type_name, record.day)] = record.coefficient
+
+        added: List[SlotChange] = []
+        removed: List[SlotChange] = []
+        changed: List[SlotChange] = []
+        with self._lock:
+            if digest is not None:
+                if self._unchanged(warehouse_ids, digest):
+                    return EMPTY_DIFF
+                for warehouse_id in warehouse_ids:
+                    self._digests[warehouse_id] = digest
+            else:
+                for warehouse_id in warehouse_ids:
+                    self._digests.pop(warehouse_id, None)
+
+            for warehouse_id, slots in fresh.items():
+                previous = self._snapshots.get(warehouse_id, {})
+                for slot, coefficient in slots.items():
+                    old = previous.get(slot)
+                    if old is None:
+                        added.append(SlotChange((warehouse_id,) + slot, None, coefficient))
+                    elif old != coefficient:
+                        changed.append(SlotChange((warehouse_id,) + slot, old, coefficient))
+                for slot, old in previous.items():
+                    if slot not in slots:
+                        removed.append(SlotChange((warehouse_id,) + slot, old, None))
+                self._snapshots[warehouse_id] = slots
+        return Diff(added, removed, changed)
+
+    def snapshot(self, warehouse_id: int) -> List[SlotChange]:
+        """Текущие слоты склада в виде добавлений (для новых подписчиков)."""
+        with self._lock:
+            slots = self._snapshots.get(warehouse_id, {})
+            return [SlotChange((warehouse_id,) + slot, None, coefficient) for slot, coefficient in slots.items()]
+
+    def restore(self, snapshots: Dict[int, Dict[Tuple[str, int], int]]) -> None:
+        """Подставляет сохранённые снимки складов (после перезапуска), чтобы первый ответ сравнивался с ними."""
+        with self._lock:
+            for warehouse_id, slots in snapshots.items():
+                self._digests.pop(warehouse_id, None)
+                self._snapshots[warehouse_id] = {
+                    (sys.intern(box_type_name), day): coefficient
+                    for (box_type_name, day), coefficient in slots.items()
+                }
+
+    def has_snapshot(self, warehouse_id: int) -> bool:
+        with self._lock:
+            return warehouse_id in self._snapshots
+
+    def forget(self, warehouse_ids: Iterable[int]) -> None:
+        """Удаляет снимки складов, на которые больше никто не подписан."""
+        with self._lock:
+            for warehouse_id in warehouse_ids:
+                self._snapshots.pop(warehouse_id, None)
+                self._digests.pop(warehouse_id, None)
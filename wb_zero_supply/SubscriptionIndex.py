@@ -0,0 +1,138 @@
+from bisect import bisect_left, bisect_right
+from threading import Lock
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+
+SubscriptionKey = Tuple[int, int]  # (ID пользователя, номер подписки у пользователя)
+SlotKind = Tuple[int, str]  # (ID склада, тип поставки)
+
+
+class Subscription(NamedTuple):
+    user_id: int
+    number: int  # номер подписки у пользователя, его видно в /list и передают в /remove
+    warehouse_id: int
+    warehouse_name: str
+    box_type_name: str
+    max_coefficient: int
+
+    @property
+    def key(self) -> SubscriptionKey:
+        return self.user_id, self.number
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Параметры подписки для хранения в Redis."""
+        return {
+            'warehouse_id': self.warehouse_id,
+            'warehouse_name': self.warehouse_name,
+            'max_coefficient': self.max_coefficient,
+            'box_type_name': self.box_type_name,
+        }
+
+
+class SubscriptionIndex:
+    """
+    Подписки пользователей с обратным индексом (склад, тип поставки) → подписки.
+
+    Подписки одного ключа индекса хранятся отсортированными по max_coefficient,
+    поэтому всем, кому подходит слот с коэффициентом c, соответствует хвост списка
+    начиная с bisect_left(c): на строку ответа API — один бинарный поиск вместо
+    перебора пользователей. У пользователя может быть несколько подписок, но не
+    больше одной на пару (склад, тип поставки).
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._by_user: Dict[int, Dict[int, Subscription]] = {}
+        self._thresholds: Dict[SlotKind, List[int]] = {}  # отсортированные max_coefficient
+        self._entries: Dict[SlotKind, List[Subscription]] = {}  # подписки в том же порядке
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._by_user.values())
+
+    def users(self) -> int:
+        """Число пользователей хотя бы с одной подпиской."""
+        with self._lock:
+            return len(self._by_user)
+
+    def add(self, user_id: int, warehouse_id: int, warehouse_name: str, box_type_name: str, max_coefficient: int,
+            number: Optional[int] = None) -> Subscription:
+        """
+        Добавляет подписку. Если у пользователя уже есть подписка на тот же склад и тип
+        поставки, она заменяется с сохранением номера.
+
+        :param number: Номер подписки (при восстановлении); по умолчанию — следующий свободный.
+        """
+        with self._lock:
+            subscriptions = self._by_user.setdefault(user_id, {})
+            for existing in subscriptions.values():
+                if existing.warehouse_id == warehouse_id and existing.box_type_name == box_type_name:
+                    self._unindex(existing)
+                    number = existing.number
+                    break
+            if number is None:
+                number = max(subscriptions, default=0) + 1
+            subscription = Subscription(user_id, number, warehouse_id, warehouse_name, box_type_name, max_coefficient)
+            subscriptions[number] = subscription
+
+            kind = (warehouse_id, box_type_name)
+            thresholds = self._thresholds.setdefault(kind, [])
+            position = bisect_right(thresholds, max_coefficient)
+            thresholds.insert(position, max_coefficient)
+            self._entries.setdefault(kind, []).insert(position, subscription)
+            return subscription
+
+    def remove(self, user_id: int, number: int) -> Optional[Subscription]:
+        """Удаляет подписку пользователя по номеру и возвращает её."""
+        with self._lock:
+            subscriptions = self._by_user.get(user_id, {})
+            subscription = subscriptions.pop(number, None)
+            if subscription is not None:
+                self._unindex(subscription)
+                if not subscriptions:
+                    del self._by_user[user_id]
+            return subscription
+
+    def remove_user(self, user_id: int) -> List[Subscription]:
+        """Удаляет все подписки пользователя и возвращает их."""
+        with self._lock:
+            subscriptions = list(self._by_user.pop(user_id, {}).values())
+            for subscription in subscriptions:
+                self._unindex(subscription)
+            return subscriptions
+
+    def _unindex(self, subscription: Subscription) -> None:
+        kind = (subscription.warehouse_id, subscription.box_type_name)
+        thresholds, entries = self._thresholds[kind], self._entries[kind]
+        start = bisect_left(thresholds, subscription.max_coefficient)
+        end = bisect_right(thresholds, subscription.max_coefficient)
+        for position in range(start, end):
+            if entries[position].key == subscription.key:
+                del thresholds[position], entries[position]
+                break
+        if not entries:
+            del self._thresholds[kind], self._entries[kind]
+
+    def get(self, key: SubscriptionKey) -> Optional[Subscription]:
+        with self._lock:
+            return self._by_user.get(key[0], {}).get(key[1])
+
+    def for_user(self, user_id: int) -> List[Subscription]:
+        """Подписки пользователя по возрастанию номера."""
+        with self._lock:
+            return sorted(self._by_user.get(user_id, {}).values(), key=lambda subscription: subscription.number)
+
+    def match(self, warehouse_id: int, box_type_name: str, coefficient: int) -> List[Subscription]:
+        """Подписки, которым подходит слот: тот же склад и тип поставки, коэффициент не выше порога."""
+        kind = (warehouse_id, box_type_name)
+        with self._lock:
+            thresholds = self._thresholds.get(kind)
+            if not thresholds:
+                return []
+            return self._entries[kind][bisect_left(thresholds, coefficient):]
+
+    def max_coefficient(self, warehouse_id: int, box_type_name: str) -> Optional[int]:
+        """Наибольший порог среди подписок на склад и тип поставки (None — подписок нет)."""
+        with self._lock:
+            thresholds = self._thresholds.get((warehouse_id, box_type_name))
+            return thresholds[-1] if thresholds else None
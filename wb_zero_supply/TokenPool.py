@@ -0,0 +1,300 @@
+import time
+import logging
+from hashlib import blake2b
+from threading import Lock
+from typing import Any, Callable, Dict, List, Mapping, Optional, Protocol, Sequence, Tuple
+from wb_zero_supply.Metrics import counter, gauge, register_stats
+from wb_zero_supply.RateLimiter import TokenBucket, load_limits
+
+
+logger = logging.getLogger(__name__)
+
+QUARANTINE_TIMEOUT = 3600.0  # секунд: токен с ответом 401/403 не используется, пока есть другие
+MAX_QUARANTINE_TIMEOUT = 86400.0  # секунд: после каждого повторного 401/403 карантин удваивается до этой границы
+ERROR_RATE_WEIGHT = 0.1  # вес последнего ответа в скользящей доле ошибок токена
+
+TOKEN_REQUESTS = counter('wb_token_requests_total', 'Запросы к API WB по токенам и кодам ответа (error — без ответа)', ['token', 'status'])
+TOKEN_QUARANTINED = gauge('wb_token_quarantined', 'Токен API WB в карантине после ответа 401/403: 1 — да, 0 — нет', ['token'])
+TOKEN_ERROR_RATE = gauge('wb_token_error_rate', 'Скользящая доля ошибок (нет ответа, 429, 5xx) по токену API WB', ['token'])
+
+# Обработчик карантина: (имя токена, в карантине ли он теперь, код ответа или None при снятии)
+QuarantineListener = Callable[[str, bool, Optional[int]], None]
+
+
+class SharedQuota(Protocol):
+    """Квота токенов, общая для нескольких процессов (например, RedisManagerQuota)."""
+
+    def reserve(self, token_id: str, endpoint: str, rate: int, per: float) -> float:
+        """Резервирует запрос и возвращает, сколько секунд ждать перед ним."""
+
+
+def parse_tokens(value: Optional[str]) -> List[str]:
+    """Токены из строки вида 'токен1,токен2' (пробелы и повторы отбрасываются)."""
+    tokens: List[str] = []
+    for token in (value or '').split(','):
+        token = token.strip()
+        if token and token not in tokens:
+            tokens.append(token)
+    return tokens
+
+
+class ApiToken:
+    """Токен API WB: свои квоты по эндпоинтам, доля ошибок и карантин."""
+
+    def __init__(self, secret: str, name: str, limits: Mapping[str, Tuple[int, float]]):
+        """
+        :param secret: Сам токен (в логи и метрики не попадает).
+        :param name: Имя токена для логов и метрик: номер и последние символы.
+        :param limits: Квоты эндпоинтов: {эндпоинт: (запросов, за секунд)}.
+        """
+        self.secret = secret
+        self.name = name
+        self.fingerprint = blake2b(secret.encode(), digest_size=8).hexdigest()  # ключ общей квоты
+        self.limits = limits
+        self.limiters: Dict[str, TokenBucket] = {}
+        self.remaining: Dict[str, int] = {}  # остаток квоты по заголовку X-Ratelimit-Remaining
+        self.error_rate = 0.0
+        self.quarantined_until = 0.0  # time.monotonic(); 0 — токен исправен
+        self.quarantine_timeout = QUARANTINE_TIMEOUT
+        self.quarantine_reason: Optional[int] = None
+
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.quarantined = 0
+
+    def quota(self, endpoint: str) -> Tuple[int, float]:
+        """Квота эндпоинта: (запросов, за секунд)."""
+        return self.limits.get(endpoint, (60, 60))
+
+    def limiter(self, endpoint: str) -> TokenBucket:
+        """Ограничитель эндпоинта для этого токена (вызывается под блокировкой пула)."""
+        limiter = self.limiters.get(endpoint)
+        if limiter is None:
+            rate, per = self.quota(endpoint)
+            limiter = self.limiters[endpoint] = TokenBucket(rate, per, name=f'{endpoint}:{self.name}')
+        return limiter
+
+    def in_quarantine(self, now: float) -> bool:
+        return now < self.quarantined_until
+
+
+class TokenPool:
+    """
+    Пул токенов API WB.
+
+    Квоты WB считаются по токену, поэтому у каждого токена свои ограничители
+    эндпоинтов, и пропускная способность опроса растёт с числом токенов.
+    Запрос уходит с токена, у которого есть свободная квота и меньше доля
+    ошибок; если квота исчерпана у всех — с токена, который освободится раньше.
+    Токен, получивший 401 или 403, попадает в карантин и не используется, пока
+    есть исправные; после карантина он снова участвует в выборе, а повторный
+    отказ удваивает карантин. Если исправных токенов нет, запрос уходит с
+    токена, карантин которого кончается раньше всех, чтобы ошибка дошла до
+    вызывающего кода как обычный ответ API.
+
+    Ограничители пула действуют в пределах процесса. Если токены делят
+    несколько процессов (воркеры опроса), квота дополнительно резервируется
+    в общем хранилище (см. use_shared_quota), и запрос ждёт дольшую из пауз.
+    """
+
+    def __init__(self, secrets: Sequence[str], quarantine_timeout: float = QUARANTINE_TIMEOUT,
+                 max_quarantine_timeout: float = MAX_QUARANTINE_TIMEOUT):
+        """
+        :param secrets: Токены API WB.
+        :param quarantine_timeout: Карантин токена после первого ответа 401/403, секунд.
+        :param max_quarantine_timeout: Верхняя граница карантина после повторных отказов.
+        """
+        if not secrets:
+            raise ValueError('Пул токенов API WB пуст')
+        limits = load_limits()
+        self.tokens = [ApiToken(secret, f'{i + 1}…{secret[-4:]}', limits) for i, secret in enumerate(secrets)]
+        self.quarantine_timeout = quarantine_timeout
+        self.max_quarantine_timeout = max(quarantine_timeout, max_quarantine_timeout)
+        self._lock = Lock()
+        for token in self.tokens:
+            token.quarantine_timeout = quarantine_timeout
+            TOKEN_QUARANTINED.labels(token.name).set(0)
+            TOKEN_ERROR_RATE.labels(token.name).set(0)
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def available(self) -> int:
+        """Число токенов не в карантине."""
+        now = time.monotonic()
+        with self._lock:
+            return sum(not token.in_quarantine(now) for token in self.tokens)
+
+    def acquire(self, endpoint: str) -> Tuple[ApiToken, TokenBucket, float]:
+        """
+        Выбирает токен для запроса и резервирует его квоту.
+
+        :return: (токен, его ограничитель эндпоинта, сколько секунд ждать перед запросом).
+        """
+        now = time.monotonic()
+        with self._lock:
+            candidates = [token for token in self.tokens if not token.in_quarantine(now)]
+            if not candidates:
+                candidates = [min(self.tokens, key=lambda token: token.quarantined_until)]
+            best = None
+            for token in candidates:
+                limiter = token.limiter(endpoint)
+                delay = limiter.wait_time()
+                # Сначала токены со свободной квотой (по доле ошибок и запасу), затем — кто освободится раньше
+                key = (delay, token.error_rate, -limiter.available())
+                if best is None or key < best[0]:
+                    best = (key, token, limiter)
+            _, token, limiter = best
+            delay = limiter.reserve()
+        shared = _shared_quota
+        if shared is not None:
+            rate, per = token.quota(endpoint)
+            try:
+                delay = max(delay, shared.reserve(token.fingerprint, endpoint, rate, per))
+            except Exception as e:
+                # Без общего хранилища остаётся квота процесса: опрос не останавливается
+                logger.warning(f'Общая квота токена {token.name} недоступна: {e!r}')
+        return token, limiter, delay
+
+    def record(self, token: ApiToken, endpoint: str, status: int, headers: Optional[Mapping[str, str]] = None) -> None:
+        """
+        Учитывает ответ API на запрос с токена.
+
+        :param headers: Заголовки ответа: остаток квоты берётся из X-Ratelimit-Remaining и X-Ratelimit-Reset.
+        """
+        quarantined = released = False
+        with self._lock:
+            token.requests += 1
+            if status in (401, 403):
+                quarantined = self._quarantine(token, status)
+            elif status < 400 and token.quarantine_reason is not None:
+                released = True
+                token.quarantined_until = 0.0
+                token.quarantine_reason = None
+                token.quarantine_timeout = self.quarantine_timeout
+                logger.info(f'Токен API WB {token.name} снова принят API, карантин снят')
+            self._count(token, status == 429 or status >= 500)
+            if status == 429:
+                token.rate_limited += 1
+            self._update_remaining(token, endpoint, headers or {})
+        TOKEN_REQUESTS.labels(token.name, status).inc()
+        if quarantined or released:
+            TOKEN_QUARANTINED.labels(token.name).set(int(quarantined))
+            # Обработчики вызываются вне блокировки, чтобы они могли обращаться к пулу
+            for listener in list(_listeners):
+                try:
+                    listener(token.name, quarantined, status if quarantined else None)
+                except Exception as e:
+                    logger.error(f'Ошибка обработчика карантина токена {token.name}: {e!r}')
+
+    def failure(self, token: ApiToken) -> None:
+        """Учитывает запрос с токена, оставшийся без ответа."""
+        with self._lock:
+            token.requests += 1
+            self._count(token, True)
+        TOKEN_REQUESTS.labels(token.name, 'error').inc()
+
+    def _count(self, token: ApiToken, error: bool) -> None:
+        token.errors += error
+        token.error_rate += ERROR_RATE_WEIGHT * (error - token.error_rate)
+        TOKEN_ERROR_RATE.labels(token.name).set(round(token.error_rate, 3))
+
+    def _quarantine(self, token: ApiToken, status: int) -> bool:
+        """Отправляет токен в карантин (вызывается под блокировкой); False — он уже в карантине."""
+        now = time.monotonic()
+        if token.in_quarantine(now):
+            return False
+        if token.quarantine_reason is not None:
+            # Отказ сразу после карантина: токен, скорее всего, отозван
+            token.quarantine_timeout = min(self.max_quarantine_timeout, token.quarantine_timeout * 2)
+        token.quarantined_until = now + token.quarantine_timeout
+        token.quarantine_reason = status
+        token.quarantined += 1
+        logger.error(f'Токен API WB {token.name} получил {status} и отправлен в карантин на {token.quarantine_timeout:.0f} с')
+        return True
+
+    @staticmethod
+    def _update_remaining(token: ApiToken, endpoint: str, headers: Mapping[str, str]) -> None:
+        remaining = headers.get('X-Ratelimit-Remaining')
+        if remaining is None:
+            return
+        try:
+            token.remaining[endpoint] = int(remaining)
+            reset = float(headers.get('X-Ratelimit-Reset') or 0)
+        except ValueError:
+            return
+        if token.remaining[endpoint] <= 0 and reset > 0:
+            # Квота исчерпана (например, токеном пользуется ещё один сервис): до сброса запросы с токена не идут
+            token.limiter(endpoint).hold(reset)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Использование и состояние каждого токена."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                token.name: {
+                    'state': 'quarantined' if token.in_quarantine(now) else 'ok',
+                    'quarantined_for': round(max(0.0, token.quarantined_until - now), 1),
+                    'quarantined': token.quarantined,
+                    'requests': token.requests,
+                    'errors': token.errors,
+                    'rate_limited': token.rate_limited,
+                    'error_rate': round(token.error_rate, 3),
+                    'remaining': dict(token.remaining),
+                    'endpoints': {endpoint: limiter.stats() for endpoint, limiter in token.limiters.items()},
+                }
+                for token in self.tokens
+            }
+
+
+_pools: Dict[str, TokenPool] = {}
+_pools_lock = Lock()
+_listeners: List[QuarantineListener] = []
+_shared_quota: Optional[SharedQuota] = None
+
+
+def get_pool(wb_api_token: str) -> TokenPool:
+    """
+    Общий для процесса пул токенов.
+
+    :param wb_api_token: Токен API WB или несколько токенов через запятую (как в WB_API_SUPPLY).
+    """
+    with _pools_lock:
+        pool = _pools.get(wb_api_token)
+        if pool is None:
+            pool = _pools[wb_api_token] = TokenPool(parse_tokens(wb_api_token))
+        return pool
+
+
+def pool_stats() -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """Статистика токенов всех пулов процесса (отдаётся сервером метрик на /stats)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    stats: Dict[str, Dict[str, Any]] = {}
+    for pool in pools:
+        stats.update(pool.stats())
+    return stats
+
+
+register_stats('tokens', pool_stats)
+
+
+def use_shared_quota(quota: Optional[SharedQuota]) -> None:
+    """
+    Включает учёт квот токенов, общий для процессов (None — только квота процесса).
+
+    Нужен, когда один токен используют несколько процессов, например воркеры опроса.
+    """
+    global _shared_quota
+    _shared_quota = quota
+
+
+def add_listener(listener: QuarantineListener) -> None:
+    """Подписывает обработчик на отправку токена в карантин и снятие с него."""
+    _listeners.append(listener)
+
+
+def remove_listener(listener: QuarantineListener) -> None:
+    if listener in _listeners:
+        _listeners.remove(listener)
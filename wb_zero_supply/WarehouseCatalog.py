@@ -0,0 +1,255 @@
+import os
+import json
+import time
+import logging
+import requests
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, List, Optional
+from wb_zero_supply import http_client
+from wb_zero_supply.Metrics import counter
+from wb_zero_supply.RedisManager import RedisManager
+from wb_zero_supply.WarehouseIndex import WarehouseIndex
+
+
+logger = logging.getLogger(__name__)
+
+WAREHOUSES_URL = f'{http_client.SUPPLIES_API_URL}/api/v1/warehouses'
+CATALOG_TTL = 86400  # секунд, каталог складов меняется редко
+SNAPSHOT_PATH = os.path.join('.cache', 'warehouses.json')
+REDIS_SNAPSHOT_KEY = 'catalog:warehouses'
+
+CATALOG_REQUESTS = counter('catalog_requests_total', 'Обращения к каталогу складов: hit, stale (отдан устаревший) или miss', ['result'])
+
+HTTP_ERROR_MESSAGES = {
+    401: "Ошибка авторизации: Убедитесь, что ваши учетные данные верны.",
+    403: "Доступ запрещён: У вас нет прав для доступа к этому ресурсу.",
+    404: "Адрес не найден: Проверьте правильность URL.",
+    429: "Слишком много запросов: Попробуйте позже.",
+    500: "Внутренняя ошибка сервера: Попробуйте позже."
+}
+
+
+def fetch_warehouses_wb(wb_api_token: str) -> List[Dict[str, Any]]:
+    """
+    Запрос списка складов из API без кэширования.
+
+    :raises requests.RequestException: При ошибке запроса или HTTP-ошибке.
+    """
+    try:
+        response = http_client.get('warehouses', WAREHOUSES_URL, token=wb_api_token)
+        response.raise_for_status()
+    except requests.exceptions.HTTPError as http_err:
+        logging.error(HTTP_ERROR_MESSAGES.get(response.status_code, f"Произошла ошибка: {http_err}"))
+        raise
+    except requests.exceptions.RequestException as err:
+        logging.error(f"Произошла ошибка при выполнении запроса: {err}")
+        raise
+    return response.json()
+
+
+class WarehouseCatalog:
+    """
+    Единый кэш каталога складов WB.
+
+    Устаревший каталог отдаётся сразу, а обновление идёт в фоне
+    (stale-while-revalidate), поэтому вызывающий код не ждёт сеть после
+    истечения срока. Последний удачный снимок сохраняется на диск (и в Redis,
+    если передан клиент) и используется для быстрого старта после перезапуска.
+    Поисковый индекс перестраивается вместе с каждым обновлением.
+    """
+
+    def __init__(self, fetch: Callable[[], List[Dict[str, Any]]], ttl: float = CATALOG_TTL,
+                 snapshot_path: Optional[str] = SNAPSHOT_PATH, redis_client=None):
+        """
+        :param fetch: Функция загрузки каталога из API.
+        :param ttl: Срок актуальности каталога в секундах.
+        :param snapshot_path: Файл снимка каталога (None — не сохранять на диск).
+        :param redis_client: Клиент Redis для хранения снимка (необязательно).
+        """
+        self.fetch = fetch
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        self.redis_client = redis_client
+
+        self._lock = Lock()
+        self._data: Optional[List[Dict[str, Any]]] = None
+        self._index = WarehouseIndex(())
+        self._fetched_at = 0.0  # время получения данных (time.time), в том числе из снимка
+        self._refreshing = False
+        self._snapshot_checked = False
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.last_refresh_latency = 0.0
+        self.total_refresh_latency = 0.0
+
+    def get(self, block: bool = True) -> List[Dict[str, Any]]:
+        """
+        Каталог складов.
+
+        :param block: Ждать загрузки, если данных ещё нет ни в памяти, ни в снимке.
+                      Без ожидания вернётся пустой список, а загрузка пойдёт в фоне.
+        """
+        with self._lock:
+            if self._data is None and not self._snapshot_checked:
+                self._snapshot_checked = True
+                self._load_snapshot()
+
+            if self._data is not None:
+                if time.time() - self._fetched_at <= self.ttl:
+                    self.hits += 1
+                    CATALOG_REQUESTS.labels('hit').inc()
+                else:
+                    self.stale_hits += 1
+                    CATALOG_REQUESTS.labels('stale').inc()
+                    self._start_background_refresh()
+                return self._data
+
+            self.misses += 1
+            CATALOG_REQUESTS.labels('miss').inc()
+            if not block:
+                self._start_background_refresh()
+                return []
+
+        self.refresh()
+        return self._data or []
+
+    def index(self, block: bool = True) -> WarehouseIndex:
+        """Поисковый индекс по актуальному каталогу."""
+        self.get(block)
+        return self._index
+
+    def as_dict(self, block: bool = True) -> Dict[Any, str]:
+        """Каталог в виде {ID склада: название}."""
+        return dict(self.index(block).names)
+
+    def refresh(self) -> bool:
+        """Синхронно обновляет каталог. При ошибке сохраняются прежние данные."""
+        started = time.monotonic()
+        try:
+            data = self.fetch()
+        except Exception as e:
+            with self._lock:
+                self.refresh_errors += 1
+            logger.error(f'Ошибка при обновлении каталога складов: {e}')
+            return False
+        finally:
+            latency = time.monotonic() - started
+            with self._lock:
+                self.last_refresh_latency = latency
+                self.total_refresh_latency += latency
+
+        if not data:
+            logger.warning('API вернул пустой каталог складов, используем прежние данные')
+            with self._lock:
+                self.refresh_errors += 1
+            return False
+
+        index = WarehouseIndex.from_catalog(data)
+        with self._lock:
+            self._data = data
+            self._index = index
+            self._fetched_at = time.time()
+            self.refreshes += 1
+        self._save_snapshot(data)
+        logger.info(f'Каталог складов обновлён: {len(data)} складов за {latency:.2f} с')
+        return True
+
+    def invalidate(self) -> None:
+        """Помечает каталог устаревшим: следующее обращение запустит обновление."""
+        with self._lock:
+            self._fetched_at = 0.0
+
+    def stats(self) -> Dict[str, float]:
+        """Статистика попаданий в кэш и обновлений."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'refreshes': self.refreshes,
+                'refresh_errors': self.refresh_errors,
+                'last_refresh_latency': round(self.last_refresh_latency, 3),
+                'avg_refresh_latency': round(self.total_refresh_latency / max(1, self.refreshes + self.refresh_errors), 3),
+                'age': round(time.time() - self._fetched_at, 1) if self._data is not None else None,
+                'size': len(self._data or ()),
+            }
+
+    def _start_background_refresh(self) -> None:
+        """Запускает фоновое обновление, если оно ещё не идёт (вызывается под блокировкой)."""
+        if self._refreshing:
+            return
+        self._refreshing = True
+        Thread(target=self._background_refresh, name='catalog-refresh', daemon=True).start()
+
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _load_snapshot(self) -> None:
+        """Загружает последний снимок каталога из Redis или с диска (вызывается под блокировкой)."""
+        snapshot = None
+        if self.redis_client is not None:
+            try:
+                raw = self.redis_client.get(REDIS_SNAPSHOT_KEY)
+                snapshot = json.loads(raw) if raw else None
+            except Exception as e:
+                logger.warning(f'Не удалось прочитать снимок каталога из Redis: {e}')
+        if snapshot is None and self.snapshot_path and os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, encoding='utf-8') as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f'Не удалось прочитать снимок каталога {self.snapshot_path}: {e}')
+        if not snapshot or not snapshot.get('warehouses'):
+            return
+
+        self._data = snapshot['warehouses']
+        self._index = WarehouseIndex.from_catalog(self._data)
+        self._fetched_at = snapshot.get('fetched_at', 0.0)
+        logger.info(f'Каталог складов загружен из снимка: {len(self._data)} складов')
+
+    def _save_snapshot(self, data: List[Dict[str, Any]]) -> None:
+        snapshot = json.dumps({'fetched_at': time.time(), 'warehouses': data}, ensure_ascii=False)
+        if self.redis_client is not None:
+            try:
+                self.redis_client.set(REDIS_SNAPSHOT_KEY, snapshot)
+            except Exception as e:
+                logger.warning(f'Не удалось сохранить снимок каталога в Redis: {e}')
+        if self.snapshot_path:
+            try:
+                os.makedirs(os.path.dirname(self.snapshot_path) or '.', exist_ok=True)
+                tmp_path = f'{self.snapshot_path}.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(snapshot)
+                os.replace(tmp_path, self.snapshot_path)
+            except OSError as e:
+                logger.warning(f'Не удалось сохранить снимок каталога {self.snapshot_path}: {e}')
+
+
+_catalogs: Dict[str, WarehouseCatalog] = {}
+_catalogs_lock = Lock()
+
+
+def get_catalog(wb_api_token: str) -> WarehouseCatalog:
+    """
+    Общий для процесса каталог складов.
+
+    Путь снимка задаётся WB_CATALOG_SNAPSHOT; если задан REDIS_URL, снимок
+    хранится и в Redis, чтобы им пользовались все процессы (бот и воркеры).
+    """
+    with _catalogs_lock:
+        catalog = _catalogs.get(wb_api_token)
+        if catalog is None:
+            catalog = _catalogs[wb_api_token] = WarehouseCatalog(
+                lambda: fetch_warehouses_wb(wb_api_token),
+                snapshot_path=os.getenv('WB_CATALOG_SNAPSHOT', SNAPSHOT_PATH) or None,
+                redis_client=RedisManager().redis_client if os.getenv('REDIS_URL') else None,
+            )
+        return catalog
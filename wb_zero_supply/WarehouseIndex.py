@@ -0,0 +1,139 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+
+MIN_SIMILARITY = 0.2  # минимальная доля общих триграмм для нечёткого совпадения
+_NON_WORD = re.compile(r'[\W_]+')
+
+# Уровни ранжирования: чем больше, тем выше в выдаче
+EXACT, NAME_PREFIX, WORD_PREFIX, SUBSTRING, FUZZY = 4, 3, 2, 1, 0
+
+
+def normalize(text: str) -> str:
+    """Приводит название склада к виду для поиска: регистр, ё → е, без знаков препинания."""
+    text = text.casefold().replace('ё', 'е')
+    return ' '.join(_NON_WORD.sub(' ', text).split())
+
+
+def trigrams(text: str) -> Set[str]:
+    """Триграммы нормализованной строки с границами слов."""
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class WarehouseIndex:
+    """
+    Поисковый индекс по названиям складов.
+
+    Строится один раз на каждое обновление каталога. Точное совпадение ищется
+    по словарю нормализованных названий, префиксы слов — по префиксному дереву,
+    опечатки — по триграммам, поэтому поиск не перебирает весь каталог.
+    """
+
+    def __init__(self, warehouses: Iterable[Tuple[Any, str]]):
+        """
+        :param warehouses: Пары (ID склада, название).
+        """
+        self.names: Dict[Any, str] = {}
+        self._normalized: Dict[Any, str] = {}
+        self._exact: Dict[str, List[Any]] = {}
+        self._trie: Dict[str, Any] = {}
+        self._trigrams: Dict[str, Set[Any]] = {}
+        self._trigram_counts: Dict[Any, int] = {}
+
+        for warehouse_id, name in warehouses:
+            self.add(warehouse_id, name)
+
+    @classmethod
+    def from_catalog(cls, warehouses: Iterable[Dict[str, Any]]) -> 'WarehouseIndex':
+        """Индекс по ответу /api/v1/warehouses (список словарей с ключами ID и name)."""
+        return cls((warehouse['ID'], warehouse['name']) for warehouse in warehouses)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, warehouse_id: Any, name: str) -> None:
+        """Добавляет склад в индекс."""
+        normalized = normalize(name)
+        self.names[warehouse_id] = name
+        self._normalized[warehouse_id] = normalized
+        self._exact.setdefault(normalized, []).append(warehouse_id)
+
+        for word in normalized.split():
+            node = self._trie
+            for char in word:
+                node = node.setdefault(char, {})
+                node.setdefault('', set()).add(warehouse_id)
+
+        grams = trigrams(normalized)
+        self._trigram_counts[warehouse_id] = len(grams)
+        for gram in grams:
+            self._trigrams.setdefault(gram, set()).add(warehouse_id)
+
+    def find_exact(self, name: str) -> Optional[Any]:
+        """ID склада с таким названием (без учёта регистра и ё/е) или None."""
+        ids = self._exact.get(normalize(name))
+        return ids[0] if ids else None
+
+    def _prefix_ids(self, prefix: str) -> Set[Any]:
+        node = self._trie
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return set()
+        return node['']
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[Any, str]]:
+        """
+        Ранжированный поиск складов.
+
+        Сначала точные совпадения, затем названия, начинающиеся с запроса, затем
+        названия, где каждое слово запроса — начало одного из слов, затем
+        содержащие запрос и в конце похожие по триграммам (опечатки).
+
+        :return: До limit пар (ID склада, название).
+        """
+        normalized = normalize(query)
+        if not normalized:
+            return []
+
+        scores: Dict[Any, Tuple[int, float]] = {}
+
+        words = normalized.split()
+        candidates = self._prefix_ids(words[0])
+        for word in words[1:]:
+            candidates = candidates & self._prefix_ids(word)
+        for warehouse_id in candidates:
+            name = self._normalized[warehouse_id]
+            tier = EXACT if name == normalized else NAME_PREFIX if name.startswith(normalized) else WORD_PREFIX
+            scores[warehouse_id] = (tier, 1.0)
+
+        query_grams = trigrams(normalized)
+        shared: Dict[Any, int] = {}
+        for gram in query_grams:
+            for warehouse_id in self._trigrams.get(gram, ()):
+                shared[warehouse_id] = shared.get(warehouse_id, 0) + 1
+        for warehouse_id, common in shared.items():
+            similarity = common / (len(query_grams) + self._trigram_counts[warehouse_id] - common)
+            if warehouse_id in scores:
+                scores[warehouse_id] = (scores[warehouse_id][0], similarity)
+            elif normalized in self._normalized[warehouse_id]:
+                scores[warehouse_id] = (SUBSTRING, similarity)
+            elif similarity >= MIN_SIMILARITY:
+                scores[warehouse_id] = (FUZZY, similarity)
+
+        ranked = sorted(scores, key=lambda wid: (-scores[wid][0], -scores[wid][1], len(self.names[wid])))
+        return [(warehouse_id, self.names[warehouse_id]) for warehouse_id in ranked[:limit]]
+
+    def best_matches(self, query: str, limit: int = 10) -> List[Tuple[Any, str]]:
+        """
+        Результат поиска для диалога выбора склада.
+
+        Если есть точное совпадение, возвращается только оно, чтобы не
+        переспрашивать пользователя; иначе — обычный ранжированный поиск.
+        """
+        normalized = normalize(query)
+        exact = self._exact.get(normalized)
+        if exact:
+            return [(warehouse_id, self.names[warehouse_id]) for warehouse_id in exact]
+        return self.search(query, limit)
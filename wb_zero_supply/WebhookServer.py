@@ -0,0 +1,153 @@
+import hmac
+import time
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Queue
+from threading import Thread
+from typing import List, Optional
+from telegram import Update
+from telegram.ext import Dispatcher
+from wb_zero_supply import fast_json
+from wb_zero_supply.Metrics import counter, histogram
+
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_LISTEN = '0.0.0.0'
+WEBHOOK_PORT = 8443
+WEBHOOK_PATH = 'telegram'
+WEBHOOK_WORKERS = 4
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+MAX_BODY = 1024 * 1024  # байт: обновления Telegram намного меньше
+
+WEBHOOK_UPDATES = counter('webhook_updates_total', 'Запросы к вебхуку по результату', ['result'])
+UPDATE_LATENCY = histogram('telegram_update_duration_seconds', 'Время обработки обновления Telegram от приёма до конца обработчиков')
+
+
+class WebhookServer:
+    """
+    Приём обновлений Telegram через вебхук на встроенном HTTP-сервере.
+
+    Запрос проверяется по секретному токену из заголовка X-Telegram-Bot-Api-Secret-Token,
+    ставится в очередь и сразу получает ответ 200, а обработчики диспетчера PTB
+    выполняются в workers потоках. Обновления одного чата всегда попадают в один
+    поток, поэтому диалоги (ConversationHandler) видят сообщения по порядку, а
+    разные чаты обрабатываются параллельно. GET на любой путь — проверка живости
+    для балансировщика.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, listen: str = WEBHOOK_LISTEN, port: int = WEBHOOK_PORT,
+                 url_path: str = WEBHOOK_PATH, secret_token: Optional[str] = None, workers: int = WEBHOOK_WORKERS):
+        """
+        :param dispatcher: Диспетчер PTB с зарегистрированными обработчиками.
+        :param listen: Адрес, на котором слушает сервер.
+        :param port: Порт сервера (0 — выбрать свободный).
+        :param url_path: Путь вебхука без начального слеша.
+        :param secret_token: Секрет, который Telegram передаёт в заголовке (None — без проверки).
+        :param workers: Число потоков обработки обновлений.
+        """
+        self.dispatcher = dispatcher
+        self.listen = listen
+        self.port = port
+        self.url_path = '/' + url_path.strip('/')
+        self.secret_token = secret_token
+        self.workers = max(1, workers)
+        self._queues: List[Queue] = [Queue() for _ in range(self.workers)]
+        self._threads: List[Thread] = []
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def server_port(self) -> int:
+        return self._server.server_port if self._server is not None else self.port
+
+    def check_secret(self, token: Optional[str]) -> bool:
+        """Совпадает ли секрет из заголовка с настроенным (сравнение за постоянное время)."""
+        if not self.secret_token:
+            return True
+        return token is not None and hmac.compare_digest(token.encode('utf-8'), self.secret_token.encode('utf-8'))
+
+    def submit(self, data: dict) -> None:
+        """Ставит обновление в очередь потока, закреплённого за его чатом."""
+        update = Update.de_json(data, self.dispatcher.bot)
+        chat_id = update.effective_chat.id if update.effective_chat is not None else update.update_id
+        self._queues[hash(chat_id) % self.workers].put((update, time.perf_counter()))
+
+    def start(self) -> None:
+        """Запускает потоки обработки и HTTP-сервер в фоне."""
+        for i, queue in enumerate(self._queues):
+            thread = Thread(target=self._work, args=(queue,), name=f'webhook-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        server = self
+
+        class Handler(_Handler):
+            webhook = server
+
+        self._server = ThreadingHTTPServer((self.listen, self.port), Handler)
+        self._server.daemon_threads = True
+        Thread(target=self._server.serve_forever, name='webhook-http', daemon=True).start()
+        logger.info(f'Вебхук слушает http://{self.listen}:{self.server_port}{self.url_path} (потоков обработки: {self.workers})')
+
+    def stop(self, timeout: float = 5) -> None:
+        """Останавливает приём и дорабатывает уже поставленные в очередь обновления."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for queue in self._queues:
+            queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _work(self, queue: Queue) -> None:
+        while True:
+            item = queue.get()
+            if item is None:
+                return
+            update, received = item
+            try:
+                self.dispatcher.process_update(update)
+            except Exception as e:
+                logger.error(f'Ошибка обработки обновления {update.update_id}: {e!r}')
+            UPDATE_LATENCY.observe(time.perf_counter() - received)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    webhook: WebhookServer
+
+    def do_POST(self) -> None:
+        if self.path.split('?')[0].rstrip('/') != self.webhook.url_path.rstrip('/'):
+            WEBHOOK_UPDATES.labels('not_found').inc()
+            self.send_error(404)
+            return
+        if not self.webhook.check_secret(self.headers.get(SECRET_HEADER)):
+            WEBHOOK_UPDATES.labels('forbidden').inc()
+            self.send_error(403)
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if length <= 0 or length > MAX_BODY:
+            WEBHOOK_UPDATES.labels('bad_request').inc()
+            self.send_error(400 if length <= 0 else 413)
+            return
+        try:
+            self.webhook.submit(fast_json.loads(self.rfile.read(length)))
+        except Exception as e:
+            logger.warning(f'Некорректное обновление на вебхуке: {e!r}')
+            WEBHOOK_UPDATES.labels('bad_request').inc()
+            self.send_error(400)
+            return
+        WEBHOOK_UPDATES.labels('accepted').inc()
+        self._reply(200, b'')
+
+    def do_GET(self) -> None:
+        self._reply(200, b'ok')
+
+    def _reply(self, status: int, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
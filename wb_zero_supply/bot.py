@@ -1,32 +1,110 @@
 import os
+import re
+import time
+import redis
+import argparse
 import logging
 import requests
 import signal
-from threading import Lock
-from typing import Dict, Any
-from datetime import datetime
+from threading import Event, Lock, Thread
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
 from dotenv import load_dotenv
-from functools import lru_cache
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import Updater, CommandHandler, MessageHandler, Filters, ConversationHandler, CallbackContext
+from wb_zero_supply.CircuitBreaker import CLOSED, OPEN, CircuitOpenError, add_listener, get_breaker, remove_listener
+from wb_zero_supply.CoefficientHistory import COMPACT_INTERVAL, CoefficientHistory, HISTORY_DIR
+from wb_zero_supply.CoefficientPoller import CoefficientPoller, Delivery, MAX_WAREHOUSES_PER_REQUEST
+from wb_zero_supply.CoefficientRecord import format_day_ru
+from wb_zero_supply.ErrorAggregator import DIGEST_INTERVAL, ErrorAggregator
+from wb_zero_supply.SnapshotDiff import SlotChange
+from wb_zero_supply.MessageSender import MessageSender
+from wb_zero_supply.Metrics import gauge, start_from_env
+from wb_zero_supply.PollWorker import PollTaskQueue, run_worker
+from wb_zero_supply.RedisManager import RedisManagerQuota, RedisManagerSubscriptions
+from wb_zero_supply.Scheduler import Scheduler
+from wb_zero_supply.SubscriptionIndex import Subscription, SubscriptionIndex, SubscriptionKey
+from wb_zero_supply.TokenPool import add_listener as add_token_listener, remove_listener as remove_token_listener, use_shared_quota
+from wb_zero_supply.WarehouseCatalog import get_catalog
+from wb_zero_supply.WebhookServer import WebhookServer, WEBHOOK_LISTEN, WEBHOOK_PATH, WEBHOOK_PORT, WEBHOOK_WORKERS
+from wb_zero_supply.get_stock_wb_from_api import fetch_coefficients_body
+from wb_zero_supply.log_setup import setup_logging
 
 
-logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SUBSCRIBERS = gauge('bot_subscribers', 'Пользователей с активным мониторингом')
+SUBSCRIPTIONS = gauge('bot_subscriptions', 'Подписок (склад, тип поставки, порог) у всех пользователей')
+WATCHED_WAREHOUSES = gauge('bot_watched_warehouses', 'Различных складов в опросе')
+
 CHOOSING, TYPING_WAREHOUSE, TYPING_BOX_TYPE, CHOOSING_COEFFICIENT = range(4)
+POLL_INTERVAL = 11  # секунд между опросами коэффициентов
+RUN_MODES = ('scheduler', 'asyncio', 'distributed', 'worker')
+MODE_ALIASES = {'jobqueue': 'scheduler'}  # прежние названия режимов (BOT_MODE в старых .env)
+UPDATE_MODES = ('polling', 'webhook')
+WAREHOUSE_CHOICE = re.compile(r'^.*\(ID: (\d+)\)$')  # ответ кнопкой «Название (ID: 123)»
+MAX_WAREHOUSE_CHOICES = 10
+MAX_PRIORITY = 10  # приоритет склада, на котором до порога подписчиков далеко или данных нет
+MAX_SUBSCRIPTIONS = 20  # подписок у одного пользователя
 
 
 class Bot:
-    def __init__(self, token: str, api_key: str, admin_channel_id: str):
-        self.updater = Updater(token, use_context=True)
+    def __init__(self, token: str, api_key: str, admin_channel_id: str, mode: str = 'scheduler',
+                 telegram_base_url: Optional[str] = None, poll_interval: float = POLL_INTERVAL, persist: bool = True):
+        """
+        :param mode: Движок мониторинга: 'scheduler', 'asyncio' или 'distributed' (опрос на воркерах через Redis).
+        :param telegram_base_url: Адрес Bot API (по умолчанию api.telegram.org; для стенда — локальный сервер).
+        :param poll_interval: Секунд между опросами коэффициентов.
+        :param persist: Сохранять подписки и снимки складов в Redis и восстанавливать их при запуске.
+        """
+        updater_kwargs = {'base_url': telegram_base_url} if telegram_base_url else {}
+        self.updater = Updater(token, use_context=True, **updater_kwargs)
         self.api_key = api_key
         self.admin_channel_id = admin_channel_id
         self.dp = self.updater.dispatcher
-        self.user_data_lock: Lock = Lock()
-        self.user_data: Dict[int, Dict[str, Any]] = {}
-        self.warehouses: Dict[str, str] = self.load_warehouses(api_key)
+        self.subscriptions_lock: Lock = Lock()  # согласованность индекса подписок, опроса и планировщика
+        self.subscriptions = SubscriptionIndex()
+        # Каталог берётся из снимка, а без снимка загружается в фоне: медленный API WB не задерживает запуск
+        self.catalog = get_catalog(api_key)
+        self.catalog.get(block=False)
+        self.sender = MessageSender(self.updater.bot)
+        self.errors = ErrorAggregator(lambda text: self.sender.send(self.admin_channel_id, text),
+                                      interval=float(os.getenv('ADMIN_DIGEST_INTERVAL', DIGEST_INTERVAL)))
+        self.history = CoefficientHistory(os.getenv('WB_HISTORY_DIR', HISTORY_DIR) or None,
+                                          compact_interval=float(os.getenv('WB_HISTORY_COMPACT_INTERVAL', COMPACT_INTERVAL)))
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.scheduler: Optional[Scheduler] = None
+        self.tasks: Optional[PollTaskQueue] = None
+        self._results_stop = Event()
+        self._results_thread: Optional[Thread] = None
+        self.webhook: Optional[WebhookServer] = None
+        self.webhook_url: Optional[str] = None
+        self._shutdown = Event()
+        self._restore_thread: Optional[Thread] = None
+        # Соединение с Redis открывается при первом обращении; доступность проверяется при восстановлении подписок
+        self.store: Optional[RedisManagerSubscriptions] = RedisManagerSubscriptions() if persist else None
+        if mode == 'asyncio':
+            # aiohttp импортируется только в асинхронном режиме
+            from wb_zero_supply.AsyncMonitor import AsyncMonitor
+            self.poller = AsyncMonitor(api_key, self.check_coefficient, self.handle_poll_error, interval=poll_interval,
+                                       history=self.history, store=self.store)
+        else:
+            self.poller = CoefficientPoller(lambda warehouse_ids: fetch_coefficients_body(self.api_key, warehouse_ids),
+                                            history=self.history, store=self.store)
+            self.scheduler = Scheduler(self.check_coefficients, interval=poll_interval,
+                                       batch_size=MAX_WAREHOUSES_PER_REQUEST, name='check_coefficients')
+            if mode == 'distributed':
+                self.tasks = PollTaskQueue()
+                # Токены бота используют и воркеры опроса: квота на токен общая и хранится в Redis
+                use_shared_quota(RedisManagerQuota())
+
+        add_listener(self.circuit_changed)
+        add_token_listener(self.token_quarantine_changed)
+
+        SUBSCRIBERS.set_function(self.subscriptions.users)
+        SUBSCRIPTIONS.set_function(lambda: len(self.subscriptions))
+        WATCHED_WAREHOUSES.set_function(lambda: len(self.poller.warehouse_ids()))
 
         self.dp.bot_data['API_KEY'] = api_key
         self.dp.bot_data['ADMIN_CHANNEL_ID'] = admin_channel_id
@@ -35,25 +113,24 @@ class Bot:
 
     def register_handlers(self) -> None:
         conv_handler = ConversationHandler(
-            entry_points=[CommandHandler('start', self.start)],
+            entry_points=[CommandHandler('start', self.start), CommandHandler('add', self.add)],
             states={
                 CHOOSING: [MessageHandler(Filters.regex('^Ввести название склада$'), self.choose_action)],
                 TYPING_WAREHOUSE: [MessageHandler(Filters.text & ~Filters.command, self.receive_warehouse)],
                 TYPING_BOX_TYPE: [MessageHandler(Filters.regex('^[0-9]{1,2}$'), self.select_delivery_type)],
                 CHOOSING_COEFFICIENT: [MessageHandler(Filters.text & ~Filters.command, self.receive_coefficient)]
             },
-            fallbacks=[CommandHandler('cancel', self.cancel)]
+            fallbacks=[CommandHandler('cancel', self.cancel_dialog)]
         )
 
         self.dp.add_handler(conv_handler)
+        self.dp.add_handler(CommandHandler('list', self.list_subscriptions))
+        self.dp.add_handler(CommandHandler('remove', self.remove))
         self.dp.add_handler(CommandHandler('cancel', self.cancel))
 
     def start(self, update: Update, context: CallbackContext) -> int:
-        user_id = update.effective_user.id
-        with self.user_data_lock:
-            if user_id in self.user_data:
-                update.message.reply_text('У вас уже есть активный мониторинг. Используйте /cancel, чтобы остановить его и начать заново.')
-                return ConversationHandler.END
+        if self._limit_reached(update):
+            return ConversationHandler.END
 
         # Сообщение-описание бота
         description = (
@@ -61,7 +138,8 @@ class Bot:
             "С помощью этого бота вы можете:\n"
             "- Отслеживать коэффициенты на складах\n"
             "- Получать уведомления о изменениях\n"
-            "- Управлять своими поставками"
+            "- Управлять своими поставками\n"
+            "Подписок может быть несколько: /add — добавить, /list — список, /remove — удалить."
         )
         update.message.reply_text(description)
 
@@ -72,19 +150,40 @@ class Bot:
         )
         return CHOOSING
 
+    def add(self, update: Update, context: CallbackContext) -> int:
+        """Обработчик команды /add: ещё одна подписка без приветствия."""
+        if self._limit_reached(update):
+            return ConversationHandler.END
+        return self.choose_action(update, context)
+
+    def _limit_reached(self, update: Update) -> bool:
+        if len(self.subscriptions.for_user(update.effective_user.id)) < MAX_SUBSCRIPTIONS:
+            return False
+        update.message.reply_text(f'У вас уже {MAX_SUBSCRIPTIONS} подписок — это максимум. Удалите ненужные командой /remove.')
+        return True
+
     def choose_action(self, update: Update, context: CallbackContext) -> int:
         update.message.reply_text('Введите название склада для мониторинга (например, Тула или Коледино):')
         return TYPING_WAREHOUSE
 
     def receive_warehouse(self, update: Update, context: CallbackContext) -> int:
-        warehouse_name = update.message.text.strip().lower()
-        matching_warehouses = [w for w in self.warehouses.items() if warehouse_name in w[1].lower()]
+        warehouse_name = update.message.text.strip()
+        warehouse_index = self.catalog.index(block=False)
+        if not warehouse_index.names:
+            update.message.reply_text('Справочник складов ещё загружается. Попробуйте через минуту.')
+            return TYPING_WAREHOUSE
+        choice = WAREHOUSE_CHOICE.match(warehouse_name)
+        if choice and int(choice.group(1)) in warehouse_index.names:
+            warehouse_id = int(choice.group(1))
+            matching_warehouses = [(warehouse_id, warehouse_index.names[warehouse_id])]
+        else:
+            matching_warehouses = warehouse_index.best_matches(warehouse_name, limit=MAX_WAREHOUSE_CHOICES)
 
         if not matching_warehouses:
             update.message.reply_text('Склад с таким названием не найден. Попробуйте еще раз.')
             return TYPING_WAREHOUSE
         elif len(matching_warehouses) > 1:
-            keyboard = [[f"{name} (ID: {id})" for id, name in matching_warehouses]]
+            keyboard = [[f"{name} (ID: {id})"] for id, name in matching_warehouses]
             update.message.reply_text(
                 'Найдено несколько складов. Выберите нужный:',
                 reply_markup=ReplyKeyboardMarkup(keyboard, one_time_keyboard=True)
@@ -125,158 +224,467 @@ class Bot:
         return ConversationHandler.END
 
     def start_monitoring(self, update: Update, context: CallbackContext, user_id: int, warehouse_id: str, warehouse_name: str, max_coefficient: int, box_type_name: str) -> None:
-        with self.user_data_lock:
-            self.user_data[user_id] = {
-                'warehouse_id': warehouse_id,
-                'warehouse_name': warehouse_name,
-                'max_coefficient': max_coefficient,
-                'box_type_name': box_type_name,
-                'last_coefficients': {}
-            }
-        message = f'Мониторинг начат для склада {warehouse_name}. Вы будете получать уведомления о коэффициентах от 0 до {max_coefficient} с типом поставки {box_type_name}.'
+        subscription = self.add_subscription(user_id, warehouse_id, warehouse_name, max_coefficient, box_type_name)
+        message = (
+            f'Мониторинг начат для склада {warehouse_name} (подписка №{subscription.number}). Вы будете получать уведомления '
+            f'о коэффициентах от 0 до {max_coefficient} с типом поставки {box_type_name}.\n'
+            f'Все подписки — /list, удалить эту — /remove {subscription.number}, добавить ещё — /add.'
+        )
         update.message.reply_text(message, reply_markup=ReplyKeyboardRemove())
-        context.job_queue.run_repeating(self.check_coefficient, interval=11, first=0, context=user_id)
-
-    def check_coefficient(self, context: CallbackContext) -> None:
-        user_id = context.job.context
-        with self.user_data_lock:
-            if user_id not in self.user_data:
-                return
-            warehouse_id = self.user_data[user_id]['warehouse_id']
-            warehouse_name = self.user_data[user_id]['warehouse_name']
-            max_coefficient = self.user_data[user_id]['max_coefficient']
-            box_type_name = self.user_data[user_id]['box_type_name']
-
-        url = 'https://supplies-api.wildberries.ru/api/v1/acceptance/coefficients'
-        api_key = context.bot_data['API_KEY']
-        headers = {
-            'Authorization': f'Bearer {api_key}'
-        }
-        params = {
-            'warehouseIDs': warehouse_id,
-            'boxTypeName': box_type_name
-        }
 
-        try:
-            response = requests.get(url, params=params, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-
-            if data:
-                # Фильтруем по типу поставки: короб, монопалет и т.п.
-                box_types = [item for item in data if item['boxTypeName'] == box_type_name]
-
-                if not box_types:  # Проверка на наличие данных
-                    self.send_error_message(context, user_id, f'Нет данных для типа поставки: {box_type_name}.')
-                    return
-
-                # Фильтруем коэффициенты, исключая -1 и те, что больше max_coefficient
-                coefficients = {
-                    int(item['coefficient']): item['date']
-                    for item in box_types
-                    if int(item['coefficient']) != -1 and 0 <= int(item['coefficient']) <= max_coefficient
-                }
-
-                with self.user_data_lock:
-                    last_coefficients = self.user_data[user_id]['last_coefficients']
-                    for coef, date in coefficients.items():
-                        if coef in last_coefficients and last_coefficients[coef] == date:
-                            continue
-                        formatted_date = datetime.fromisoformat(date.replace('Z', '+00:00')).strftime('%d.%m.%Y')
-                        message = f'Обновление:\nСклад: {warehouse_name}\nДата: {formatted_date}\nКоэффициент: {coef}\nТип поставки: {box_type_name}'
-
-                        # Создание кнопки "Забронировать"
-                        keyboard = [[InlineKeyboardButton("Забронировать", url="https://seller.wildberries.ru/supplies-management/all-supplies")]]
-                        reply_markup = InlineKeyboardMarkup(keyboard)
-                        # Отправка сообщения с кнопкой
-                        context.bot.send_message(chat_id=user_id, text=message, reply_markup=reply_markup)
-
-                    self.user_data[user_id]['last_coefficients'] = coefficients
+    def add_subscription(self, user_id: int, warehouse_id: str, warehouse_name: str, max_coefficient: int, box_type_name: str) -> Subscription:
+        """
+        Добавляет подписку пользователя и ставит склад в опрос.
+
+        Подписка на тот же склад и тип поставки заменяет прежнюю (меняется порог).
+        """
+        with self.subscriptions_lock:
+            subscription = self.subscriptions.add(user_id, int(warehouse_id), warehouse_name, box_type_name, max_coefficient)
+            self.poller.subscribe(subscription.key, subscription.warehouse_id)
+            if self.scheduler is not None:
+                self.scheduler.add(subscription.warehouse_id)
+        if self.store is not None:
+            try:
+                self.store.save_subscription(user_id, subscription.number, subscription.to_dict())
+            except redis.RedisError as e:
+                logger.error(f'Не удалось сохранить подписку пользователя {user_id}: {e}')
+        return subscription
+
+    def remove_subscription(self, user_id: int, number: Optional[int] = None) -> List[Subscription]:
+        """
+        Удаляет подписку пользователя с номером number (None — все его подписки).
+
+        Склады, на которые больше никто не подписан, снимаются с опроса. Возвращает удалённые подписки.
+        """
+        with self.subscriptions_lock:
+            if number is None:
+                removed = self.subscriptions.remove_user(user_id)
             else:
-                self.send_error_message(context, user_id, f'Данные для склада {warehouse_name} не найдены.')
-        except requests.HTTPError as http_err:
-            error_message = f'Ошибка HTTP: {http_err}'
-            if response.status_code == 401:
-                error_message = 'Ошибка авторизации. Проверьте API ключ.'
-            elif response.status_code == 404:
-                error_message = f'Склад {warehouse_name} не найден.'
-            self.send_error_message(context, user_id, error_message)
-        except requests.RequestException as req_err:
-            self.send_error_message(context, user_id, f'Ошибка запроса: {req_err}')
-        except Exception as e:
-            self.send_error_message(context, user_id, f'Неизвестная ошибка: {str(e)}')
-
-    def send_error_message(self, context: CallbackContext, user_id: int, error_message: str) -> None:
-        """Отправка сообщения об ошибке пользователю и администратору."""
-        context.bot.send_message(chat_id=user_id, text=error_message)
-        self.send_error_to_admin(error_message, context)
-
-    def send_error_to_admin(self, error_message: str, context: CallbackContext) -> None:
-        """Отправка сообщения об ошибке администратору."""
-        admin_channel_id = context.bot_data['ADMIN_CHANNEL_ID']
-        context.bot.send_message(chat_id=admin_channel_id, text=f"Ошибка бота: {error_message}")
-
-    @lru_cache(maxsize=1)
-    def get_warehouses(self, api_key: str) -> Dict[str, str]:
-        """Получение списка складов с кэшированием."""
-        url = 'https://supplies-api.wildberries.ru/api/v1/warehouses'
-        headers = {'Authorization': f'Bearer {api_key}'}
-
+                subscription = self.subscriptions.remove(user_id, number)
+                removed = [subscription] if subscription is not None else []
+            for subscription in removed:
+                forgotten = self.poller.unsubscribe(subscription.key)
+                if forgotten is not None and self.scheduler is not None:
+                    self.scheduler.remove(forgotten)
+        if removed and self.store is not None:
+            try:
+                self.store.delete_subscription(user_id, number)
+            except redis.RedisError as e:
+                logger.error(f'Не удалось удалить сохранённую подписку пользователя {user_id}: {e}')
+        return removed
+
+    def restore_subscriptions(self) -> int:
+        """
+        Загружает сохранённые подписки и снимки складов из Redis и ставит склады в опрос.
+
+        Первые опросы восстановленных складов разнесены по интервалу опроса,
+        поэтому перезапуск не даёт всплеска запросов к API. Подписки, которые
+        пользователь успел добавить до восстановления, объединяются с
+        сохранёнными. Возвращает число восстановленных подписок.
+        """
+        if self.store is None:
+            return 0
+        started = time.monotonic()
+        if not self.store.check_connection():
+            logger.warning('Redis недоступен: подписки не будут сохраняться между перезапусками.')
+            self._detach_store()
+            return 0
         try:
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-
-            return {warehouse['ID']: warehouse['name'] for warehouse in data}
-        except requests.RequestException as e:
-            logger.warning(f'Ошибка при загрузке списка складов: {str(e)}')
-            return {}
+            stored = self.store.load_subscriptions()
+            warehouse_ids = sorted({int(data['warehouse_id']) for subscriptions in stored.values() for data in subscriptions.values()})
+            snapshots = self.store.load_slots(warehouse_ids)
+        except (redis.RedisError, KeyError, ValueError) as e:
+            logger.error(f'Не удалось восстановить подписки из Redis: {e!r}')
+            return 0
+
+        restored: List[Subscription] = []
+        renumbered: List[Subscription] = []
+        superseded: List[Tuple[int, int]] = []  # (пользователь, номер) сохранённых подписок, заменённых новыми
+        with self.subscriptions_lock:
+            # Восстановление идёт, когда бот уже принимает обновления: склады, опрос которых
+            # начался по новым подпискам, сохраняют актуальный снимок и место в планировщике
+            polled = set(self.poller.warehouse_ids())
+            snapshots = {warehouse_id: slots for warehouse_id, slots in snapshots.items() if warehouse_id not in polled}
+            for user_id, subscriptions in stored.items():
+                # Подписки, добавленные до восстановления, новее сохранённых на тот же склад и тип поставки;
+                # сохранённые на другие склады дополняют их, а занятый номер заменяется свободным
+                current = self.subscriptions.for_user(user_id)
+                kinds = {(subscription.warehouse_id, subscription.box_type_name) for subscription in current}
+                numbers = {subscription.number for subscription in current}
+                for number, data in sorted(subscriptions.items()):
+                    if (int(data['warehouse_id']), data['box_type_name']) in kinds:
+                        if number not in numbers:
+                            superseded.append((user_id, number))
+                        continue
+                    collision = number in numbers
+                    if collision:
+                        number = max(numbers | set(subscriptions)) + 1
+                    numbers.add(number)
+                    subscription = self.subscriptions.add(user_id, int(data['warehouse_id']), data['warehouse_name'],
+                                                          data['box_type_name'], int(data['max_coefficient']), number=number)
+                    restored.append(subscription)
+                    if collision:
+                        renumbered.append(subscription)
+            self.poller.restore({subscription.key: subscription.warehouse_id for subscription in restored}, snapshots)
+            if self.scheduler is not None:
+                for i, warehouse_id in enumerate(warehouse_ids):
+                    if warehouse_id not in polled:
+                        self.scheduler.add(warehouse_id, delay=self.poll_interval * i / len(warehouse_ids))
+        for user_id, number in superseded:
+            try:
+                self.store.delete_subscription(user_id, number)
+            except redis.RedisError as e:
+                logger.error(f'Не удалось удалить заменённую подписку пользователя {user_id}: {e}')
+        for subscription in renumbered:
+            # Номер подписки заняла новая подписка пользователя и, возможно, уже перезаписала её в Redis
+            logger.warning(f'Подписка пользователя {subscription.user_id} на склад {subscription.warehouse_name} '
+                           f'восстановлена под номером {subscription.number}')
+            try:
+                self.store.save_subscription(subscription.user_id, subscription.number, subscription.to_dict())
+            except redis.RedisError as e:
+                logger.error(f'Не удалось сохранить подписку пользователя {subscription.user_id}: {e}')
+        logger.info(f'Восстановлено подписок: {len(restored)}, складов: {len(warehouse_ids)}, '
+                    f'снимков: {len(snapshots)} за {time.monotonic() - started:.2f} с')
+        return len(restored)
+
+    def _detach_store(self) -> None:
+        """Отключает сохранение подписок и снимков складов, чтобы запросы к недоступному Redis не ждали таймаута."""
+        self.store = None
+        poller = self.poller.poller if self.mode == 'asyncio' else self.poller
+        poller.store = None
+
+    def enable_webhook(self, webhook_url: Optional[str] = None, listen: str = WEBHOOK_LISTEN, port: int = WEBHOOK_PORT,
+                       url_path: str = WEBHOOK_PATH, secret_token: Optional[str] = None, workers: int = WEBHOOK_WORKERS) -> None:
+        """
+        Переключает приём обновлений с long polling на вебхук (вызывать до launch).
+
+        :param webhook_url: Публичный адрес вебхука для setWebhook; None — не регистрировать
+                            (например, для реплик за балансировщиком, когда адрес уже задан).
+        :param secret_token: Секрет, который Telegram присылает в заголовке каждого запроса.
+        :param workers: Потоков обработки обновлений.
+        """
+        self.webhook = WebhookServer(self.dp, listen=listen, port=port, url_path=url_path,
+                                     secret_token=secret_token, workers=workers)
+        self.webhook_url = webhook_url
+
+    def check_coefficients(self, warehouse_ids: List[int]) -> None:
+        """
+        Опрос пачки складов, выбранной планировщиком, и пересчёт их приоритетов.
+
+        В режиме distributed пачка только ставится в очередь воркеров, а ответ
+        приходит в handle_poll_result.
+        """
+        batch = sorted(warehouse_ids)
+        if self.tasks is not None:
+            self.tasks.submit(batch)
+            return
+        self.poller.poll_batch(batch, self.check_coefficient, self.handle_poll_error)
+        self._update_priorities(batch)
+
+    def handle_poll_result(self, batch: List[int], body: Optional[bytes], error: Optional[Exception]) -> None:
+        """Ответ воркера по пачке складов: раздача изменений подписчикам или сообщение об ошибке."""
+        if isinstance(error, CircuitOpenError):
+            for delivery in self.poller.process_outage(batch):
+                self.check_coefficient(delivery)
+            return
+        if error is not None:
+            subscribers = self.poller.subscribers(batch)
+            self.handle_poll_error(set().union(*subscribers.values()), error)
+            return
+        for delivery in self.poller.process_batch(batch, body):
+            self.check_coefficient(delivery)
+        self._update_priorities(batch)
+
+    def _update_priorities(self, warehouse_ids: List[int]) -> None:
+        for warehouse_id in warehouse_ids:
+            self.scheduler.set_priority(warehouse_id, self.warehouse_priority(warehouse_id))
+
+    def warehouse_priority(self, warehouse_id: int) -> int:
+        """
+        Приоритет опроса склада: насколько ближайший слот выше порога подписчиков.
+
+        0 — у кого-то из подписчиков слот уже в пределах порога (или данных ещё
+        нет), чем больше — тем дальше до нужного коэффициента.
+        """
+        slots = self.poller.diff.snapshot(warehouse_id)
+        if not slots:
+            return 0
+        priority = MAX_PRIORITY
+        for slot in slots:
+            if slot.new is None or slot.new < 0:
+                continue
+            max_coefficient = self.subscriptions.max_coefficient(warehouse_id, slot.box_type_name)
+            if max_coefficient is not None:
+                priority = min(priority, max(0, slot.new - max_coefficient))
+        return priority
+
+    def check_coefficient(self, delivery: Delivery) -> None:
+        """
+        Уведомления по изменившимся слотам склада.
+
+        Подписки, которым подходит слот, находятся по индексу (склад, тип поставки)
+        бинарным поиском по порогу, без перебора пользователей. Новые подписки
+        получают подходящие слоты из всего текущего снимка склада.
+        """
+        matches: Dict[SubscriptionKey, Tuple[Subscription, List[SlotChange]]] = {}
+        for change in delivery.changes:
+            # Нужны слоты, ставшие доступными с коэффициентом от 0 (-1 — приёмка закрыта, None — слот пропал)
+            if change.new is None or change.new < 0:
+                continue
+            for subscription in self.subscriptions.match(delivery.warehouse_id, change.box_type_name, change.new):
+                if subscription.key not in delivery.fresh:
+                    matches.setdefault(subscription.key, (subscription, []))[1].append(change)
+
+        for key in delivery.fresh:
+            subscription = self.subscriptions.get(key)
+            if subscription is None:
+                continue
+            if not delivery.snapshot:
+                self.send_error_message(subscription.user_id, f'Данные для склада {subscription.warehouse_name} не найдены.', kind='no_data')
+                continue
+            # Фильтруем по типу поставки: короб, монопалет и т.п.
+            box_types = [change for change in delivery.snapshot if change.box_type_name == subscription.box_type_name]
+            if not box_types:  # Проверка на наличие данных
+                self.send_error_message(subscription.user_id, f'Нет данных для типа поставки: {subscription.box_type_name}.', kind='no_box_type')
+                continue
+            updates = [change for change in box_types if change.new is not None and 0 <= change.new <= subscription.max_coefficient]
+            if updates:
+                matches[key] = (subscription, updates)
+
+        for subscription, changes in matches.values():
+            self.notify(subscription, changes, stale=delivery.stale)
+
+    def notify(self, subscription: Subscription, changes: List[SlotChange], stale: bool = False) -> None:
+        """
+        Уведомление подписчика о подходящих слотах (через очередь: обновления для одного чата склеиваются в сводку).
+
+        :param stale: Слоты из последнего удачного ответа, пока API WB недоступен.
+        """
+        try:
+            for change in sorted(changes, key=lambda c: c.day):
+                message = (f'Обновление:\nСклад: {subscription.warehouse_name}\nДата: {format_day_ru(change.day)}\n'
+                           f'Коэффициент: {change.new}\nТип поставки: {subscription.box_type_name}')
+                if stale:
+                    message += '\nДанные могут быть устаревшими: API WB временно недоступен.'
+
+                # Создание кнопки "Забронировать"
+                keyboard = [[InlineKeyboardButton("Забронировать", url="https://seller.wildberries.ru/supplies-management/all-supplies")]]
+                reply_markup = InlineKeyboardMarkup(keyboard)
+                # Отправка сообщения с кнопкой
+                self.sender.send(subscription.user_id, message, reply_markup=reply_markup, priority=change.new, digest=True)
+        except Exception as e:
+            self.sender.send(subscription.user_id, f'Неизвестная ошибка: {str(e)}')
+            self.send_error_to_admin(e, user_ids=(subscription.user_id,))
+
+    def handle_poll_error(self, keys: Set[SubscriptionKey], error: Exception) -> None:
+        """Сообщение об ошибке общего запроса каждому подписчику пачки (одно на пользователя) и один раз администратору."""
+        if isinstance(error, requests.RequestException) and get_breaker('coefficients').state == OPEN:
+            # Об отключении API администратор уже знает (circuit_changed), пользователям ошибки не рассылаются
+            logger.info(f'Ошибка опроса при разомкнутом предохранителе: {error}')
+            return
+        warehouse_names: Dict[int, Set[str]] = {}
+        for key in keys:
+            subscription = self.subscriptions.get(key)
+            if subscription is not None:
+                warehouse_names.setdefault(subscription.user_id, set()).add(subscription.warehouse_name)
+
+        for user_id, names in warehouse_names.items():
+            if isinstance(error, requests.HTTPError):
+                error_message = f'Ошибка HTTP: {error}'
+                if error.response is not None and error.response.status_code == 401:
+                    error_message = 'Ошибка авторизации. Проверьте API ключ.'
+                elif error.response is not None and error.response.status_code == 404:
+                    error_message = f"Склад {', '.join(sorted(names))} не найден."
+            elif isinstance(error, requests.RequestException):
+                error_message = f'Ошибка запроса: {error}'
+            else:
+                error_message = f'Неизвестная ошибка: {str(error)}'
+            self.sender.send(user_id, error_message)
+
+        self.errors.report(error, endpoint='coefficients', user_ids=warehouse_names.keys())
+
+    def circuit_changed(self, endpoint: str, previous: str, state: str) -> None:
+        """Одно сообщение администратору при отключении API WB и одно — при восстановлении (а не на каждом опросе)."""
+        if state == OPEN and previous == CLOSED:
+            retry_in = get_breaker(endpoint).retry_in()
+            self.sender.send(self.admin_channel_id, f'Ошибка бота: API WB ({endpoint}) недоступен: запросы приостановлены, '
+                                                    f'пробный запрос через {retry_in:.0f} с')
+        elif state == CLOSED:
+            self.sender.send(self.admin_channel_id, f'API WB ({endpoint}) снова отвечает, опрос возобновлён.')
+
+    def token_quarantine_changed(self, token: str, quarantined: bool, status: Optional[int]) -> None:
+        """Сообщение администратору, когда токен API WB отправлен в карантин или снова принят API."""
+        if quarantined:
+            self.sender.send(self.admin_channel_id, f'Ошибка бота: токен API WB {token} получил {status}: '
+                                                    f'он не используется, пока есть исправные. Проверьте токен в WB_API_SUPPLY.')
+        else:
+            self.sender.send(self.admin_channel_id, f'Токен API WB {token} снова принят API.')
+
+    def send_error_message(self, user_id: int, error_message: str, kind: Optional[str] = None) -> None:
+        """
+        Отправка сообщения об ошибке пользователю и учёт её для администратора.
+
+        :param kind: Вид ошибки для группировки в сводке (без него сообщения группируются вместе).
+        """
+        self.sender.send(user_id, error_message)
+        self.send_error_to_admin(error_message, user_ids=(user_id,), kind=kind)
+
+    def send_error_to_admin(self, error: Union[Exception, str], user_ids: Iterable[int] = (), kind: Optional[str] = None) -> None:
+        """Учёт ошибки для администратора: новая ошибка отправляется сразу, повторы — в периодической сводке."""
+        self.errors.report(error, user_ids=user_ids, kind=kind)
+
+    def list_subscriptions(self, update: Update, context: CallbackContext) -> None:
+        """Обработчик команды /list."""
+        subscriptions = self.subscriptions.for_user(update.effective_user.id)
+        if not subscriptions:
+            update.message.reply_text('У вас нет активных подписок. Добавить — /add.')
+            return
+        lines = [
+            f'{subscription.number}. {subscription.warehouse_name} — {subscription.box_type_name}, коэффициент до {subscription.max_coefficient}'
+            for subscription in subscriptions
+        ]
+        update.message.reply_text('Ваши подписки:\n' + '\n'.join(lines) + '\n\nУдалить — /remove <номер>, все — /cancel, добавить — /add.')
+
+    def remove(self, update: Update, context: CallbackContext) -> None:
+        """Обработчик команды /remove <номер>."""
+        if not context.args or not context.args[0].isdigit():
+            update.message.reply_text('Укажите номер подписки из /list, например: /remove 2')
+            return
+        number = int(context.args[0])
+        removed = self.remove_subscription(update.effective_user.id, number)
+        if removed:
+            update.message.reply_text(f'Подписка №{number} ({removed[0].warehouse_name}, {removed[0].box_type_name}) удалена.')
+        else:
+            update.message.reply_text(f'Подписки №{number} нет. Список подписок — /list.')
 
-    def load_warehouses(self, api_key: str) -> Dict[str, str]:
-        """Загрузка списка складов."""
-        return self.get_warehouses(api_key)
+    def cancel_dialog(self, update: Update, context: CallbackContext) -> int:
+        """Обработчик /cancel внутри диалога: прерывает добавление подписки."""
+        update.message.reply_text('Добавление подписки отменено.', reply_markup=ReplyKeyboardRemove())
+        return ConversationHandler.END
 
     def cancel(self, update: Update, context: CallbackContext) -> int:
-        """Обработчик команды /cancel."""
-        user_id = update.effective_user.id
-        with self.user_data_lock:
-            if user_id in self.user_data:
-                del self.user_data[user_id]
-                for job in context.job_queue.get_jobs_by_name(str(user_id)):
-                    job.schedule_removal()
-                update.message.reply_text('Мониторинг остановлен и данные удалены.')
-            else:
-                update.message.reply_text('У вас нет активного мониторинга.')
+        """Обработчик команды /cancel: удаляет все подписки пользователя."""
+        if self.remove_subscription(update.effective_user.id):
+            update.message.reply_text('Мониторинг остановлен и данные удалены.')
+        else:
+            update.message.reply_text('У вас нет активного мониторинга.')
         return ConversationHandler.END
 
     def signal_handler(self, signum, frame) -> None:
         """Обработчик сигналов завершения."""
         logger.info("Получен сигнал завершения. Завершение работы бота...")
-        self.updater.stop()
+        self.stop()
         self.updater.is_idle = False
+        self._shutdown.set()
+
+    def launch(self) -> None:
+        """
+        Запуск опроса, очереди отправки и приёма обновлений без ожидания завершения.
+
+        Обновления начинают приниматься сразу, а подписки восстанавливаются из
+        Redis в фоне: пользователь с новыми подписками восстановлением не
+        затрагивается (см. restore_subscriptions).
+        """
+        self.sender.start()
+        self.errors.start()
+        self.history.start()
+        if self.mode == 'asyncio':
+            self.poller.start()
+        else:
+            self.scheduler.start()
+        if self.tasks is not None:
+            self._results_thread = Thread(target=self.tasks.consume, args=(self.handle_poll_result, self._results_stop),
+                                          name='poll-results', daemon=True)
+            self._results_thread.start()
+        if self.webhook is not None:
+            self.webhook.start()
+            if self.webhook_url:
+                api_kwargs = {'secret_token': self.webhook.secret_token} if self.webhook.secret_token else None
+                self.updater.bot.set_webhook(self.webhook_url, api_kwargs=api_kwargs)
+        else:
+            self.updater.start_polling()
+        self._restore_thread = Thread(target=self.restore_subscriptions, name='restore-subscriptions', daemon=True)
+        self._restore_thread.start()
+        logger.info(f"Бот запущен и готов к работе (режим мониторинга: {self.mode}, "
+                    f"обновления: {'webhook' if self.webhook is not None else 'polling'}).")
+
+    def stop(self) -> None:
+        """Остановка опроса, приёма обновлений и очереди отправки."""
+        if self._restore_thread is not None:
+            self._restore_thread.join(5)
+        if self.mode == 'asyncio':
+            self.poller.stop()
+        else:
+            self.scheduler.stop()
+        if self._results_thread is not None:
+            self._results_stop.set()
+            self._results_thread.join(5)
+        if self.webhook is not None:
+            self.webhook.stop()
+        remove_listener(self.circuit_changed)
+        remove_token_listener(self.token_quarantine_changed)
+        self.updater.stop()
+        # Последняя сводка ошибок встаёт в очередь отправки, поэтому очередь останавливается после неё и досылается
+        self.errors.stop()
+        self.sender.stop()
+        self.history.stop()
 
     def run(self) -> None:
         """Запуск бота."""
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
 
-        self.updater.start_polling()
-        logger.info("Бот запущен и готов к работе.")
-        self.updater.idle()
+        start_from_env()
+        self.launch()
+        if self.webhook is None:
+            self.updater.idle()
+        else:
+            # updater.idle() при остановленном long polling завершает процесс без stop()
+            while not self._shutdown.wait(1):
+                pass
 
 
 def main() -> None:
     load_dotenv()
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description='Telegram-бот мониторинга коэффициентов приёмки WB')
+    parser.add_argument('--mode', choices=RUN_MODES + tuple(MODE_ALIASES), default=os.getenv('BOT_MODE', 'scheduler'),
+                        help='движок мониторинга: scheduler (планировщик в отдельном потоке; прежнее название — jobqueue), asyncio, '
+                             'distributed (опрос на воркерах через Redis) или worker (только воркер опроса)')
+    parser.add_argument('--updates', choices=UPDATE_MODES, default=os.getenv('BOT_UPDATES', 'polling'),
+                        help='приём обновлений Telegram: polling (long polling) или webhook (встроенный HTTP-сервер)')
+    args = parser.parse_args()
+    if args.mode in MODE_ALIASES:
+        logger.warning(f'Режим {args.mode} переименован в {MODE_ALIASES[args.mode]}')
+        args.mode = MODE_ALIASES[args.mode]
 
     TG_TOKEN = os.getenv('TELEGRAM_TOKEN')
     WB_API_SUPPLY = os.getenv('WB_API_SUPPLY')
     ADMIN_CHANNEL_ID = os.getenv('ADMIN_CHANNEL_ID')
 
+    if args.mode == 'worker':
+        # Воркеру опроса Telegram не нужен: только API WB и Redis
+        if not WB_API_SUPPLY:
+            logger.error("Ошибка: WB_API_SUPPLY не найден в файле .env")
+            return
+        run_worker(WB_API_SUPPLY)
+        return
+
     if not TG_TOKEN or not WB_API_SUPPLY or not ADMIN_CHANNEL_ID:
         logger.error("Ошибка: TG_TOKEN или API_KEY или ADMIN_CHANNEL_ID не найдены в файле .env")
         return
 
-    bot = Bot(TG_TOKEN, WB_API_SUPPLY, ADMIN_CHANNEL_ID)
+    bot = Bot(TG_TOKEN, WB_API_SUPPLY, ADMIN_CHANNEL_ID, mode=args.mode, telegram_base_url=os.getenv('TELEGRAM_API_URL'))
+    if args.updates == 'webhook':
+        bot.enable_webhook(
+            webhook_url=os.getenv('WEBHOOK_URL'),
+            listen=os.getenv('WEBHOOK_LISTEN', WEBHOOK_LISTEN),
+            port=int(os.getenv('WEBHOOK_PORT', WEBHOOK_PORT)),
+            url_path=os.getenv('WEBHOOK_PATH', WEBHOOK_PATH),
+            secret_token=os.getenv('WEBHOOK_SECRET'),
+            workers=int(os.getenv('WEBHOOK_WORKERS', WEBHOOK_WORKERS)),
+        )
     bot.run()
 
 
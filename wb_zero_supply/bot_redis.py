@@ -1,50 +1,66 @@
 import os
+import time
+import random
 import logging
 from dotenv import load_dotenv
+from wb_zero_supply.MessageSender import TELEGRAM_SEND_LATENCY, TELEGRAM_SENDS
+from wb_zero_supply.Metrics import gauge, observe_job_lag, start_from_env
 from wb_zero_supply.RedisManager import RedisManagerData, RedisManagerUser
-from wb_zero_supply.get_stock_wb_from_api import (
-    get_stock_wb_from_api,
-    check_coefficients_in_range
-)
+from wb_zero_supply.get_stock_wb_from_api import get_stock_wb_from_api
 from wb_zero_supply.get_warehouses_wb import get_id_warehouse_wb_by_name
+from wb_zero_supply.log_setup import setup_logging
 from telegram import Update
+from telegram.error import TelegramError
 from telegram.ext import Updater, ConversationHandler, CommandHandler
 from telegram.ext import MessageHandler, Filters, CallbackContext
 
 
-logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
 redis_manager_user = RedisManagerUser()
+redis_manager_data = RedisManagerData()
 CHOOSING_WAREHOUSE, CHOOSING_MAX_DEGREE = range(2)
+DATA_FETCH_INTERVAL = 30  # секунд между запросами для одного пользователя
+SUBSCRIBERS = gauge('bot_subscribers', 'Пользователей с активным мониторингом')
+
+
+def send_message(bot, chat_id, text):
+    """Отправка сообщения с замером времени и учётом результата в метриках."""
+    started = time.perf_counter()
+    try:
+        bot.send_message(chat_id, text=text)
+        TELEGRAM_SENDS.labels('ok').inc()
+    except TelegramError:
+        TELEGRAM_SENDS.labels('error').inc()
+        raise
+    finally:
+        TELEGRAM_SEND_LATENCY.observe(time.perf_counter() - started)
 
 
 def send_data(context: CallbackContext):
-    job = context.job
-    token_api_wb = job.data['token_api_wb']    
-    pass_redis = job.data['pass_redis']
-    user_id = job.context
+    observe_job_lag(context.job, 'data_fetcher')
+    token_api_wb = context.bot_data['token_api_wb']
+    user_id = context.job.context
 
     user_data = redis_manager_user.get_user_data(str(user_id))
-    store = user_data['warehouse_id']
+    store = user_data['warehouse_wb']
 
     try:
-        coefficients = get_stock_wb_from_api(token_api_wb, store)
-        if coefficients:
-            max_degree = int(user_data['max_degree'])
-            locations = check_coefficients_in_range(coefficients, max_degree=max_degree)
+        max_degree = int(user_data['max_degree'])
+        # Фильтр применяется при разборе ответа: лишние строки не попадают в память
+        locations = get_stock_wb_from_api(token_api_wb, store, box_type='Короба', min_coefficient=0, max_coefficient=max_degree)
+        if locations is not None:
             if locations:
-                redis_manager_data = RedisManagerData(password=pass_redis)
                 ttl = 1209600  # 14 дней в секундах
-                messages = redis_manager_data.process_locations(locations, ttl)
+                messages = redis_manager_data.process_locations(locations, ttl, user_id)
                 for message in messages:
-                    context.bot.send_message(user_id, text=message)
+                    send_message(context.bot, user_id, message)
             else:
                 logging.info("Нет уникальных данных для отправки.")
         else:
             logging.error("Не удалось получить коэффициенты из API.")
-            context.bot.send_message(user_id, text="Ошибка: Не удалось получить данные о коэффициентах.")
+            send_message(context.bot, user_id, "Ошибка: Не удалось получить данные о коэффициентах.")
     except Exception as e:
         logging.error(f"Произошла ошибка: {e}")
-        context.bot.send_message(user_id, text="Ошибка: Произошла ошибка при обработке данных.")
+        send_message(context.bot, user_id, "Ошибка: Произошла ошибка при обработке данных.")
 
 
 def start(update: Update, context: CallbackContext) -> None:
@@ -78,7 +94,7 @@ def handle_warehouse(update: Update, context: CallbackContext) -> int:
     # Сохраняем склад в Redis
     redis_manager_user.set_user_data(user_id, user_data)
 
-    update.message.reply_text(f"Вы выбрали склад: {warehouse_wb['name']}. Теперь введите максимальный коэффициент для отслеживания.")
+    update.message.reply_text(f"Вы выбрали склад: {', '.join(warehouse_wb)}. Теперь введите максимальный коэффициент для отслеживания.")
     return CHOOSING_MAX_DEGREE
 
 
@@ -92,17 +108,14 @@ def handle_max_degree(update: Update, context: CallbackContext) -> int:
         redis_manager_user.set_user_data(user_id, user_data)
         update.message.reply_text(f'Вы установили максимальный коэффициент: {max_degree}. Бот начнет отслеживать данные.')
     
-        # Добавляем задачу в JobQueue с передачей токена API и списка магазинов
+        # Добавляем задачу в JobQueue (токен API задача берёт из bot_data).
+        # Первый запуск сдвинут случайно, чтобы задачи разных пользователей не шли в ногу
         context.job_queue.run_repeating(
             send_data,
-            interval=30,
-            first=0,
+            interval=DATA_FETCH_INTERVAL,
+            first=random.uniform(0, DATA_FETCH_INTERVAL),
             context=update.message.chat_id,
-            name=f'data_fetcher_{user_id}',
-            data={
-                'token_api_wb': context.bot_data['token_api_wb'],
-                'pass_redis': context.bot_data['pass_redis']
-            }
+            name=f'data_fetcher_{user_id}'
         )
         return ConversationHandler.END
     except ValueError:
@@ -131,6 +144,7 @@ def cancel(update: Update, context: CallbackContext) -> None:
 
 def main():
     load_dotenv()
+    setup_logging()
     token_telegram = os.getenv('TELEGRAM_TOKEN')
     token_api_wb = os.getenv('WB_API_SUPPLY')
     pass_redis = os.getenv('PASS_REDIS')
@@ -142,6 +156,8 @@ def main():
 
     updater = Updater(token_telegram, use_context=True)
     dp = updater.dispatcher
+    SUBSCRIBERS.set_function(lambda: len(updater.job_queue.jobs()))
+    start_from_env()
     # хранения конфигурационных данных и общих значений,
     # которые будут использоваться в различных частях вашего бота
     dp.bot_data['token_api_wb'] = token_api_wb
@@ -161,6 +177,9 @@ def main():
     dp.add_handler(CommandHandler('cancel', cancel))
 
     updater.start_polling()
+    # Соединение с Redis открывается при первом обращении: проверка идёт после запуска приёма обновлений
+    if not redis_manager_user.check_connection():
+        logging.error("Не удалось подключиться к Redis: команды будут завершаться ошибкой, пока он недоступен.")
     updater.idle()
 
 
@@ -0,0 +1,116 @@
+import re
+import json
+import codecs
+from itertools import chain
+from typing import Any, Iterable, Iterator, Union
+
+try:
+    import orjson
+except ImportError:  # Быстрый разбор необязателен: poetry install -E fast
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+BACKEND = 'orjson' if orjson is not None else 'msgspec' if msgspec is not None else 'json'
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Разбор JSON целиком: orjson или msgspec, если установлены, иначе стандартный json.
+
+    :raises ValueError: Если данные не являются корректным JSON.
+    """
+    if orjson is not None:
+        return orjson.loads(data)  # orjson.JSONDecodeError — подкласс ValueError
+    if msgspec is not None:
+        try:
+            return msgspec.json.decode(data)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+    return json.loads(data)
+
+
+def iter_array(chunks: Iterable[Union[bytes, str]]) -> Iterator[Any]:
+    """
+    Элементы JSON-массива верхнего уровня по мере поступления частей тела ответа.
+
+    В памяти одновременно находятся только неразобранный хвост последней части
+    и элементы из неё, а не весь массив, поэтому потребитель может отбрасывать
+    ненужные элементы сразу. Целые элементы части разбираются одним вызовом
+    loads (orjson, если установлен). Тело null считается пустым массивом.
+
+    :param chunks: Части тела ответа (например, response.iter_content()).
+    :raises ValueError: Если тело не JSON-массив или оборвалось.
+    """
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    opened = closed = expect_item = False
+    empty = True  # после '[' ещё не было элементов: ']' допустима и при ожидании элемента
+    for chunk in chain(chunks, (None,)):
+        final = chunk is None
+        buffer += chunk if isinstance(chunk, str) else utf8.decode(chunk or b'', final=final)
+        position = 0
+        while True:
+            position = _WHITESPACE.match(buffer, position).end()
+            if position == len(buffer):
+                break
+            char = buffer[position]
+            if closed:
+                raise ValueError(f'Лишние данные после JSON-массива (позиция {position})')
+            if not opened:
+                if buffer.startswith('null', position):
+                    opened = closed = True
+                    position += 4
+                    continue
+                if not final and 'null'.startswith(buffer[position:]):
+                    break  # null пришёл не целиком
+                if char != '[':
+                    raise ValueError('Ожидался JSON-массив')
+                opened = expect_item = True
+                position += 1
+                continue
+            if char == ']' and (not expect_item or empty):
+                closed = True
+                position += 1
+                continue
+            if not expect_item:
+                if char != ',':
+                    raise ValueError(f'Ожидалась запятая между элементами JSON-массива, получено {char!r}')
+                expect_item = True
+                position += 1
+                continue
+            # Все целые элементы в буфере разбираются одним вызовом loads: граница — последняя '}'.
+            # Если она внутри строки или вложенного объекта, '[...]' не разберётся, и элемент
+            # читается по одному через raw_decode.
+            cut = buffer.rfind('}', position) + 1
+            if cut:
+                try:
+                    items = loads('[' + buffer[position:cut] + ']')
+                except ValueError:
+                    items = None
+                if items is not None:
+                    yield from items
+                    position = cut
+                    expect_item = empty = False
+                    continue
+            try:
+                item, end = _decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                break  # элемент пришёл не целиком
+            if end == len(buffer) and not final and not isinstance(item, (dict, list)):
+                break  # число или литерал в конце части могут продолжиться в следующей
+            yield item
+            position = end
+            expect_item = empty = False
+        buffer = buffer[position:]
+    if not closed:
+        raise ValueError('JSON-массив оборвался')
@@ -2,37 +2,119 @@ import os
 import requests
 import logging
 from dotenv import load_dotenv
-from datetime import datetime
-from functools import partial, lru_cache
+from wb_zero_supply import fast_json, http_client
+from wb_zero_supply.CoefficientRecord import records
+from wb_zero_supply.log_setup import setup_logging
 
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+COEFFICIENTS_URL = f'{http_client.SUPPLIES_API_URL}/api/v1/acceptance/coefficients'
+STREAM_CHUNK_SIZE = 64 * 1024  # байт тела ответа на один шаг потокового разбора
 
 
-def get_stock_wb_from_api(wb_api_token, stores=None):
-    url = 'https://supplies-api.wildberries.ru/api/v1/acceptance/coefficients'
-
-    headers = {
-        'Authorization': f'Bearer {wb_api_token}',  # Добавляем токен в заголовок Authorization
-    }
+def request_coefficients(wb_api_token, warehouse_ids=None, stream=False):
+    """
+    Запрос коэффициентов приёмки с проверкой статуса.
 
+    :param warehouse_ids: Идентификаторы складов (все склады, если не заданы).
+    :param stream: Не читать тело ответа сразу (для потокового разбора).
+    :return: Ответ requests.
+    :raises requests.RequestException: При ошибке запроса или HTTP-ошибке.
+    """
     params = {}
-    if stores:
-        # Извлекаем идентификаторы складов из словаря stores
-        warehouse_ids = list(stores.values())
-        if warehouse_ids:
-            params['warehouseIDs'] = ','.join(map(str, warehouse_ids))  # Преобразуем список в строку
+    if warehouse_ids:
+        params['warehouseIDs'] = ','.join(map(str, warehouse_ids))  # Преобразуем список в строку
 
+    # Токен (или один из нескольких через запятую) подставляет пул токенов
+    response = http_client.get('coefficients', COEFFICIENTS_URL, token=wb_api_token, params=params, stream=stream)
     try:
-        response = requests.get(url, headers=headers, params=params)
         response.raise_for_status()  # Проверка на ошибки HTTP
+    except requests.HTTPError:
+        # Непрочитанный потоковый ответ держит соединение: возвращаем его в пул
+        response.close()
+        raise
+    return response
+
+
+def fetch_coefficients_body(wb_api_token, warehouse_ids=None):
+    """
+    Запрос коэффициентов приёмки без перехвата ошибок и без разбора ответа.
+
+    :param wb_api_token: Токен API Wildberries.
+    :param warehouse_ids: Идентификаторы складов (все склады, если не заданы).
+    :return: Тело ответа (JSON) в байтах.
+    :raises requests.RequestException: При ошибке запроса или HTTP-ошибке.
+    """
+    return request_coefficients(wb_api_token, warehouse_ids).content
+
+
+def fetch_coefficients(wb_api_token, warehouse_ids=None):
+    """
+    Запрос коэффициентов приёмки без перехвата ошибок.
+
+    :return: Список записей CoefficientRecord.
+    :raises requests.RequestException: При ошибке запроса или HTTP-ошибке.
+    """
+    return list(records(fast_json.loads(fetch_coefficients_body(wb_api_token, warehouse_ids))))
+
+
+def filter_coefficients(coefficients, warehouse_ids=None, box_type=None, min_coefficient=None, max_coefficient=None):
+    """
+    Записи коэффициентов, подходящие под фильтр (None — без ограничения).
+
+    :param coefficients: Записи CoefficientRecord (можно генератор — он читается лениво).
+    :param warehouse_ids: Допустимые ID складов.
+    :param box_type: Тип поставки (boxTypeName).
+    :param min_coefficient: Минимальный коэффициент включительно.
+    :param max_coefficient: Максимальный коэффициент включительно.
+    """
+    warehouse_ids = set(warehouse_ids) if warehouse_ids else None
+    for coef in coefficients:
+        if warehouse_ids is not None and coef.warehouse_id not in warehouse_ids:
+            continue
+        if box_type is not None and coef.box_type_name != box_type:
+            continue
+        if min_coefficient is not None and coef.coefficient < min_coefficient:
+            continue
+        if max_coefficient is not None and coef.coefficient > max_coefficient:
+            continue
+        yield coef
+
+
+def iter_coefficients(wb_api_token, warehouse_ids=None, box_type=None, min_coefficient=None, max_coefficient=None):
+    """
+    Запрос коэффициентов с фильтрацией прямо во время разбора ответа.
+
+    Тело читается частями по STREAM_CHUNK_SIZE, и каждая строка сразу
+    проверяется фильтром, поэтому в памяти остаются только подходящие строки:
+    пиковое потребление не растёт вместе с ответом по всем складам.
+
+    :raises requests.RequestException: При ошибке запроса или HTTP-ошибке.
+    :raises ValueError: Если ответ не JSON-массив.
+    """
+    response = request_coefficients(wb_api_token, warehouse_ids, stream=True)
+    with response:
+        rows = fast_json.iter_array(response.iter_content(STREAM_CHUNK_SIZE))
+        yield from filter_coefficients(records(rows), warehouse_ids, box_type, min_coefficient, max_coefficient)
+
+
+def get_stock_wb_from_api(wb_api_token, stores=None, box_type=None, min_coefficient=None, max_coefficient=None):
+    """
+    Коэффициенты приёмки по складам (записи CoefficientRecord) или None при ошибке.
+
+    Если задан хотя бы один фильтр, ответ разбирается потоково и
+    возвращаются только подходящие строки.
+    """
+    # Извлекаем идентификаторы складов из словаря stores
+    warehouse_ids = list(stores.values()) if stores else None
 
+    try:
         # Успешный ответ
-        coefficients = response.json()  # Возвращаем данные в формате JSON
-        return coefficients
+        if box_type is None and min_coefficient is None and max_coefficient is None:
+            return fetch_coefficients(wb_api_token, warehouse_ids)
+        return list(iter_coefficients(wb_api_token, warehouse_ids, box_type, min_coefficient, max_coefficient))
     except requests.HTTPError as e:
-        if response.status_code == 400:
-            error_info = response.json()
+        if e.response is not None and e.response.status_code == 400:
+            error_info = e.response.json()
             logging.error(f"Ошибка 400: {error_info['title']} - {error_info['detail']}")
         else:
             logging.error(f'HTTP error occurred: {e}')  # Обработка других ошибок
@@ -45,35 +127,22 @@ def get_stock_wb_from_api(wb_api_token, stores=None):
 def check_all_coefficients(coefficients):
     if coefficients:
         for coefficient in coefficients:
-            date = datetime.strptime(coefficient['date'], '%Y-%m-%dT%H:%M:%SZ').strftime('%Y-%m-%d')
-            print(f"Дата: {date}, "
-                  f"Склад: {coefficient['warehouseName']}, "
-                  f"Коэффициент: {coefficient['coefficient']}, "                  
-                  f"Тип поставки: {coefficient.get('boxTypeName', 'Не указано')}")
+            print(f"Дата: {coefficient.date}, "
+                  f"Склад: {coefficient.warehouse_name}, "
+                  f"Коэффициент: {coefficient.coefficient}, "
+                  f"Тип поставки: {coefficient.box_type_name or 'Не указано'}")
     else:
         print('Не удалось получить коэффициенты приёмки.')
 
 
-@lru_cache(maxsize=128)
-def format_date(date_string):
-    return datetime.strptime(date_string, '%Y-%m-%dT%H:%M:%SZ').strftime('%Y-%m-%d')
-
-
 def check_coefficients_in_range(coefficients, min_degree=0, max_degree=1, type_name='Короба'):
-    return [
-        {
-            "Склад": coef['warehouseName'],
-            "Дата": format_date(coef['date']),
-            "Тип": coef['boxTypeName'],
-            "Коэффициент": coef['coefficient']
-        }
-        for coef in coefficients
-        if min_degree <= coef['coefficient'] <= max_degree and coef.get('boxTypeName') == type_name
-    ]
+    """Записи с коэффициентом от min_degree до max_degree для типа поставки type_name."""
+    return list(filter_coefficients(coefficients, box_type=type_name, min_coefficient=min_degree, max_coefficient=max_degree))
 
 
 def main():
     load_dotenv()
+    setup_logging()
     stores = {
         'Тула': 206348,
         'СЦ Пушкино': 207743,
@@ -81,16 +150,11 @@ def main():
     }
     wb_api_token = os.getenv('WB_API_SUPPLY')
 
-    # Создание предварительно настроенной версии функции
-    check_coefficients_for_boxes = partial(check_coefficients_in_range, min_degree=0, max_degree=1, type_name='Короба')
-
-    coefficients = get_stock_wb_from_api(wb_api_token, stores)
-    if coefficients:
-        messages = check_coefficients_for_boxes(coefficients)
-        print(messages)
-        if messages:
-            for message in messages:
-                print(message)
+    # Фильтр по типу поставки и коэффициенту применяется при разборе ответа
+    coefficients = get_stock_wb_from_api(wb_api_token, stores, box_type='Короба', min_coefficient=0, max_coefficient=1)
+    if coefficients is not None:
+        if coefficients:
+            check_all_coefficients(coefficients)
         else:
             print('Нет поставок с коэффициентом 0 для типа "Короба".')
     else:
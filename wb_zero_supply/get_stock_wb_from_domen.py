@@ -1,47 +1,108 @@
 import os
-import json
+import time
+import argparse
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from datetime import datetime
+from hashlib import blake2b
+from threading import Lock
 import logging
+from wb_zero_supply import fast_json, http_client
+from wb_zero_supply.CoefficientRecord import format_day, parse_day
+from wb_zero_supply.log_setup import setup_logging
+
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36 Edg/126.0.0.0',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
+}
+MAX_CONCURRENCY = 8  # одновременных запросов к домену (не больше пула соединений http_client)
+# Секунд, в течение которых ответ по складу не запрашивается повторно. Переопределяется
+# переменной DOMEN_CACHE_TTL или ключом --ttl; 0 отключает кэш (каждый вызов идёт в домен).
+CACHE_TTL = 30.0
+
+# (домен, ID склада) -> (время получения, хэш тела ответа, разобранные данные)
+_cache = {}
+_cache_lock = Lock()
+
+
+def fetch_store(session, domain, store_id, headers):
+    """Запрашивает данные одного склада и возвращает тело ответа."""
+    url = f'https://{domain}/wp-admin/admin-ajax.php?action=get_limit_store&id={store_id}'
+    response = session.get(url, headers=headers, timeout=http_client.get_timeout())
+    response.raise_for_status()  # Проверка на ошибки HTTP
+    return response.content
+
+
+def _load_store(session, domain, store_name, store_id, headers, ttl):
+    """
+    Данные склада с учётом кэша: (данные или None при ошибке, изменились ли они).
+
+    Ответ разбирается только если тело отличается от предыдущего.
+    """
+    key = (domain, store_id)
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None and time.monotonic() - cached[0] < ttl:
+        return cached[2], False
+
+    try:
+        body = fetch_store(session, domain, store_id, headers)
+        digest = blake2b(body, digest_size=16).digest()
+        if cached is not None and cached[1] == digest:
+            stocks, changed = cached[2], False
+        else:
+            stocks, changed = fast_json.loads(body), True  # Безопасное получение JSON-данных
+    except requests.HTTPError as e:
+        logging.error(f'HTTP error occurred ({store_name}): {e}')  # Обработка ошибок
+        return None, False
+    except ValueError:
+        logging.error(f'Ошибка декодирования JSON ({store_name}). Ответ сервера не является корректным JSON.')
+        return None, False
+    except Exception as e:
+        logging.error(f'An error occurred ({store_name}): {e}')  # Обработка других ошибок
+        return None, False
+
+    with _cache_lock:
+        _cache[key] = (time.monotonic(), digest, stocks)
+    return stocks, changed
+
+
+def fetch_stocks(stores, domain, cookie, max_workers=MAX_CONCURRENCY, ttl=CACHE_TTL):
+    """
+    Конкурентно запрашивает склады и возвращает [(название, данные, изменились ли)].
+
+    Склады, по которым запрос не удался, пропускаются.
+
+    :param stores: Словарь {название склада: ID}.
+    :param max_workers: Максимум одновременных запросов.
+    :param ttl: Сколько секунд ответ по складу берётся из кэша без запроса (0 — всегда запрашивать).
+    """
+    session = http_client.get_session()
+    headers = dict(HEADERS, Cookie=cookie)
+    items = list(stores.items())
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items))), thread_name_prefix='domen') as executor:
+        results = executor.map(
+            lambda item: _load_store(session, domain, item[0], item[1], headers, ttl), items
+        )
+        return [(store_name, stocks, changed) for (store_name, _), (stocks, changed) in zip(items, results) if stocks is not None]
+
+
+def get_stock_wb_from_domen(stores, domain, cookie, max_workers=MAX_CONCURRENCY, ttl=CACHE_TTL):
+    if not cookie:
+        logging.error("Cookie не задано.")
+        return None
+    return [{store_name: stocks} for store_name, stocks, _ in fetch_stocks(stores, domain, cookie, max_workers, ttl)]
 
 
-# Настройка логирования
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-
-def get_stock_wb_from_domen(stores, domain, cookie):
+def get_changed_stock_wb_from_domen(stores, domain, cookie, max_workers=MAX_CONCURRENCY, ttl=CACHE_TTL):
+    """Как get_stock_wb_from_domen, но только склады, ответ по которым изменился с прошлого запроса."""
     if not cookie:
         logging.error("Cookie не задано.")
         return None
-
-    data = []
-    session = requests.Session()
-    for store_name, store_id in stores.items():
-        url = f'https://{domain}/wp-admin/admin-ajax.php?action=get_limit_store&id={store_id}'
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36 Edg/126.0.0.0',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-            'Cookie': cookie
-        }
-
-        response = session.get(url, headers=headers)
-        try:
-            response.raise_for_status()  # Проверка на ошибки HTTP
-            stocks = response.json()  # Безопасное получение JSON-данных
-        except requests.HTTPError as e:
-            logging.error(f'HTTP error occurred: {e}')  # Обработка ошибок
-            continue  # Переход к следующему складу
-        except json.JSONDecodeError:
-            logging.error('Ошибка декодирования JSON. Ответ сервера не является корректным JSON.')
-            continue  # Переход к следующему складу
-        except Exception as e:
-            logging.error(f'An error occurred: {e}')  # Обработка других ошибок
-            continue  # Переход к следующему складу
-
-        data.append({store_name: stocks})
-
-    return data
+    return [{store_name: stocks} for store_name, stocks, changed in fetch_stocks(stores, domain, cookie, max_workers, ttl) if changed]
 
 
 def check_stock(stores, data):
@@ -52,7 +113,7 @@ def check_stock(stores, data):
                 for delivery_type, deliveries in stock_data.items():
                     for item in deliveries:
                         if item.get('coefficient') == 0:  # Используем get для безопасного доступа
-                            date = datetime.strptime(item['date'], '%Y-%m-%dT%H:%M:%SZ').strftime('%Y-%m-%d')
+                            date = format_day(parse_day(item['date']))  # '2024-10-01T00:00:00Z' -> '2024-10-01'
                             message = (f'Бесплатный слот для приемки\n'
                                        f'Склад: {stock_name},\n'
                                        f'Дата: {date},\n'
@@ -62,24 +123,53 @@ def check_stock(stores, data):
     return messages if messages else False
 
 
-def main():
-    load_dotenv()
-    stores = {
+def load_stores():
+    """
+    Склады для проверки: DOMEN_STORES («Тула=123,Электросталь=456») или STORES_TULA и STORES_ELECTROSTAL.
+    """
+    if os.getenv('DOMEN_STORES'):
+        pairs = (pair.rsplit('=', 1) for pair in os.getenv('DOMEN_STORES').split(',') if pair.strip())
+        return {name.strip(): int(store_id) for name, store_id in pairs}
+    return {
         'Тула': int(os.getenv('STORES_TULA')),
         'Электросталь': int(os.getenv('STORES_ELECTROSTAL'))
     }
+
+
+def main():
+    load_dotenv()
+    setup_logging()
+    parser = argparse.ArgumentParser(description='Проверка бесплатных слотов приёмки через сторонний домен')
+    parser.add_argument('--interval', type=float, default=0, help='опрашивать каждые N секунд (0 — один раз)')
+    parser.add_argument('--concurrency', type=int, default=MAX_CONCURRENCY, help='одновременных запросов')
+    parser.add_argument('--ttl', type=float, default=float(os.getenv('DOMEN_CACHE_TTL', CACHE_TTL)),
+                        help='секунд, в течение которых ответ по складу не запрашивается повторно (0 — без кэша)')
+    args = parser.parse_args()
+
+    stores = load_stores()
     domain = os.getenv('DOMAIN')
     cookie = os.getenv('COOKIE')
 
-    result = get_stock_wb_from_domen(stores, domain, cookie)
-    if result is None:
-        logging.error('Не удалось выполнить проверку из-за отсутствия cookie.')
-    else:
+    while True:
+        started = time.monotonic()
+        # В цикле сообщаем только о складах, ответ по которым изменился
+        fetch = get_changed_stock_wb_from_domen if args.interval else get_stock_wb_from_domen
+        result = fetch(stores, domain, cookie, max_workers=args.concurrency, ttl=args.ttl)
+        if result is None:
+            logging.error('Не удалось выполнить проверку из-за отсутствия cookie.')
+            return
         messages = check_stock(stores, result)
         if not messages:
-            logging.info('Бесплатных слотов для приемки нет.')
+            if not args.interval:
+                logging.info('Бесплатных слотов для приемки нет.')
         else:
             logging.info('\n'.join(messages))  # Исправлено на messages
+        if not args.interval:
+            return
+        elapsed = time.monotonic() - started
+        if elapsed > args.interval:
+            logging.warning(f'Проверка {len(stores)} складов заняла {elapsed:.1f} с — дольше интервала {args.interval} с')
+        time.sleep(max(0.0, args.interval - elapsed))
 
 
 if __name__ == '__main__':
@@ -1,99 +1,27 @@
 import os
-import time
-import requests
 import logging
-from functools import wraps
 from dotenv import load_dotenv
+from wb_zero_supply.WarehouseCatalog import get_catalog
+from wb_zero_supply.WarehouseIndex import WarehouseIndex
+from wb_zero_supply.log_setup import setup_logging
 
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-
-def cache_with_fallback(expiration=86400):  # 86400 секунд = 24 часа
-    """Декоратор для кэширования результата функции с механизмом обновления в случае ошибки."""
-    def decorator(func):
-        cache = {}
-
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            current_time = time.time()
-            
-            # Проверяем, нужно ли обновить кэш
-            if not cache or current_time - cache['timestamp'] > expiration:
-                try:
-                    result = func(*args, **kwargs)
-                    if result is not None:
-                        cache['result'] = result
-                        cache['timestamp'] = current_time
-                        cache['error'] = None
-                    return result
-                except Exception as e:
-                    logging.error(f"Ошибка при обновлении кэша: {e}")
-                    if 'result' in cache:
-                        logging.info("Используем предыдущие кэшированные данные")
-                        cache['error'] = str(e)
-                        return cache['result']
-                    raise  # Если нет кэшированных данных, пробрасываем исключение
-            
-            # Если кэш актуален, возвращаем кэшированный результат
-            return cache['result']
-
-        # Добавляем метод для принудительного обновления кэша
-        def force_update(*args, **kwargs):
-            try:
-                result = func(*args, **kwargs)
-                if result is not None:
-                    cache['result'] = result
-                    cache['timestamp'] = time.time()
-                    cache['error'] = None
-                return result
-            except Exception as e:
-                logging.error(f"Ошибка при принудительном обновлении кэша: {e}")
-                cache['error'] = str(e)
-                raise
-
-        wrapper.force_update = force_update
-        return wrapper
-
-    return decorator
-
-
-@cache_with_fallback(expiration=86400)  # Кэш на 24 часа
 def get_warehouses_wb(wb_api_token):
-    url = 'https://supplies-api.wildberries.ru/api/v1/warehouses'
+    """Список складов из общего кэша каталога (см. WarehouseCatalog)."""
+    return get_catalog(wb_api_token).get()
 
-    headers = {
-        'Authorization': f'Bearer {wb_api_token}',
-    }
 
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-    except requests.exceptions.HTTPError as http_err:
-        error_messages = {
-            401: "Ошибка авторизации: Убедитесь, что ваши учетные данные верны.",
-            403: "Доступ запрещён: У вас нет прав для доступа к этому ресурсу.",
-            404: "Адрес не найден: Проверьте правильность URL.",
-            429: "Слишком много запросов: Попробуйте позже.",
-            500: "Внутренняя ошибка сервера: Попробуйте позже."
-        }
-        logging.error(error_messages.get(response.status_code, f"Произошла ошибка: {http_err}"))
-        raise
-    except requests.exceptions.RequestException as err:
-        logging.error(f"Произошла ошибка при выполнении запроса: {err}")
-        raise
-    else:
-        warehouses = response.json()
-        return warehouses
+def get_warehouse_index(wb_api_token) -> WarehouseIndex:
+    """Поисковый индекс складов, перестраиваемый только при обновлении каталога."""
+    return get_catalog(wb_api_token).index()
 
 
 def get_id_warehouse_wb_by_name(wb_api_token: str, name='Тула') -> dict[str, int]:
     try:
-        warehouses = get_warehouses_wb(wb_api_token)
-        name = name.strip()
-        for warehouse in warehouses:
-            if warehouse['name'] == name:
-                return {warehouse['name']: warehouse['ID']}
+        index = get_warehouse_index(wb_api_token)
+        warehouse_id = index.find_exact(name)
+        if warehouse_id is not None:
+            return {index.names[warehouse_id]: warehouse_id}
         logging.warning(f"Склад с именем '{name}' не найден")
         return None
     except Exception as e:
@@ -104,6 +32,7 @@ def get_id_warehouse_wb_by_name(wb_api_token: str, name='Тула') -> dict[str,
 # Пример использования
 if __name__ == "__main__":
     load_dotenv()
+    setup_logging()
     wb_api_token = os.getenv('WB_API_SUPPLY')
 
     try:
@@ -111,8 +40,10 @@ if __name__ == "__main__":
         print(f"Получено {len(warehouses)} складов")
 
         # Пример принудительного обновления кэша
-        updated_warehouses = get_warehouses_wb.force_update(wb_api_token)
+        get_catalog(wb_api_token).refresh()
+        updated_warehouses = get_warehouses_wb(wb_api_token)
         print(f"После принудительного обновления получено {len(updated_warehouses)} складов")
+        print(f"Статистика кэша: {get_catalog(wb_api_token).stats()}")
 
         # Пример получения ID склада по имени
         tula_id = get_id_warehouse_wb_by_name(wb_api_token, 'Тула')
@@ -0,0 +1,109 @@
+import os
+import logging
+import requests
+from threading import Lock
+from typing import Dict, Optional, Tuple
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from wb_zero_supply.RateLimiter import rate_limited_get
+from wb_zero_supply.TokenPool import get_pool
+
+
+logger = logging.getLogger(__name__)
+
+# WB_SUPPLIES_API_URL позволяет направить запросы на локальный стенд (см. benchmarks/)
+SUPPLIES_API_URL = os.getenv('WB_SUPPLIES_API_URL', 'https://supplies-api.wildberries.ru').rstrip('/')
+
+POOL_CONNECTIONS = 4  # число хостов, для которых держим пулы соединений
+POOL_MAXSIZE = 16  # соединений на хост: не меньше числа потоков JobQueue и фоновых задач
+CONNECT_TIMEOUT = 3.05  # секунд
+READ_TIMEOUT = 15.0  # секунд
+
+_session: Optional[requests.Session] = None
+_session_lock = Lock()
+
+
+def get_timeout() -> Tuple[float, float]:
+    """Таймауты (подключение, чтение) с учётом WB_HTTP_CONNECT_TIMEOUT и WB_HTTP_READ_TIMEOUT."""
+    return (
+        float(os.getenv('WB_HTTP_CONNECT_TIMEOUT', CONNECT_TIMEOUT)),
+        float(os.getenv('WB_HTTP_READ_TIMEOUT', READ_TIMEOUT)),
+    )
+
+
+def create_session() -> requests.Session:
+    """
+    Сессия с пулом keep-alive соединений и политикой повторов.
+
+    Здесь повторяются только ошибки соединения и чтения. Ответы 429 и 5xx
+    повторяет rate_limited_get (см. RateLimiter), чтобы каждая попытка шла
+    через ограничитель и учитывалась предохранителем эндпоинта.
+    """
+    retry = Retry(
+        total=3,
+        connect=3,
+        read=2,
+        status=0,
+        backoff_factor=0.5,
+        allowed_methods=frozenset({'GET'}),
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=int(os.getenv('WB_HTTP_POOL_SIZE', POOL_MAXSIZE)),
+        max_retries=retry,
+    )
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'Accept': 'application/json',
+        'Accept-Encoding': 'gzip, deflate',
+        'Connection': 'keep-alive',
+    })
+    return session
+
+
+def get_session() -> requests.Session:
+    """Общая для процесса сессия (создаётся при первом обращении)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def close_session() -> None:
+    """Закрывает общую сессию и её соединения."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def response_from_status(url: str, status: int, headers: Dict[str, str], body: bytes) -> requests.Response:
+    """Ответ requests с заданным статусом, чтобы ошибки из aiohttp и воркеров обрабатывались как в синхронном режиме."""
+    response = requests.Response()
+    response.status_code = status
+    response.url = url
+    response.headers.update(headers)
+    response._content = body
+    return response
+
+
+def get(endpoint: str, url: str, token: str, **kwargs) -> requests.Response:
+    """
+    GET-запрос к API WB через общую сессию и ограничитель эндпоинта у токена.
+
+    :param endpoint: Имя эндпоинта для ограничителя ('coefficients', 'warehouses').
+    :param url: Адрес запроса.
+    :param token: Токен API WB или несколько токенов через запятую: запрос уходит
+                  с токена, выбранного пулом (см. TokenPool), с квотой этого токена.
+    :return: Ответ API (без проверки статуса).
+    """
+    kwargs.setdefault('timeout', get_timeout())
+    return rate_limited_get(endpoint, url, get_pool(token), session=get_session(), **kwargs)
@@ -0,0 +1,17 @@
+import os
+import logging
+
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+def setup_logging(level=None) -> None:
+    """
+    Настройка журнала для точек входа (main).
+
+    Модули пакета журнал при импорте не настраивают: импорт не меняет
+    обработчики приложения, в которое они встроены.
+
+    :param level: Уровень журнала (по умолчанию — LOG_LEVEL из окружения или INFO).
+    """
+    logging.basicConfig(format=LOG_FORMAT, level=level or os.getenv('LOG_LEVEL', 'INFO').upper())